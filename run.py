@@ -1,59 +1,114 @@
+from __future__ import annotations
+
+import time
+
+# 进程启动时刻：--once 打印首个价格的耗时（冷启动预算见 python -m src.coldstart）
+STARTED = time.perf_counter()
+
 import json
 import os
-import time
+import re
 import sys
 import argparse
 import logging
+import logging.handlers
+from dataclasses import replace
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
 
+# 启动路径只导入纯 Python 模块：Playwright（src.fetcher）、SMTP（src.notifier/src.outbox）
+# 在真正需要浏览器或发信时才在函数内导入，配置校验、历史查询、混合模式重放都不加载它们
+from src.browser_pool import BrowserPool
 from src.config import Settings, EHI_BASE_URL
-from src.fetcher import get_current_price
-from src.notifier import send_price_change_email, send_current_price_email
+from src.metrics import POLL_SECONDS, POLLS, MetricsFileWriter, MetricsServer
+from src.obslog import compactor_from_settings, observation_log_from_settings, start_queue_listener
+from src.replay import replayer_from_settings
+from src.resilience import CircuitBreaker
+from src.scheduler import VOLATILITY_WINDOW, AdaptiveScheduler
+from src.store import Observation, ObservationStore, route_key
+from src.watchdog import MemoryWatchdog
+from src.watches import (
+    DEFAULT_WATCH_ID,
+    SearchKey,
+    Watch,
+    group_by_search,
+    load_watches,
+    settings_for_search,
+    settings_for_watch,
+)
 
+if TYPE_CHECKING:
+    from src.outbox import Outbox
 
-def load_last_price(path: Path) -> float | None:
+
+def load_last_prices(path: Path) -> dict[str, float]:
+    # 旧版 data/last_price.json，仅用于首次迁移到 ObservationStore
+    # {watch_id: {"price": ..., "timestamp": ...}}；兼容更早的单值格式 {"price": ..., "timestamp": ...}
     if not path.exists():
-        return None
+        return {}
     try:
         with path.open("r", encoding="utf-8") as f:
             data = json.load(f)
-        return float(data.get("price"))
     except Exception:
-        return None
-
-
-def save_last_price(path: Path, price: float) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump({"price": price, "timestamp": int(time.time())}, f, ensure_ascii=False)
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    if "price" in data and not isinstance(data.get("price"), dict):
+        try:
+            return {DEFAULT_WATCH_ID: float(data["price"])}
+        except (TypeError, ValueError):
+            return {}
+    prices: dict[str, float] = {}
+    for watch_id, item in data.items():
+        try:
+            prices[watch_id] = float(item["price"])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return prices
 
 
-def setup_logging(debug: bool) -> logging.Logger:
+def setup_logging(debug: bool, max_mb: float = 10.0, backup_count: int = 5) -> logging.Logger:
     logs_dir = Path("logs")
     logs_dir.mkdir(parents=True, exist_ok=True)
     logger = logging.getLogger("ehi_monitor")
     logger.setLevel(logging.DEBUG if debug else logging.INFO)
-    # Console
+    # Attach once
+    if logger.handlers:
+        return logger
+    # Console：直接输出，与抓取过程中的 print 保持先后顺序
     ch = logging.StreamHandler(sys.stdout)
     ch.setLevel(logging.DEBUG if debug else logging.INFO)
     ch.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
-    # File
-    fh = logging.FileHandler(logs_dir / "monitor.log", encoding="utf-8")
+    logger.addHandler(ch)
+    # File：按大小轮换，经队列交给后台线程写盘，轮询线程不等磁盘
+    fh = logging.handlers.RotatingFileHandler(
+        logs_dir / "monitor.log", maxBytes=int(max_mb * 1024 * 1024), backupCount=backup_count, encoding="utf-8"
+    )
     fh.setLevel(logging.DEBUG if debug else logging.INFO)
     fh.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
-    # Attach once
-    if not logger.handlers:
-        logger.addHandler(ch)
-        logger.addHandler(fh)
+    start_queue_listener(logger, [fh])
     return logger
 
 
-def append_price_observation(settings: Settings, price: float, last_price: float | None) -> None:
+def initial_last_prices(store: ObservationStore, logger: logging.Logger, legacy_path: Path = Path("data/last_price.json")) -> dict[str, float]:
+    # 索引库为空时从旧版 last_price.json 导入一次，之后以索引库为准
+    last_prices = store.last_prices()
+    if not last_prices:
+        legacy = load_last_prices(legacy_path)
+        if legacy:
+            store.record_poll([], legacy)
+            last_prices = legacy
+            logger.info(f"Imported last prices from {legacy_path}")
+    return last_prices
+
+
+def append_price_observation(settings: Settings, price: float, last_price: float | None, watch_id: str = DEFAULT_WATCH_ID) -> None:
     # 以 JSONL 形式落盘，便于分析
     record = {
         "ts": int(time.time()),
+        "watch_id": watch_id,
         "car_name": settings.car_name,
         "mode": "form",
         "url": EHI_BASE_URL,
@@ -69,53 +124,260 @@ def append_price_observation(settings: Settings, price: float, last_price: float
         "last_price": last_price,
         "alert_price": settings.alert_price,
     }
-    path = Path("logs/price_observations.jsonl")
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    # 只在价格或查询条件变化时写完整记录，不变时按心跳间隔写计数（见 src/obslog.py）
+    observation_log_from_settings(settings).record(record)
+
+
+def fetch_watch_prices(settings: Settings, watches: list[Watch], pool: BrowserPool, logger: logging.Logger) -> dict[str, float | None]:
+    # 同一 (城市, 日期) 的 watch 共用一次查询。
+    # 查询成功的 watch 都在结果里（没找到车型/售罄为 None）；查询本身出错的 watch 不在结果里
+    results: dict[str, float | None] = {}
+    groups = group_by_search(watches)
+    if settings.dispatch_mode == "queue":
+        # 协调者：不启动浏览器，查询交给 worker 进程（重放也在 worker 里做）
+        from src.jobqueue import dispatch, queue_from_settings
+
+        by_search = dispatch(queue_from_settings(settings), {k: [w.car_name for w in g] for k, g in groups.items()}, settings.job_wait_seconds, logger)
+        _merge_results(results, groups, by_search, logger)
+        return results
+    replayer = replayer_from_settings(settings)
+    if replayer is not None:
+        # 混合模式：有模板的查询先走 HTTP 重放，失败或无模板的再交给浏览器（浏览器成功后会记录模板）
+        for search, group in list(groups.items()):
+            prices = replayer.prices(settings_for_search(settings, search), [w.car_name for w in group])
+            if prices is None:
+                continue
+            for w in group:
+                results[w.id] = prices.get(w.car_name)
+            del groups[search]
+        if not groups:
+            # 本轮全部重放成功：常驻浏览器空闲，先释放（下次需要时按需重新启动）
+            pool.close()
+            return results
+    if settings.fetch_engine == "async":
+        from src.async_fetcher import get_prices_sync
+
+        by_search = get_prices_sync({k: [w.car_name for w in g] for k, g in groups.items()}, settings)
+        _merge_results(results, groups, by_search, logger)
+        return results
+    from src.fetcher import get_prices_for_search
+
+    for search, group in groups.items():
+        try:
+            prices = get_prices_for_search(settings_for_search(settings, search), [w.car_name for w in group], pool)
+        except Exception as e:
+            logger.error(f"Error during check [{search.label()}]: {e}")
+            continue
+        for w in group:
+            results[w.id] = prices.get(w.car_name)
+    return results
+
+
+def _merge_results(
+    results: dict[str, float | None],
+    groups: dict[SearchKey, list[Watch]],
+    by_search: dict[SearchKey, dict[str, float | None] | Exception],
+    logger: logging.Logger,
+) -> None:
+    for search, group in groups.items():
+        prices = by_search.get(search)
+        if prices is None or isinstance(prices, Exception):
+            logger.error(f"Error during check [{search.label()}]: {prices or 'no result'}")
+            continue
+        for w in group:
+            results[w.id] = prices.get(w.car_name)
+
+
+def parse_date_pairs(spec: str) -> list[tuple[str, str]]:
+    # "2025-10-04:2025-10-08,2025-10-05:2025-10-09"，或指向每行一组的文件
+    path = Path(spec)
+    text = path.read_text(encoding="utf-8") if path.is_file() else spec
+    pairs: list[tuple[str, str]] = []
+    for item in re.split(r"[,\n]", text):
+        item = item.strip()
+        if not item or item.startswith("#"):
+            continue
+        pickup, sep, ret = item.partition(":")
+        if not sep:
+            raise ValueError(f"Invalid date pair (expected PICKUP:RETURN): {item}")
+        pairs.append((pickup.strip(), ret.strip()))
+    if not pairs:
+        raise ValueError("No date pairs given for --sweep")
+    return pairs
+
+
+def run_sweep(settings: Settings, spec: str, logger: logging.Logger) -> None:
+    pairs = parse_date_pairs(spec)
+    cars = [settings.car_name]
+    logger.info(f"Sweep: {settings.pickup_city}->{settings.return_city}, {len(pairs)} date pairs")
+    from src.fetcher import sweep_prices
+
+    with BrowserPool.from_settings(settings) as pool:
+        matrix = sweep_prices(settings, pairs, cars, pool)
+    best: tuple[float, tuple[str, str]] | None = None
+    for pair, prices in matrix.items():
+        cells = "  ".join(f"{c}={prices.get(c)}" for c in cars)
+        logger.info(f"{pair[0]} ~ {pair[1]}  {cells}")
+        for p in prices.values():
+            if p is not None and (best is None or p < best[0]):
+                best = (p, pair)
+    if best is None:
+        logger.warning("Sweep found no prices.")
+    else:
+        logger.info(f"Cheapest: {best[0]} for {best[1][0]} ~ {best[1][1]}")
+
+
+def run_serve(settings: Settings, args: argparse.Namespace, logger: logging.Logger) -> None:
+    # 常驻查询服务：浏览器在抓取线程里按需启动，之后复用
+    from src.serve import PriceService, QueryServer
+
+    service = PriceService(settings, logger).start()
+    server = QueryServer(service, args.port or settings.serve_port, args.host or settings.serve_host).start()
+    logger.info(f"Query service on http://{args.host or settings.serve_host}:{server.port}/price (cache {settings.serve_cache_ttl_seconds:g}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        logger.info("Exiting on user request.")
+    finally:
+        server.close()
+        service.close()
+
+
+def run_worker(settings: Settings, args: argparse.Namespace, logger: logging.Logger) -> None:
+    # 任务队列 worker：可在多个进程/共享 data 卷的多台主机上同时运行
+    from src.jobqueue import Worker, queue_from_settings
+
+    queue = queue_from_settings(settings)
+    worker = Worker(settings, queue, logger, args.id or "")
+    # 指标文件按 worker id 区分，多个 worker 与协调者共享 data 卷时互不覆盖
+    metrics_server, metrics_file = _start_metrics(_worker_metrics_settings(settings, worker.id), logger)
+    watchdog = MemoryWatchdog.from_settings(settings, logger)
+    if watchdog is not None:
+        watchdog.start()
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        logger.info("Exiting on user request.")
+    finally:
+        if watchdog is not None:
+            watchdog.close()
+        if metrics_server is not None:
+            metrics_server.close()
+        if metrics_file is not None:
+            metrics_file.close()
+        queue.close()
+
+
+def _worker_metrics_settings(settings: Settings, worker_id: str) -> Settings:
+    if not settings.metrics_file:
+        return settings
+    path = Path(settings.metrics_file)
+    name = re.sub(r"[^\w.-]", "_", worker_id)
+    return replace(settings, metrics_file=str(path.with_name(f"{path.stem}.{name}{path.suffix}")))
+
+
+def run_history(args: argparse.Namespace) -> None:
+    # 不需要邮件配置，也不启动浏览器：直接查本地索引库
+    pickup_city = args.pickup_city or os.getenv("PICKUP_CITY", "敦煌")
+    return_city = args.return_city or os.getenv("RETURN_CITY", "德令哈")
+    route = route_key(pickup_city, return_city)
+    since = int(time.time()) - int(args.days * 86400)
+    t0 = time.perf_counter()
+    with ObservationStore(os.getenv("STORE_PATH", "data/observations.db")) as store:
+        rows = store.min_prices(route, since, car_name=args.car, pickup_date=args.pickup_date, return_date=args.return_date)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    print(f"Route {route}, last {args.days:g} days ({elapsed_ms:.1f} ms)")
+    if not rows:
+        print("No observations.")
+        return
+    for r in rows:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(r.ts))
+        print(f"  {r.car_name}: min {r.price} at {when} ({r.pickup_date} ~ {r.return_date}, {r.samples} samples)")
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="eHi price monitor")
     parser.add_argument("--once", action="store_true", help="Run a single check and send a test email with current price")
+    parser.add_argument("--sweep", metavar="PAIRS", help="Price matrix over date pairs (PICKUP:RETURN,... or a file) on one loaded page")
+    sub = parser.add_subparsers(dest="command")
+    hist = sub.add_parser("history", help="Query min prices from the local observation store")
+    hist.add_argument("--from", dest="pickup_city", help="Pickup city (default: PICKUP_CITY)")
+    hist.add_argument("--to", dest="return_city", help="Return city (default: RETURN_CITY)")
+    hist.add_argument("--days", type=float, default=7, help="Look-back window in days (default: 7)")
+    hist.add_argument("--car", help="Only this car name")
+    hist.add_argument("--pickup-date", help="Only this pickup date (YYYY-MM-DD)")
+    hist.add_argument("--return-date", help="Only this return date (YYYY-MM-DD)")
+    serve = sub.add_parser("serve", help="Answer price queries over local HTTP with a result cache")
+    serve.add_argument("--host", help="Listen address (default: SERVE_HOST)")
+    serve.add_argument("--port", type=int, help="Listen port (default: SERVE_PORT)")
+    work = sub.add_parser("worker", help="Run searches from the shared job queue (see DISPATCH=queue)")
+    work.add_argument("--id", help="Worker name (default: host-pid)")
     args = parser.parse_args()
 
     load_dotenv()
+    if args.command == "history":
+        run_history(args)
+        return
+
     settings = Settings.from_env()
-    logger = setup_logging(settings.debug)
+    logger = setup_logging(settings.debug, settings.log_max_mb, settings.log_backup_count)
+    if args.command == "serve":
+        run_serve(settings, args, logger)
+        return
+    if args.command == "worker":
+        run_worker(settings, args, logger)
+        return
+    watches = load_watches(settings)
 
-    data_file = Path("data/last_price.json")
+    store = ObservationStore(settings.store_path)
 
     logger.info("eHi price monitor started.")
-    logger.info(f"Target: {settings.car_name}")
     logger.info("Mode: firstStep form fill")
     logger.info(f"Base URL: {EHI_BASE_URL}")
-    logger.info(f"Pickup: {settings.pickup_city} {settings.pickup_date}")
-    logger.info(f"Return: {settings.return_city} {settings.return_date}")
-    if settings.alert_price is not None:
-        logger.info(f"Alert threshold: <= {settings.alert_price}")
-    logger.info(f"Interval: {settings.check_interval_seconds}s")
+    logger.info(f"Watches: {len(watches)} ({len(group_by_search(watches))} searches)")
+    for w in watches:
+        alert = f", alert <= {w.alert_price}" if w.alert_price is not None else ""
+        logger.info(f"Target [{w.id}]: {w.car_name} | {w.search.label()}{alert}")
+    logger.info(f"Interval: {settings.check_interval_seconds}s ({settings.poll_mode})")
+
+    if args.sweep:
+        run_sweep(settings, args.sweep, logger)
+        return
 
     # One-shot test mode: fetch once and email regardless of change
     if args.once:
         try:
-            price = get_current_price(settings)
-            if price is None:
-                logger.warning("Could not find price for the target car.")
-                sys.exit(2)
-            logger.info(f"Current price: {price}")
-            append_price_observation(settings, price, last_price=None)
-            # If alert threshold is set, only send when price <= threshold
-            if (settings.alert_price is not None) and (price > settings.alert_price):
-                logger.info(f"Skip email: price {price} exceeds alert threshold {settings.alert_price}.")
-            else:
+            # 即便只查一次，重试也复用同一个浏览器
+            with BrowserPool.from_settings(settings) as pool:
+                prices = fetch_watch_prices(settings, watches, pool, logger)
+            logger.info(f"Prices fetched {time.perf_counter() - STARTED:.2f}s after start")
+            from src.notifier import send_current_price_email
+
+            exit_code = 0
+            observations: list[Observation] = []
+            for w in watches:
+                ws = settings_for_watch(settings, w)
+                price = prices.get(w.id)
+                if price is None:
+                    logger.warning(f"Could not find price for [{w.id}] {w.car_name}.")
+                    exit_code = exit_code or 2
+                    continue
+                logger.info(f"Current price [{w.id}]: {price}")
+                append_price_observation(ws, price, last_price=None, watch_id=w.id)
+                observations.append(_observation(w, price))
+                # If alert threshold is set, only send when price <= threshold
+                if (ws.alert_price is not None) and (price > ws.alert_price):
+                    logger.info(f"Skip email: price {price} exceeds alert threshold {ws.alert_price}.")
+                    continue
                 try:
-                    send_current_price_email(settings, price)
+                    send_current_price_email(ws, price)
                     logger.info("Test email sent.")
                 except Exception as e:
                     logger.error(f"Failed to send email: {e}")
-                    sys.exit(3)
-            sys.exit(0)
+                    exit_code = 3
+            store.record_poll(observations)
+            sys.exit(exit_code)
         except KeyboardInterrupt:
             print("Exiting on user request.")
             sys.exit(1)
@@ -123,41 +385,251 @@ def main() -> None:
             print(f"Error during check: {e}")
             sys.exit(1)
 
-    last_price = load_last_price(data_file)
-    if last_price is not None:
-        logger.info(f"Last known price: {last_price}")
+    last_prices = initial_last_prices(store, logger)
+    for w in watches:
+        if w.id in last_prices:
+            logger.info(f"Last known price [{w.id}]: {last_prices[w.id]}")
+
+    # 常驻浏览器：整个主循环共用，每次轮询只付出导航与填表的开销
+    pool = BrowserPool.from_settings(settings)
+    metrics_server, metrics_file = _start_metrics(settings, logger)
+    # 通知走后台发件箱，邮件服务器慢或不可用时不拖慢下一次轮询
+    from src.outbox import outbox_from_settings
+
+    outbox = outbox_from_settings(settings, logger)
+    if outbox is not None:
+        outbox.start()
+        backlog = outbox.pending()
+        if backlog:
+            logger.info(f"Outbox: {backlog} pending notifications from previous run")
+    # 同一 watch 连续失败后暂停一段时间，避免反复在必然失败的查询上消耗浏览器会话
+    breaker = CircuitBreaker.from_settings(settings)
+    # 内存看门狗：采样 RSS 写入指标；KILL_ORPHAN_CHROMIUM=1 时清理本进程启动过、驱动已退出的 Chromium
+    watchdog = MemoryWatchdog.from_settings(settings, logger)
+    if watchdog is not None:
+        watchdog.start()
+        logger.info(f"Memory: {watchdog.describe()}")
+    # 观测日志的旧段（含旧格式的逐次完整记录）在后台按游程编码重写并 gzip 归档
+    compactor = compactor_from_settings(settings, logger)
+    if compactor is not None:
+        compactor.start()
+    try:
+        _monitor_loop(settings, watches, pool, logger, store, last_prices, outbox, breaker, watchdog)
+    finally:
+        if compactor is not None:
+            compactor.close()
+        if watchdog is not None:
+            watchdog.close()
+        pool.close()
+        if outbox is not None:
+            outbox.close()
+        if metrics_server is not None:
+            metrics_server.close()
+        if metrics_file is not None:
+            metrics_file.close()
+        store.close()
+
+
+def _start_metrics(settings: Settings, logger: logging.Logger) -> tuple[MetricsServer | None, MetricsFileWriter | None]:
+    server = None
+    if settings.metrics_port > 0:
+        try:
+            server = MetricsServer(settings.metrics_port, settings.metrics_host).start()
+            logger.info(f"Metrics: http://{settings.metrics_host}:{server.port}/metrics")
+        except OSError as e:
+            logger.error(f"Metrics endpoint disabled: {e}")
+    writer = None
+    if settings.metrics_file:
+        writer = MetricsFileWriter(settings.metrics_file, settings.metrics_file_interval_seconds).start()
+        logger.info(f"Metrics file: {settings.metrics_file} (every {settings.metrics_file_interval_seconds:g}s)")
+    return server, writer
+
+
+def _observation(watch: Watch, price: float) -> Observation:
+    return Observation(
+        watch_id=watch.id,
+        route=route_key(watch.search.pickup_city, watch.search.return_city),
+        pickup_date=watch.search.pickup_date,
+        return_date=watch.search.return_date,
+        car_name=watch.car_name,
+        price=price,
+    )
+
+
+def _handle_price(
+    settings: Settings,
+    watch: Watch,
+    price: float,
+    last_prices: dict[str, float],
+    logger: logging.Logger,
+    outbox: Outbox | None = None,
+) -> bool:
+    # 返回 True 表示 last_prices 已更新，需要落盘
+    ws = settings_for_watch(settings, watch)
+    last_price = last_prices.get(watch.id)
+    logger.info(f"Current price [{watch.id}]: {price}")
+    append_price_observation(ws, price, last_price, watch_id=watch.id)
+    # Only notify when price changed AND below/equal to alert threshold if set
+    should_notify = True
+    if ws.alert_price is not None and price > ws.alert_price:
+        should_notify = False
+        logger.info(f"Skip notify: price {price} exceeds alert threshold {ws.alert_price}.")
+    if ((last_price is None) or (price != last_price)) and should_notify:
+        logger.info(f"Price change detected [{watch.id}]: {last_price} -> {price}")
+        if outbox is not None:
+            from src.outbox import PriceChange
+
+            outbox.enqueue(PriceChange.of(ws, watch.id, last_price, price))
+            logger.info("Notification queued.")
+        else:
+            from src.notifier import send_price_change_email
 
+            try:
+                send_price_change_email(ws, old_price=last_price, new_price=price)
+                logger.info("Notification email sent.")
+            except Exception as e:
+                logger.error(f"Failed to send email: {e}")
+        last_prices[watch.id] = price
+        return True
+    return False
+
+
+def _poll(
+    settings: Settings,
+    watches: list[Watch],
+    pool: BrowserPool,
+    logger: logging.Logger,
+    store: ObservationStore,
+    last_prices: dict[str, float],
+    outbox: Outbox | None = None,
+    breaker: CircuitBreaker | None = None,
+) -> dict[str, float | None]:
+    if breaker is not None:
+        skipped = [w for w in watches if not breaker.allow(w.id)]
+        for w in skipped:
+            logger.info(f"Skip [{w.id}]: circuit open, next try in {breaker.remaining(w.id):.0f}s")
+        watches = [w for w in watches if w not in skipped]
+        if not watches:
+            POLLS.inc(result="skipped")
+            return {}
+    try:
+        with POLL_SECONDS.time():
+            prices = fetch_watch_prices(settings, watches, pool, logger)
+    except Exception:
+        POLLS.inc(result="error")
+        _record_breaker(breaker, watches, {}, logger)
+        raise
+    if any(p is not None for p in prices.values()):
+        POLLS.inc(result="ok")
+    else:
+        POLLS.inc(result="no_price" if prices else "error")
+    _record_breaker(breaker, watches, prices, logger)
+    observations: list[Observation] = []
+    changed: dict[str, float] = {}
+    for w in watches:
+        price = prices.get(w.id)
+        if price is None:
+            logger.warning(f"Could not find price for [{w.id}] {w.car_name}. Will retry later.")
+            continue
+        observations.append(_observation(w, price))
+        if _handle_price(settings, w, price, last_prices, logger, outbox):
+            changed[w.id] = price
+    # 本轮观测与最近价格在同一事务中写入
+    store.record_poll(observations, changed)
+    return prices
+
+
+def _record_breaker(breaker: CircuitBreaker | None, watches: list[Watch], prices: dict[str, float | None], logger: logging.Logger) -> None:
+    if breaker is None:
+        return
+    # 只有查询出错（不在结果里）才算失败；查询成功但没有价格（售罄/车型下架）不触发熔断
+    for w in watches:
+        cooldown = breaker.record(w.id, w.id in prices)
+        if cooldown is not None:
+            logger.warning(f"Circuit open [{w.id}] after repeated failures: skip for {cooldown:.0f}s")
+
+
+def _check_memory(watchdog: MemoryWatchdog | None, logger: logging.Logger) -> None:
+    if watchdog is None:
+        return
+    watchdog.check()
+    logger.info(f"Memory: {watchdog.describe()}")
+    if watchdog.over_limit():
+        # 正常退出（finally 中关闭浏览器与发件箱），由 docker 的 restart 策略重新拉起
+        logger.error(f"Monitor RSS above MONITOR_MAX_RSS_MB={watchdog.monitor_max_bytes // (1024 * 1024)}; exiting for a clean restart")
+        sys.exit(75)
+
+
+def _monitor_loop(
+    settings: Settings,
+    watches: list[Watch],
+    pool: BrowserPool,
+    logger: logging.Logger,
+    store: ObservationStore,
+    last_prices: dict[str, float],
+    outbox: Outbox | None = None,
+    breaker: CircuitBreaker | None = None,
+    watchdog: MemoryWatchdog | None = None,
+) -> None:
+    if settings.poll_mode == "adaptive":
+        _adaptive_loop(settings, watches, pool, logger, store, last_prices, outbox, breaker, watchdog)
+        return
     while True:
         try:
-            price = get_current_price(settings)
-            if price is None:
-                logger.warning("Could not find price for the target car. Will retry later.")
-            else:
-                logger.info(f"Current price: {price}")
-                append_price_observation(settings, price, last_price)
-                # Only notify when price changed AND below/equal to alert threshold if set
-                should_notify = True
-                if settings.alert_price is not None and price > settings.alert_price:
-                    should_notify = False
-                    logger.info(f"Skip notify: price {price} exceeds alert threshold {settings.alert_price}.")
-                if ((last_price is None) or (price != last_price)) and should_notify:
-                    change = None if last_price is None else price - last_price
-                    logger.info(f"Price change detected: {last_price} -> {price}")
-                    try:
-                        send_price_change_email(settings, old_price=last_price, new_price=price)
-                        logger.info("Notification email sent.")
-                    except Exception as e:
-                        logger.error(f"Failed to send email: {e}")
-                    save_last_price(data_file, price)
-                    last_price = price
+            _poll(settings, watches, pool, logger, store, last_prices, outbox, breaker)
         except KeyboardInterrupt:
             logger.info("Exiting on user request.")
             break
         except Exception as e:
             logger.error(f"Error during check: {e}")
+        _check_memory(watchdog, logger)
 
         time.sleep(settings.check_interval_seconds)
 
 
+def _adaptive_loop(
+    settings: Settings,
+    watches: list[Watch],
+    pool: BrowserPool,
+    logger: logging.Logger,
+    store: ObservationStore,
+    last_prices: dict[str, float],
+    outbox: Outbox | None = None,
+    breaker: CircuitBreaker | None = None,
+    watchdog: MemoryWatchdog | None = None,
+) -> None:
+    # 每个查询按自己的节奏到期；async 引擎一次取多个到期查询并发执行
+    scheduler = AdaptiveScheduler.from_settings(settings, watches)
+    limit = settings.async_concurrency if settings.fetch_engine == "async" else 1
+    if settings.dispatch_mode == "queue":
+        # 到期的查询一次全部入队，由 worker 并行消化
+        limit = len(watches)
+    budget = f", budget {settings.sessions_per_hour}/h" if settings.sessions_per_hour > 0 else ""
+    logger.info(f"Adaptive polling: {settings.min_interval_seconds}-{settings.max_interval_seconds}s{budget}")
+    while True:
+        try:
+            keys, wait = scheduler.next_batch(limit)
+            if not keys:
+                time.sleep(wait)
+                continue
+            batch = [w for k in keys for w in scheduler.watches_for(k)]
+            try:
+                prices = _poll(settings, batch, pool, logger, store, last_prices, outbox, breaker)
+            except Exception as e:
+                logger.error(f"Error during check: {e}")
+                prices = {}
+            for k in keys:
+                group = scheduler.watches_for(k)
+                # 与熔断一致：查询出错才计入错误率，售罄（无价格）不算
+                ok = any(w.id in prices for w in group)
+                histories = {w.id: [p for _, p in store.recent_prices(w.id, VOLATILITY_WINDOW)] for w in group}
+                delay = scheduler.complete(k, ok, histories)
+                logger.info(f"Next check [{k.label()}] in {delay:.0f}s")
+            _check_memory(watchdog, logger)
+        except KeyboardInterrupt:
+            logger.info("Exiting on user request.")
+            break
+
+
 if __name__ == "__main__":
     main()
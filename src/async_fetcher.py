@@ -0,0 +1,754 @@
+import asyncio
+import atexit
+import os
+import threading
+import time
+from dataclasses import replace
+from typing import Any, Awaitable, Mapping, Optional, Sequence
+
+from playwright.async_api import async_playwright, Browser, Locator, Page, Playwright
+
+from .browser_pool import PoolLimits, context_options, launch_options, profile_from_settings
+from .city_cache import (
+    APPLY_FORM_STATE_JS,
+    FORM_STATE_JS,
+    ROUTE_TEXT_JS,
+    SCRIPTS_JS,
+    city_cache_from_settings,
+    fingerprint,
+    route_confirmed,
+    state_diff,
+)
+from .config import Settings, EHI_BASE_URL
+from .http_cache import DiskHttpCache
+from .cards import CARDS_JS, HARVEST_JS, CardRow, Harvest, match_for, rows_from_js
+from .fetcher import (
+    ANTD_DROPDOWNS,
+    CITY_APPLIED_JS,
+    CITY_SEARCH_CLOSED_JS,
+    DATE_APPLIED_JS,
+    FORCE_SET_JS,
+    SEARCH_BUTTON_RE,
+    SEARCH_FALLBACK_SELECTORS,
+    month_delta,
+)
+from .metrics import EXTRACT_STRATEGY, HARVEST_SCROLLS, HARVEST_STOPS, PHASE_SECONDS, SEARCHES
+from .payload import ResultsCapture
+from .replay import replayer_from_settings
+from .resilience import PhaseError, PhaseRunner
+from .routing import blocker_from_settings
+from .snapshot import inventory_from_cards, inventory_from_offers, save_inventory
+from .watches import SearchKey, settings_for_search
+from .watchdog import kill_orphans, track_launched
+
+# asyncio 版抓取引擎：一个浏览器内并发跑多个 firstStep 查询，每个查询独立 context，
+# 用信号量限制并发，用 asyncio.wait_for 限制单次查询耗时。
+# 流程与 fetcher._form_fill_search 保持一致，页面侧脚本、跳月计算、查询按钮兜底与车型匹配共用 fetcher 中的实现。
+# 浏览器由 AsyncBrowserPool 跨轮询复用，回收条件（次数/时长/RSS/健康检查）与同步引擎的 BrowserPool 相同。
+
+
+class AsyncBrowserPool(PoolLimits):
+    # asyncio.run 每次新建事件循环，Playwright 对象无法跨轮询保留：浏览器放在专用的事件循环线程上，
+    # 各轮询通过 run() 把协程提交过去。回收只在轮询开始时检查，轮询内的并发查询共用同一个浏览器。
+    def __init__(
+        self,
+        headful: bool = False,
+        max_uses: int = 50,
+        max_age_seconds: int = 3600,
+        fast: bool = False,
+        max_rss_mb: float = 0.0,
+        kill_orphans: bool = False,
+    ) -> None:
+        super().__init__(max_uses, max_age_seconds, max_rss_mb, kill_orphans)
+        self.headful = headful
+        self.fast = fast
+        self._pw: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_settings(settings: Settings) -> "AsyncBrowserPool":
+        return AsyncBrowserPool(
+            headful=settings.headful,
+            max_uses=settings.browser_max_uses,
+            max_age_seconds=settings.browser_max_age_seconds,
+            fast=settings.fast_mode,
+            max_rss_mb=settings.browser_max_rss_mb,
+            kill_orphans=settings.kill_orphan_chromium,
+        )
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="async-browser", daemon=True)
+                self._thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def is_healthy(self) -> bool:
+        try:
+            return self._browser is not None and self._browser.is_connected()
+        except Exception:
+            return False
+
+    async def browser(self) -> Browser:
+        if self._browser is None:
+            await self._start()
+        else:
+            reason = "unhealthy" if not self.is_healthy() else self._recycle_reason()
+            if reason is not None:
+                self._log_restart(reason)
+                await self._stop_browser()
+                await self._start()
+                self.restarts += 1
+        assert self._browser is not None
+        return self._browser
+
+    def served(self, n: int = 1) -> None:
+        self._uses += n
+
+    async def _start(self) -> None:
+        if self._pw is None:
+            self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch(**launch_options(self.headful, self.fast))
+        track_launched()
+        self._uses = 0
+        self._started_at = time.monotonic()
+
+    async def _stop_browser(self) -> None:
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+        self._browser = None
+        if self.kill_orphans:
+            killed = kill_orphans()
+            if killed:
+                print(f"[pool] killed orphaned Chromium: {killed}")
+
+    async def _shutdown(self) -> None:
+        await self._stop_browser()
+        if self._pw is not None:
+            try:
+                await self._pw.stop()
+            except Exception:
+                pass
+            self._pw = None
+
+    def close(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=30)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+
+
+_pool: Optional[AsyncBrowserPool] = None
+
+
+def async_pool_from_settings(settings: Settings) -> AsyncBrowserPool:
+    # 进程内共用一个（各入口都只有一个抓取线程）；退出时关闭
+    global _pool
+    if _pool is None:
+        _pool = AsyncBrowserPool.from_settings(settings)
+        atexit.register(_pool.close)
+    return _pool
+
+
+async def _debug_dump(page: Page, s: Settings, name: str) -> None:
+    if not s.debug:
+        return
+    os.makedirs(s.debug_dir, exist_ok=True)
+    # 并发查询时按行程区分文件名，避免互相覆盖
+    safe = f"{name}_{s.pickup_city}-{s.return_city}_{s.pickup_date}_{s.return_date}".replace("/", "_")
+    try:
+        await page.screenshot(path=f"{s.debug_dir}/{safe}.png", full_page=True)
+    except Exception:
+        pass
+    try:
+        html = await page.content()
+        with open(f"{s.debug_dir}/{safe}.html", "w", encoding="utf-8") as f:
+            f.write(html)
+    except Exception:
+        pass
+
+
+async def _pause(page: Page, s: Settings, ms: int) -> None:
+    # 保守模式下的固定等待；快速模式跳过
+    if not s.fast_mode:
+        await page.wait_for_timeout(ms)
+
+
+async def _fill_city(page: Page, s: Settings, field_id: str, city: str, cached: Optional[list] = None) -> None:
+    # 与 FormSession.fill_city 相同：先尝试一步写回缓存的表单状态，失败再走交互并写缓存
+    cache = city_cache_from_settings(s)
+    if cache is None:
+        await _fill_city_interactive(page, s, field_id, city)
+        return
+    try:
+        site = fingerprint(await page.evaluate(SCRIPTS_JS))
+    except Exception:
+        site = ""
+    state = cache.get(field_id, city, site)
+    if state:
+        try:
+            await page.evaluate(APPLY_FORM_STATE_JS, state)
+            el = page.locator(f"#{field_id}").first
+            if await el.count() > 0 and await page.evaluate(CITY_APPLIED_JS, [await el.element_handle(), city]):
+                if cached is not None:
+                    cached.append((field_id, city))
+                return
+        except Exception:
+            pass
+        cache.invalidate(field_id, city)
+    try:
+        before = await page.evaluate(FORM_STATE_JS)
+    except Exception:
+        before = None
+    if await _fill_city_interactive(page, s, field_id, city) and before is not None:
+        try:
+            cache.put(field_id, city, site, state_diff(before, await page.evaluate(FORM_STATE_JS)))
+        except Exception:
+            pass
+
+
+async def _fill_city_interactive(page: Page, s: Settings, field_id: str, city: str) -> bool:
+    try:
+        el = page.locator(f"#{field_id}").first
+        if await el.count() == 0:
+            return False
+        variants = [city, f"{city}市"]
+        for _ in range(2):
+            await el.click()
+            await el.fill("")
+            await el.type(city, delay=0 if s.fast_mode else 20)
+            await _pause(page, s, 150)
+            try:
+                await page.keyboard.press("Enter")
+            except Exception:
+                pass
+            await _pause(page, s, 150)
+
+            clicked = False
+            city_dd = page.locator(".city-search").first
+            try:
+                await city_dd.wait_for(state="visible", timeout=1200)
+                for v in variants:
+                    opt = city_dd.locator(f"xpath=.//li[normalize-space(text())='{v}']").first
+                    if await opt.count() > 0:
+                        await opt.click()
+                        clicked = True
+                        break
+            except Exception:
+                pass
+
+            if not clicked:
+                dropdowns = page.locator(ANTD_DROPDOWNS)
+                try:
+                    await dropdowns.wait_for(state="visible", timeout=3000)
+                except Exception:
+                    pass
+                for v in variants:
+                    opt = dropdowns.locator(
+                        f"xpath=.//*[self::div or self::span or self::li or self::a][normalize-space(text())='{v}' and not(ancestor::*[contains(@style,'display: none')])]"
+                    ).first
+                    if await opt.count() == 0:
+                        opt = page.locator(
+                            f"xpath=(//*[self::li or self::div or self::a or self::span][normalize-space(text())='{v}' and not(ancestor::*[contains(@style,'display: none')])])[1]"
+                        )
+                    if await opt.count() > 0:
+                        await opt.click()
+                        clicked = True
+                        break
+
+            if not clicked:
+                await page.keyboard.press("ArrowDown")
+                await page.keyboard.press("Enter")
+                if s.fast_mode:
+                    try:
+                        await page.wait_for_function(CITY_APPLIED_JS, arg=[await el.element_handle(), city], timeout=1500)
+                    except Exception:
+                        pass
+                else:
+                    await page.wait_for_timeout(600)
+
+            title = await el.get_attribute("title") or ""
+            value = await el.get_attribute("value") or ""
+            if (city in title) or (city in value):
+                try:
+                    await page.wait_for_function(CITY_SEARCH_CLOSED_JS, timeout=1200)
+                except Exception:
+                    pass
+                return True
+        await el.evaluate(FORCE_SET_JS, city)
+    except Exception:
+        pass
+    return False
+
+
+async def _set_date(page: Page, s: Settings, date_id: str, date_label: str, date_value: str) -> bool:
+    inp = page.locator(f"#{date_id}").first
+    if await inp.count() == 0:
+        inp = page.locator(f"xpath=//*[contains(text(), '{date_label}')]/following::input[1]").first
+    if await inp.count() == 0:
+        print(f"[async] err: 未找到 {date_label} 输入框")
+        return False
+
+    async def applied() -> bool:
+        try:
+            val = await inp.get_attribute("value") or ""
+            title = await inp.get_attribute("title") or ""
+            return (date_value in val) or (date_value in title)
+        except Exception:
+            return False
+
+    for _ in range(2):
+        try:
+            container = inp.locator("xpath=ancestor::div[contains(@class,'ant-picker')][1]")
+            await (container if await container.count() > 0 else inp).click()
+            dd_all = page.locator(".ant-picker-dropdown:not(.ant-picker-dropdown-hidden)")
+            await dd_all.wait_for(state="visible", timeout=6000)
+            dd = dd_all.last
+            cell = dd.locator(f".ant-picker-cell[title='{date_value}']").first
+            if await cell.count() == 0 and await _jump_to_month(dd, date_value):
+                try:
+                    await cell.wait_for(state="attached", timeout=1500)
+                except Exception:
+                    pass
+            if await cell.count() == 0:
+                for _ in range(12):
+                    await dd.locator(".ant-picker-header-next-btn").first.click()
+                    if s.fast_mode:
+                        try:
+                            await cell.wait_for(state="attached", timeout=250)
+                            break
+                        except Exception:
+                            continue
+                    await page.wait_for_timeout(120)
+                    if await cell.count() > 0:
+                        break
+            if await cell.count() > 0:
+                await cell.click()
+                try:
+                    await page.wait_for_function(DATE_APPLIED_JS, arg=[await inp.element_handle(), date_value], timeout=1500)
+                except Exception:
+                    pass
+            try:
+                ok_btn = dd.locator("xpath=.//button[normalize-space(text())='确定']").first
+                if await ok_btn.count() > 0:
+                    await ok_btn.click()
+            except Exception:
+                pass
+            await page.keyboard.press("Escape")
+        except Exception:
+            pass
+        if await applied():
+            return True
+        await _pause(page, s, 120)
+
+    print(f"[async] warn: {date_label} 未生效 -> 直接赋值兜底")
+    try:
+        await inp.evaluate(FORCE_SET_JS, date_value)
+    except Exception:
+        return False
+    return await applied()
+
+
+async def _jump_to_month(dd: Locator, date_value: str) -> bool:
+    # 与 FormSession._jump_to_month 相同：按面板标题算出月数差，连续翻页，跨年用双箭头
+    try:
+        header = await dd.locator(".ant-picker-header-view").first.inner_text()
+    except Exception:
+        return False
+    delta = month_delta(header, date_value)
+    if delta == 0:
+        return False
+    forward = delta > 0
+    years, months = divmod(abs(delta), 12)
+    try:
+        year_btn = dd.locator(".ant-picker-header-super-next-btn" if forward else ".ant-picker-header-super-prev-btn").first
+        month_btn = dd.locator(".ant-picker-header-next-btn" if forward else ".ant-picker-header-prev-btn").first
+        for _ in range(years):
+            await year_btn.click()
+        for _ in range(months):
+            await month_btn.click()
+    except Exception:
+        return False
+    return True
+
+
+async def _navigate(page: Page, s: Settings) -> None:
+    try:
+        await page.goto(EHI_BASE_URL, wait_until="domcontentloaded", timeout=60000)
+    except Exception:
+        try:
+            await page.goto(EHI_BASE_URL, wait_until="load", timeout=60000)
+        except Exception:
+            pass
+    try:
+        await page.wait_for_selector("#pickupcity", timeout=30000, state="visible")
+        await page.wait_for_selector("#returncity", timeout=30000, state="visible")
+    except Exception:
+        await page.wait_for_load_state("networkidle")
+    await _debug_dump(page, s, "01_loaded_firstStep")
+    await _check_loaded(page)
+
+
+async def _check_loaded(page: Page) -> None:
+    try:
+        ok = await page.locator("#pickupcity").first.is_visible() and await page.locator("#returncity").first.is_visible()
+    except Exception:
+        ok = False
+    if not ok:
+        raise PhaseError("navigate", "city inputs not visible")
+
+
+async def _fill_cities(page: Page, s: Settings, cached: Optional[list]) -> None:
+    for field_id, city in (("pickupcity", s.pickup_city), ("returncity", s.return_city)):
+        await _fill_city(page, s, field_id, city, cached)
+    for field_id, city in (("pickupcity", s.pickup_city), ("returncity", s.return_city)):
+        try:
+            el = page.locator(f"#{field_id}").first
+            ok = await el.count() > 0 and bool(await page.evaluate(CITY_APPLIED_JS, [await el.element_handle(), city]))
+        except Exception:
+            ok = False
+        if not ok:
+            raise PhaseError("city", f"{field_id} is not {city}")
+
+
+async def _set_dates(page: Page, s: Settings) -> None:
+    ok1 = await _set_date(page, s, "pickupdate", "取车日期", s.pickup_date)
+    ok2 = await _set_date(page, s, "returndate", "还车日期", s.return_date)
+    if not (ok1 and ok2):
+        raise PhaseError("date", f"{s.pickup_date} ~ {s.return_date} not applied")
+
+
+async def _form_ready(page: Page) -> bool:
+    try:
+        return await page.locator("#pickupdate").count() > 0 and await page.locator("#pickupdate").first.is_visible()
+    except Exception:
+        return False
+
+
+# 重试前的恢复：只回到该阶段的前置状态，不重开页面
+async def _ensure_loaded(page: Page, s: Settings) -> None:
+    try:
+        await _check_loaded(page)
+    except PhaseError:
+        await _navigate(page, s)
+
+
+async def _ensure_form(page: Page, s: Settings, cached: Optional[list]) -> None:
+    try:
+        await page.keyboard.press("Escape")
+    except Exception:
+        pass
+    if not await _form_ready(page):
+        await _navigate(page, s)
+        await _fill_cities(page, s, cached)
+
+
+async def _prepare_resubmit(page: Page, s: Settings, cached: Optional[list]) -> None:
+    if not await _form_ready(page):
+        await _navigate(page, s)
+        await _fill_cities(page, s, cached)
+        await _set_dates(page, s)
+    try:
+        await page.evaluate("() => document.querySelectorAll('.cartype-list').forEach(e => e.setAttribute('data-ehi-stale', '1'))")
+    except Exception:
+        pass
+
+
+async def _results_seen(page: Page, capture: Optional[ResultsCapture]) -> bool:
+    if capture is not None and capture.offers:
+        return True
+    try:
+        if await page.locator(".cartype-list:not([data-ehi-stale])").count() > 0:
+            return True
+        if await page.locator("[data-ehi-stale]").count() > 0:
+            return False
+        return await page.locator("text=预订").count() > 0 or await page.locator("text=日均").count() > 0
+    except Exception:
+        return False
+
+
+async def _submit(page: Page, s: Settings, capture: Optional[ResultsCapture]) -> None:
+    async def click_search() -> None:
+        try:
+            await page.get_by_role("button", name=SEARCH_BUTTON_RE).first.click()
+            return
+        except Exception:
+            pass
+        for selector in SEARCH_FALLBACK_SELECTORS:
+            try:
+                await page.locator(selector).first.click()
+                return
+            except Exception:
+                continue
+        await page.keyboard.press("Enter")
+
+    async def wait_results_dom() -> None:
+        if not s.fast_mode:
+            await page.wait_for_load_state("networkidle")
+            await page.wait_for_timeout(800)
+        try:
+            await page.wait_for_selector(".cartype-list:not([data-ehi-stale]), text=预订", timeout=15000)
+        except Exception:
+            try:
+                await page.wait_for_selector("text=日均", timeout=6000)
+            except Exception:
+                pass
+
+    if capture is None:
+        await click_search()
+        await wait_results_dom()
+    else:
+        page.on("response", capture.record)
+        try:
+            try:
+                async with page.expect_response(capture.matches, timeout=int(s.results_api_timeout_seconds * 1000)):
+                    await click_search()
+            except Exception:
+                pass
+            if not await capture.drain_async():
+                await wait_results_dom()
+                await capture.drain_async()
+        finally:
+            page.remove_listener("response", capture.record)
+    if not await _results_seen(page, capture):
+        raise PhaseError("search", "no results rendered")
+
+
+async def _form_fill_search(
+    page: Page,
+    s: Settings,
+    capture: Optional[ResultsCapture] = None,
+    cached: Optional[list] = None,
+    runner: Optional[PhaseRunner] = None,
+) -> None:
+    # 与 fetcher._form_fill_search 相同：各阶段单独重试，失败时在同一页面上从前一个检查点继续
+    r = runner or PhaseRunner.from_settings(s)
+    await r.run_async("navigate", lambda: _navigate(page, s))
+    await r.run_async("city", lambda: _fill_cities(page, s, cached), restore=lambda: _ensure_loaded(page, s))
+    await r.run_async("date", lambda: _set_dates(page, s), restore=lambda: _ensure_form(page, s, cached))
+    await _debug_dump(page, s, "02_filled_form")
+    await r.run_async("search", lambda: _submit(page, s, capture), restore=lambda: _prepare_resubmit(page, s, cached), required=False)
+    await _debug_dump(page, s, "03_results")
+
+
+async def _search_once(
+    browser: Browser,
+    s: Settings,
+    car_names: Sequence[str],
+    storage_state_path: Optional[str] = None,
+    http_cache: Optional[DiskHttpCache] = None,
+) -> dict[str, Optional[float]]:
+    # 每个查询独立 context：表单状态互不干扰；开启持久化 profile 时共用 storage_state 与磁盘 HTTP 缓存
+    opts = context_options()
+    if storage_state_path and os.path.isfile(storage_state_path):
+        opts["storage_state"] = storage_state_path
+    context = await browser.new_context(**opts)
+    if http_cache is not None:
+        await context.route("**/*", http_cache.handle_async)
+    try:
+        page = await context.new_page()
+        page.set_default_navigation_timeout(60000)
+        page.set_default_timeout(15000)
+        blocker = blocker_from_settings(s)
+        if blocker is not None:
+            await page.route("**/*", blocker.handle_async)
+            page.on("requestfinished", blocker.on_finished)
+        try:
+            return await _search_page(page, s, car_names)
+        finally:
+            if blocker is not None:
+                stats = await blocker.collect_bytes_async()
+                print(f"[net] {s.pickup_city}-{s.return_city} {s.pickup_date}: {stats.summary()}")
+            if storage_state_path:
+                # 并发查询各自写临时文件再替换，最后完成的为准
+                tmp = f"{storage_state_path}.{id(context)}.tmp"
+                try:
+                    await context.storage_state(path=tmp)
+                    os.replace(tmp, storage_state_path)
+                except Exception:
+                    pass
+    finally:
+        await context.close()
+
+
+async def _search_page(page: Page, s: Settings, car_names: Sequence[str]) -> dict[str, Optional[float]]:
+    capture = ResultsCapture(s.results_api_pattern) if s.results_capture else None
+    cached: list[tuple[str, str]] = []
+    runner = PhaseRunner.from_settings(s)
+    try:
+        await _form_fill_search(page, s, capture, cached, runner)
+        if cached and not await _route_confirmed(page, s, capture):
+            # 写回的城市没有被站点采用：让缓存失效，不用缓存完整填表重新查询
+            cache = city_cache_from_settings(s)
+            for field_id, city in cached:
+                cache.invalidate(field_id, city)
+            print(f"[form] results do not show {s.pickup_city}->{s.return_city} with cached city state; cache invalidated for {cached}")
+            cached.clear()
+            capture = ResultsCapture(s.results_api_pattern) if s.results_capture else None
+            await _form_fill_search(page, replace(s, city_cache=False), capture, cached, runner)
+        prices = await runner.run_async("extract", lambda: _extract(page, s, car_names, capture))
+    finally:
+        if runner.report.attempts:
+            print(f"[retry] {s.pickup_city}-{s.return_city} {s.pickup_date}: {runner.report.summary()}")
+    cache = city_cache_from_settings(s)
+    if cache is not None and cached:
+        # 使用了缓存的城市状态却没有任何价格：让缓存失效，下次走交互
+        for field_id, city in cached:
+            if all(p is None for p in prices.values()):
+                cache.invalidate(field_id, city)
+            else:
+                cache.confirm(field_id, city)
+    replayer = replayer_from_settings(s)
+    if replayer is not None and capture is not None and capture.request is not None and any(p is not None for p in prices.values()):
+        try:
+            replayer.remember(s, capture.request, await page.context.cookies())
+        except Exception as e:
+            print(f"[replay] could not save template: {e}")
+    return prices
+
+
+async def _route_confirmed(page: Page, s: Settings, capture: Optional[ResultsCapture]) -> bool:
+    # 与 FormSession.verify_cached_route 相同：结果里回显的城市必须是本次查询的城市
+    texts = capture.evidence() if capture is not None else []
+    try:
+        texts.append(await page.evaluate(ROUTE_TEXT_JS) or "")
+    except Exception:
+        pass
+    return route_confirmed((s.pickup_city, s.return_city), texts)
+
+
+async def _extract(
+    page: Page,
+    s: Settings,
+    car_names: Sequence[str],
+    capture: Optional[ResultsCapture],
+) -> dict[str, Optional[float]]:
+    names = list(dict.fromkeys(car_names))
+    if capture is not None and capture.offers:
+        prices = {c: capture.price_for(c) for c in names}
+        for p in prices.values():
+            EXTRACT_STRATEGY.inc(strategy="api" if p is not None else "miss")
+        save_inventory(s, inventory_from_offers(capture.offers, "api"))
+        return prices
+    rows = await _harvest(page, s, names)
+    save_inventory(s, inventory_from_cards(rows))
+    prices = {}
+    for c in names:
+        prices[c], source = match_for(rows, c)
+        if source:
+            EXTRACT_STRATEGY.inc(strategy=source)
+    missing = [c for c, p in prices.items() if p is None]
+    if missing:
+        try:
+            with PHASE_SECONDS.time(phase="extract"):
+                rows = rows_from_js(await page.evaluate(CARDS_JS, missing))
+        except Exception:
+            rows = []
+        for c in missing:
+            prices[c], source = match_for(rows, c, include_booking=True)
+            EXTRACT_STRATEGY.inc(strategy=source or "miss")
+    return prices
+
+
+async def _harvest(page: Page, s: Settings, names: list[str]) -> list[CardRow]:
+    h = Harvest(names, s.harvest_max_scrolls, full=s.snapshot_mode)
+    while True:
+        scrolling = h.scrolls > 0
+        try:
+            with PHASE_SECONDS.time(phase="scroll" if scrolling else "extract"):
+                result = await page.evaluate(HARVEST_JS, h.args(s.harvest_idle_ms, s.harvest_quiet_ms))
+        except Exception as e:
+            print(f"[harvest] evaluate failed: {e}")
+            break
+        if scrolling:
+            HARVEST_SCROLLS.inc()
+        if not h.add(result):
+            break
+    HARVEST_STOPS.inc(reason=h.stop_reason or "error")
+    print(f"[harvest] {h.summary()}")
+    return h.rows
+
+
+async def _gather(
+    browser: Browser,
+    searches: Mapping[SearchKey, Sequence[str]],
+    settings: Settings,
+    concurrency: Optional[int],
+    timeout: Optional[float],
+) -> dict[SearchKey, dict[str, Optional[float]] | Exception]:
+    limit = max(1, concurrency or settings.async_concurrency)
+    per_search_timeout = timeout or settings.search_timeout_seconds
+    sem = asyncio.Semaphore(limit)
+    storage_state_path, http_cache = profile_from_settings(settings)
+
+    async def run(search: SearchKey, car_names: Sequence[str]) -> dict[str, Optional[float]] | Exception:
+        async with sem:
+            s = settings_for_search(settings, search)
+            try:
+                prices = await asyncio.wait_for(_search_once(browser, s, car_names, storage_state_path, http_cache), per_search_timeout)
+                SEARCHES.inc(result="ok")
+                return prices
+            except asyncio.TimeoutError:
+                SEARCHES.inc(result="timeout")
+                print(f"[async] timeout after {per_search_timeout}s: {search.label()}")
+                return TimeoutError(f"search timed out after {per_search_timeout}s")
+            except Exception as e:
+                SEARCHES.inc(result="error")
+                print(f"[async] error: {search.label()}: {e}")
+                return e
+
+    keys = list(searches.keys())
+    results = await asyncio.gather(*(run(k, searches[k]) for k in keys))
+    return dict(zip(keys, results))
+
+
+async def get_prices(
+    searches: Mapping[SearchKey, Sequence[str]],
+    settings: Settings,
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    pool: Optional[AsyncBrowserPool] = None,
+) -> dict[SearchKey, dict[str, Optional[float]] | Exception]:
+    # searches: {查询条件: [车型...]}；单个查询失败/超时只影响自身，结果里对应的值为该异常
+    # （与“查询成功但车型无价格”的 None 区分开，熔断与任务重试只看前者）
+    # pool 为空时启动一次性浏览器（仅 bench 等一次性调用）
+    if pool is not None:
+        browser = await pool.browser()
+        try:
+            return await _gather(browser, searches, settings, concurrency, timeout)
+        finally:
+            pool.served(len(searches))
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(**launch_options(settings.headful, settings.fast_mode))
+        track_launched()
+        try:
+            return await _gather(browser, searches, settings, concurrency, timeout)
+        finally:
+            await browser.close()
+
+
+def get_prices_sync(
+    searches: Mapping[SearchKey, Sequence[str]],
+    settings: Settings,
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    pool: Optional[AsyncBrowserPool] = None,
+) -> dict[SearchKey, dict[str, Optional[float]] | Exception]:
+    # 默认复用本线程的长驻浏览器（受 BROWSER_MAX_USES / BROWSER_MAX_AGE_SECONDS / BROWSER_MAX_RSS_MB 约束）
+    pool = pool or async_pool_from_settings(settings)
+    return pool.run(get_prices(searches, settings, concurrency=concurrency, timeout=timeout, pool=pool))
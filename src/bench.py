@@ -0,0 +1,387 @@
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+from tenacity import stop_after_attempt
+
+from .browser_pool import BrowserPool
+from .cards import CARDS_JS, price_for, rows_from_js
+from .config import EHI_BASE_URL, Settings
+from .fetcher import get_prices_for_search
+from .payload import extract_offers, min_price_for
+from .procmem import children_rss_bytes, rss_bytes
+from .timing import PhaseTimer
+
+# 离线基准：本地 HTTP 服务器提供 firstStep 页面与结果接口（可配置延迟），
+# 浏览器内把 booking.1hai.cn 的请求转到本地服务器，驱动真实的 get_prices_for_search。
+#   python -m src.bench --runs 10 --latency-ms 50 --out bench/results/HEAD.json
+#   python -m src.bench --runs 10 --compare bench/results/base.json
+# 输出 JSON：各阶段 p50/p95、浏览器进程 RSS、卡片/接口解析吞吐。
+#
+# fixtures 目录（默认 bench/fixtures）：
+#   firstStep.html 或 01_loaded_firstStep.html —— 表单页（DEBUG=1 时 _debug_dump 写出的文件可直接放入）
+#   results.json                              —— 结果接口响应；缺省时按 --cars 生成
+#   results.html 或 03_results.html           —— 仅用于卡片解析吞吐；缺省时用表单页查询后渲染的结果
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "bench" / "fixtures"
+RESULTS_API_PATH = "/api/car/queryCarList"
+TARGET_CAR = "大众新探影"
+FILLER_CARS = (
+    "丰田卡罗拉", "日产轩逸", "大众朗逸", "别克英朗", "本田思域", "丰田RAV4荣放", "本田CR-V", "大众途观L",
+    "哈弗H6", "比亚迪宋PLUS", "吉利星越L", "长安CS75", "别克GL8", "丰田汉兰达", "大众帕萨特", "奥迪A4L",
+)
+PICKUP_MODES = ("门店取还", "送车上门")
+
+
+def synthetic_results(cars: int, seed: int = 7) -> dict[str, Any]:
+    # 结构参照结果接口：车型 -> 多种取还方式的日均价
+    rng = random.Random(seed)
+    names = [TARGET_CAR] + [FILLER_CARS[i % len(FILLER_CARS)] + ("" if i < len(FILLER_CARS) else f" {i}") for i in range(max(0, cars - 1))]
+    car_list = []
+    for name in names:
+        base = rng.randint(120, 900)
+        car_list.append({
+            "carTypeName": name,
+            "seats": rng.choice((5, 7)),
+            "gearbox": "自动挡",
+            "displacement": rng.choice(("1.2T", "1.4T", "1.5L", "2.0T")),
+            "prices": [{"pickupMode": m, "dailyPrice": base + i * rng.randint(10, 80)} for i, m in enumerate(PICKUP_MODES)],
+        })
+    return {"code": 0, "data": {"carList": car_list}}
+
+
+def _first_existing(directory: Path, names: tuple[str, ...]) -> Optional[Path]:
+    for n in names:
+        p = directory / n
+        if p.is_file():
+            return p
+    return None
+
+
+class FixtureServer:
+    def __init__(self, first_step: bytes, results: bytes, latency_ms: float, api_latency_ms: float) -> None:
+        self.first_step = first_step
+        self.results = results
+        self.latency_ms = latency_ms
+        self.api_latency_ms = api_latency_ms
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _send(self, body: bytes, ctype: str, delay_ms: float) -> None:
+                server.requests += 1
+                if delay_ms > 0:
+                    time.sleep(delay_ms / 1000)
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                path = urlsplit(self.path).path
+                if path == RESULTS_API_PATH:
+                    self._send(server.results, "application/json; charset=utf-8", server.api_latency_ms)
+                elif path.startswith("/order/firstStep"):
+                    self._send(server.first_step, "text/html; charset=utf-8", server.latency_ms)
+                else:
+                    server.requests += 1
+                    self.send_error(404)
+
+            do_POST = do_GET
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="bench-http", daemon=True)
+
+    @property
+    def origin(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FixtureServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _route_to(server: FixtureServer, pool: BrowserPool) -> None:
+    # 站点请求转到本地服务器；其他外部请求一律中止，保证完全离线。
+    # 同一 context 上后注册的路由先执行，所以先注册兜底的 abort。
+    site = urlsplit(EHI_BASE_URL)
+
+    def forward(route: Any) -> None:
+        u = urlsplit(route.request.url)
+        target = server.origin + u.path + (f"?{u.query}" if u.query else "")
+        route.fulfill(response=route.fetch(url=target))
+
+    ctx = pool.context
+    ctx.route("**/*", lambda route: route.abort())
+    ctx.route(f"{site.scheme}://{site.netloc}/**", forward)
+
+
+def _pct(values: list[float], q: float) -> float:
+    # 最近秩百分位，样本少时也有定义
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def _stats_ms(values: list[float]) -> dict[str, float]:
+    ms = [v * 1000 for v in values]
+    return {
+        "n": len(ms),
+        "p50": round(_pct(ms, 50), 2),
+        "p95": round(_pct(ms, 95), 2),
+        "mean": round(statistics.fmean(ms), 2) if ms else 0.0,
+    }
+
+
+def _mb(n: Optional[int]) -> Optional[float]:
+    return None if n is None else round(n / (1024 * 1024), 1)
+
+
+def bench_settings(args: argparse.Namespace) -> Settings:
+    # 基准不发邮件：SMTP 字段留空，其余与默认配置一致
+    pickup = date.today() + timedelta(days=args.days_ahead)
+    return Settings(
+        car_name=TARGET_CAR,
+        check_interval_seconds=0,
+        smtp_host="",
+        smtp_port=0,
+        smtp_user="",
+        smtp_pass="",
+        smtp_from="",
+        email_to="",
+        pickup_city="敦煌",
+        return_city="德令哈",
+        pickup_date=pickup.isoformat(),
+        return_date=(pickup + timedelta(days=4)).isoformat(),
+        headful=False,
+        debug=False,
+        debug_dir="debug",
+        alert_price=None,
+        fast_mode=args.fast,
+        results_capture=not args.no_capture,
+        block_requests=not args.no_block,
+        # 每轮都走完整的表单填写，结果可比；也不在当前目录写 data/city_cache.json
+        city_cache=False,
+    )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _extraction(pool: BrowserPool, results_html: Optional[str], cars: list[str], iterations: int) -> dict[str, Any]:
+    # 卡片解析吞吐：同一结果页上反复执行 CARDS_JS + Python 侧匹配
+    with pool.page() as page:
+        if results_html is not None:
+            page.set_content(results_html)
+        else:
+            page.goto(EHI_BASE_URL, wait_until="domcontentloaded")
+            page.click("#search")
+        page.wait_for_selector(".cartype-list", timeout=15000)
+        durations: list[float] = []
+        rows = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            rows = rows_from_js(page.evaluate(CARDS_JS, cars))
+            for c in cars:
+                price_for(rows, c)
+            durations.append(time.perf_counter() - t0)
+    total = sum(durations)
+    return {
+        "cards": len(rows),
+        "iterations": iterations,
+        "per_scan_ms": _stats_ms(durations),
+        "cards_per_second": round(len(rows) * iterations / total, 1) if total else None,
+    }
+
+
+def _payload_throughput(payload: Any, cars: list[str], iterations: int) -> dict[str, Any]:
+    offers = []
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        offers = extract_offers(payload)
+        for c in cars:
+            min_price_for(offers, c)
+    total = time.perf_counter() - t0
+    return {
+        "offers": len(offers),
+        "iterations": iterations,
+        "per_parse_ms": round(total / iterations * 1000, 3),
+        "offers_per_second": round(len(offers) * iterations / total, 1) if total else None,
+    }
+
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    fixtures = Path(args.fixtures)
+    first_step_path = _first_existing(fixtures, ("firstStep.html", "01_loaded_firstStep.html"))
+    if first_step_path is None:
+        raise SystemExit(f"No firstStep.html in {fixtures}")
+    results_path = _first_existing(fixtures, ("results.json",))
+    payload = json.loads(results_path.read_text(encoding="utf-8")) if results_path else synthetic_results(args.cars)
+    results_html_path = _first_existing(fixtures, ("results.html", "03_results.html"))
+    results_html = results_html_path.read_text(encoding="utf-8") if results_html_path else None
+
+    settings = bench_settings(args)
+    cars = [TARGET_CAR]
+    expected = min_price_for(extract_offers(payload), TARGET_CAR)
+    fetch_once = get_prices_for_search.retry_with(stop=stop_after_attempt(1))
+
+    timers: list[PhaseTimer] = []
+    totals: list[float] = []
+    errors: list[str] = []
+    correct = 0
+    rss_samples: list[int] = []
+    server = FixtureServer(
+        first_step_path.read_bytes(),
+        json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        args.latency_ms,
+        args.latency_ms if args.api_latency_ms is None else args.api_latency_ms,
+    )
+    with server, BrowserPool(headful=False, max_uses=10**6, max_age_seconds=10**9, fast=settings.fast_mode) as pool:
+        pool.ensure()
+        _route_to(server, pool)
+        # fetcher 的进度输出转到 stderr，stdout 只留 JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            for i in range(args.warmup + args.runs):
+                t = PhaseTimer()
+                t0 = time.perf_counter()
+                try:
+                    prices = fetch_once(settings, cars, pool, t)
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+                    continue
+                elapsed = time.perf_counter() - t0
+                rss = children_rss_bytes()
+                if rss is not None:
+                    rss_samples.append(rss)
+                if i < args.warmup:
+                    continue
+                timers.append(t)
+                totals.append(elapsed)
+                if expected is not None and prices.get(TARGET_CAR) == expected:
+                    correct += 1
+            extraction = _extraction(pool, results_html, cars, args.extract_iterations)
+
+    phase_names = list(dict.fromkeys(name for t in timers for name in t.phases))
+    phases = {name: _stats_ms([t.total(name) for t in timers if name in t.phases]) for name in phase_names}
+    return {
+        "meta": {
+            "ts": int(time.time()),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fast_mode": settings.fast_mode,
+            "results_capture": settings.results_capture,
+            "block_requests": settings.block_requests,
+            "latency_ms": args.latency_ms,
+            "api_latency_ms": server.api_latency_ms,
+            "runs": args.runs,
+            "warmup": args.warmup,
+            "cars": len(payload.get("data", {}).get("carList", [])) if isinstance(payload, dict) else None,
+            "fixtures": str(fixtures),
+            "server_requests": server.requests,
+        },
+        "phases": phases,
+        "total": _stats_ms(totals),
+        "correct": {"ok": correct, "runs": len(timers), "expected_price": expected},
+        "errors": errors,
+        "rss_mb": {
+            "browser_peak": _mb(max(rss_samples)) if rss_samples else None,
+            "browser_last": _mb(rss_samples[-1]) if rss_samples else None,
+            "python": _mb(rss_bytes(os.getpid())),
+        },
+        "extraction": extraction,
+        "payload": _payload_throughput(payload, cars, args.extract_iterations),
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float, min_delta_ms: float) -> list[str]:
+    # 返回回归项：p50/p95 超过基线 (1+threshold) 倍且绝对差超过 min_delta_ms
+    regressions: list[str] = []
+
+    def check(label: str, new: Optional[float], old: Optional[float]) -> None:
+        if new is None or old is None:
+            return
+        delta = new - old
+        pct = (delta / old * 100) if old else 0.0
+        flag = new > old * (1 + threshold) and delta > min_delta_ms
+        print(f"{label:<28}{old:>10.1f}{new:>10.1f}{pct:>+9.1f}%{'  REGRESSION' if flag else ''}", file=sys.stderr)
+        if flag:
+            regressions.append(label)
+
+    print(f"{'metric':<28}{'base':>10}{'new':>10}{'delta':>10}", file=sys.stderr)
+    for name in sorted(set(current["phases"]) | set(baseline.get("phases", {}))):
+        for q in ("p50", "p95"):
+            check(f"{name}.{q}", current["phases"].get(name, {}).get(q), baseline.get("phases", {}).get(name, {}).get(q))
+    for q in ("p50", "p95"):
+        check(f"total.{q}", current["total"].get(q), baseline.get("total", {}).get(q))
+    check("extraction.per_scan.p50", current["extraction"]["per_scan_ms"]["p50"], baseline.get("extraction", {}).get("per_scan_ms", {}).get("p50"))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the fetch and extraction pipeline")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added latency per page request")
+    parser.add_argument("--api-latency-ms", type=float, help="Added latency for the results API (default: --latency-ms)")
+    parser.add_argument("--cars", type=int, default=40, help="Synthetic car types when no results.json fixture")
+    parser.add_argument("--days-ahead", type=int, default=20, help="Pickup date offset from today")
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR))
+    parser.add_argument("--fast", action="store_true", help="FAST_MODE")
+    parser.add_argument("--no-capture", action="store_true", help="Disable results API capture (DOM extraction)")
+    parser.add_argument("--no-block", action="store_true", help="Disable request blocking")
+    parser.add_argument("--extract-iterations", type=int, default=50)
+    parser.add_argument("--out", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Baseline JSON report; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown (default: 0.2)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore regressions smaller than this")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
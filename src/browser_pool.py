@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from .config import EHI_TZ, Settings
+from .http_cache import DiskHttpCache
+from .metrics import BROWSER_RESTARTS
+from .procmem import children_pss_bytes
+from .watchdog import kill_orphans, track_launched
+
+# Playwright 只在真正启动浏览器时导入：创建 BrowserPool 本身不加载驱动，
+# 混合模式重放、历史查询等不需要浏览器的路径因此不付出导入开销
+if TYPE_CHECKING:
+    from playwright.sync_api import Browser, BrowserContext, Page, Playwright
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
+)
+
+
+def launch_options(headful: bool = False, fast: bool = False) -> dict:
+    # 为了在无头模式下也稳定触发前端交互，这里在 headless 下也给一点 slow_mo；
+    # 快速模式下所有等待都绑定到具体的 DOM/网络条件，不再需要 slow_mo
+    slow = 0 if fast else (100 if headful else 50)
+    return {"headless": not headful, "slow_mo": slow}
+
+
+def context_options() -> dict:
+    return {"locale": "zh-CN", "timezone_id": EHI_TZ, "user_agent": USER_AGENT}
+
+
+def launch_browser(p: Playwright, headful: bool = False, fast: bool = False) -> Browser:
+    browser = p.chromium.launch(**launch_options(headful, fast))
+    # 登记本进程启动的 Chromium，孤儿清理只处理登记过的进程
+    track_launched()
+    return browser
+
+
+def new_context(browser: Browser, storage_state: Optional[str] = None) -> BrowserContext:
+    # storage_state：持久化的 cookie/localStorage（文件不存在时等同全新 context）
+    opts = context_options()
+    if storage_state and Path(storage_state).is_file():
+        opts["storage_state"] = storage_state
+    return browser.new_context(**opts)
+
+
+def save_storage_state(context: BrowserContext, path: str) -> None:
+    # 先写临时文件再替换，避免进程中途退出留下半截 JSON
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.tmp"
+    context.storage_state(path=tmp)
+    os.replace(tmp, path)
+
+
+def profile_from_settings(settings: Settings) -> tuple[Optional[str], Optional[DiskHttpCache]]:
+    # 可选的持久化 profile：data/profile/storage_state.json + data/profile/http_cache/
+    if not settings.persistent_profile:
+        return None, None
+    base = Path(settings.profile_dir)
+    cache = DiskHttpCache(
+        base / "http_cache",
+        max_bytes=int(settings.http_cache_max_mb * 1024 * 1024),
+        default_ttl=settings.http_cache_ttl_hours * 3600,
+        max_ttl=settings.http_cache_max_ttl_days * 86400,
+    )
+    cache.purge_expired()
+    return str(base / "storage_state.json"), cache
+
+
+def prepare_page(page: Page) -> Page:
+    # 提高默认超时，缓解偶发加载变慢导致的超时
+    try:
+        page.set_default_navigation_timeout(60000)  # 60s 导航超时
+        page.set_default_timeout(15000)             # 15s 通用超时
+    except Exception:
+        pass
+    return page
+
+
+class PoolLimits:
+    # 长驻浏览器的回收条件，同步 BrowserPool 与 async 引擎的 AsyncBrowserPool 共用
+    def __init__(self, max_uses: int = 50, max_age_seconds: int = 3600, max_rss_mb: float = 0.0, kill_orphans: bool = False) -> None:
+        self.max_uses = max(1, max_uses)
+        self.max_age_seconds = max_age_seconds
+        self.max_rss_bytes = int(max_rss_mb * 1024 * 1024)
+        self.kill_orphans = kill_orphans
+        self._uses = 0
+        self._started_at = 0.0
+        self.restarts = 0
+
+    @property
+    def uses(self) -> int:
+        return self._uses
+
+    def rss_bytes(self) -> Optional[int]:
+        # 驱动 + Chromium 进程树（当前进程的全部子孙进程）的 PSS：RSS 之和会把共享页重复计入多次，
+        # 按它判断会频繁误重启；RSS 只在看门狗里作趋势指标
+        return children_pss_bytes()
+
+    def _recycle_reason(self) -> Optional[str]:
+        if self._uses >= self.max_uses:
+            return "uses"
+        if self.max_age_seconds > 0 and time.monotonic() - self._started_at >= self.max_age_seconds:
+            return "age"
+        if self.max_rss_bytes > 0:
+            rss = self.rss_bytes()
+            if rss is not None and rss >= self.max_rss_bytes:
+                return "rss"
+        return None
+
+    def _log_restart(self, reason: str) -> None:
+        if reason == "rss":
+            print(f"[pool] restart browser: PSS {(self.rss_bytes() or 0) / 1024 / 1024:.0f}MB >= {self.max_rss_bytes / 1024 / 1024:.0f}MB")
+        else:
+            print(f"[pool] restart browser ({reason}, {self._uses} pages served)")
+        BROWSER_RESTARTS.inc(reason=reason)
+
+
+# 长驻的 Chromium + context，由主循环持有，每次轮询只新开/回收一个 page。
+# 重启时机：使用次数达到 max_uses、存活超过 max_age_seconds、浏览器进程树 RSS 超过 max_rss_mb、
+# 健康检查失败（进程崩溃/断开），或某次使用中抛异常后检测到不健康。
+# 浏览器关闭后清理失去驱动的孤儿 Chromium（kill_orphans）。
+# 开启持久化 profile 时，context 从 storage_state 恢复并在每次使用后保存，静态资源走磁盘 HTTP 缓存。
+class BrowserPool(PoolLimits):
+    def __init__(
+        self,
+        headful: bool = False,
+        max_uses: int = 50,
+        max_age_seconds: int = 3600,
+        fast: bool = False,
+        storage_state_path: Optional[str] = None,
+        http_cache: Optional[DiskHttpCache] = None,
+        max_rss_mb: float = 0.0,
+        kill_orphans: bool = False,
+    ) -> None:
+        super().__init__(max_uses, max_age_seconds, max_rss_mb, kill_orphans)
+        self.headful = headful
+        self.fast = fast
+        self.storage_state_path = storage_state_path
+        self.http_cache = http_cache
+        self._pw: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._context: Optional[BrowserContext] = None
+
+    @staticmethod
+    def from_settings(settings: Settings) -> "BrowserPool":
+        storage_state_path, http_cache = profile_from_settings(settings)
+        return BrowserPool(
+            headful=settings.headful,
+            max_uses=settings.browser_max_uses,
+            max_age_seconds=settings.browser_max_age_seconds,
+            fast=settings.fast_mode,
+            storage_state_path=storage_state_path,
+            http_cache=http_cache,
+            max_rss_mb=settings.browser_max_rss_mb,
+            kill_orphans=settings.kill_orphan_chromium,
+        )
+
+    def __enter__(self) -> "BrowserPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _start(self) -> None:
+        if self._pw is None:
+            from playwright.sync_api import sync_playwright
+
+            self._pw = sync_playwright().start()
+        self._browser = launch_browser(self._pw, self.headful, self.fast)
+        self._context = new_context(self._browser, self.storage_state_path)
+        if self.http_cache is not None:
+            self._context.route("**/*", self.http_cache.handle)
+        self._uses = 0
+        self._started_at = time.monotonic()
+
+    def save_state(self) -> None:
+        if self.storage_state_path is None or self._context is None:
+            return
+        try:
+            save_storage_state(self._context, self.storage_state_path)
+        except Exception:
+            pass
+
+    def _stop_browser(self) -> None:
+        if self.is_healthy():
+            self.save_state()
+        for closer in (self._context, self._browser):
+            if closer is None:
+                continue
+            try:
+                closer.close()
+            except Exception:
+                pass
+        self._context = None
+        self._browser = None
+        if self.kill_orphans:
+            killed = kill_orphans()
+            if killed:
+                print(f"[pool] killed orphaned Chromium: {killed}")
+
+    def is_healthy(self) -> bool:
+        if self._browser is None or self._context is None:
+            return False
+        try:
+            return self._browser.is_connected()
+        except Exception:
+            return False
+
+    def restart(self, reason: str = "error") -> None:
+        self._log_restart(reason)
+        self._stop_browser()
+        self._start()
+        self.restarts += 1
+
+    def ensure(self) -> None:
+        if self._browser is None:
+            self._start()
+            return
+        reason = "unhealthy" if not self.is_healthy() else self._recycle_reason()
+        if reason is not None:
+            self.restart(reason)
+
+    @property
+    def context(self) -> BrowserContext:
+        self.ensure()
+        assert self._context is not None
+        return self._context
+
+    @contextmanager
+    def page(self) -> Iterator[Page]:
+        self.ensure()
+        assert self._context is not None
+        try:
+            page = prepare_page(self._context.new_page())
+        except Exception:
+            # context/浏览器已失效：重启后再开一次
+            self.restart()
+            assert self._context is not None
+            page = prepare_page(self._context.new_page())
+        try:
+            yield page
+        except Exception:
+            if not self.is_healthy():
+                self._stop_browser()
+            raise
+        finally:
+            self._uses += 1
+            try:
+                page.close()
+            except Exception:
+                pass
+            self.save_state()
+            if self.http_cache is not None:
+                print(f"[cache] {self.http_cache.reset_stats().summary()}")
+
+    def close(self) -> None:
+        self._stop_browser()
+        if self._pw is not None:
+            try:
+                self._pw.stop()
+            except Exception:
+                pass
+            self._pw = None
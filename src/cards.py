@@ -0,0 +1,243 @@
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from .matching import name_matches
+from .price_parser import parse_prices
+
+# 单张 .cartype-list 卡片 -> 行（CARDS_JS 与 HARVEST_JS 共用）
+CARD_ROW_JS = r"""
+  const txt = (el) => (el ? (el.innerText || el.textContent || '').trim() : '');
+  const cardRow = (card) => {
+    const attrs = [];
+    card.querySelectorAll('[class*="cartype-"]').forEach((el) => {
+      const c = typeof el.className === 'string' ? el.className : '';
+      if (/cartype-(name|price|list|operate)/.test(c)) return;
+      const t = txt(el);
+      if (t && t.length <= 40 && !attrs.includes(t)) attrs.push(t);
+    });
+    return {
+      source: 'cartype',
+      name: txt(card.querySelector('.cartype-name')),
+      price: txt(card.querySelector('.cartype-price .cartype-price-current em')),
+      priceText: txt(card.querySelector('.cartype-price')),
+      pickupMode: txt(card.querySelector('[class*="pickup"], [class*="service-type"], .cartype-tag')),
+      attrs: attrs.slice(0, 12),
+      text: '',
+    };
+  };
+"""
+
+# 结果页整表提取：一次 page.evaluate 返回全部卡片，替代逐卡片的 locator 往返。
+# 参数 needles 为车型名，用于“名称就近”兜底（页面没有 .cartype-list 结构时）。
+# source:
+#   cartype  —— .cartype-list 卡片（价格只取价格容器，避免误取“1.2T”等规格数值）
+#   near     —— 包含车型名的文本节点所在的 div 块
+#   booking  —— 以“预订”按钮为锚点的父级块
+CARDS_JS = r"""
+(needles) => {
+""" + CARD_ROW_JS + r"""
+  const rows = [];
+  document.querySelectorAll('.cartype-list').forEach((card) => rows.push(cardRow(card)));
+
+  const pending = new Set(needles || []);
+  if (pending.size && document.body) {
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    while (pending.size && walker.nextNode()) {
+      const value = walker.currentNode.nodeValue || '';
+      for (const n of Array.from(pending)) {
+        if (!value.includes(n)) continue;
+        pending.delete(n);
+        let block = walker.currentNode.parentElement && walker.currentNode.parentElement.closest('div');
+        if (block && block.getBoundingClientRect().height < 40 && block.parentElement) {
+          block = block.parentElement.closest('div') || block;
+        }
+        rows.push({source: 'near', name: n, price: '', priceText: '', pickupMode: '', attrs: [], text: txt(block).slice(0, 2000)});
+      }
+    }
+  }
+
+  document.querySelectorAll('button, a, span, div').forEach((el) => {
+    if (el.children.length !== 0 || (el.textContent || '').trim() !== '预订') return;
+    const block = el.parentElement;
+    if (!block || block.closest('.cartype-list')) return;
+    rows.push({source: 'booking', name: '', price: '', priceText: '', pickupMode: '', attrs: [], text: txt(block).slice(0, 2000)});
+  });
+  return rows;
+}
+"""
+
+# 滚动收割：MutationObserver 记录 DOM 新增节点，每轮只返回新出现（或内容变化）的卡片。
+#   reset   —— 新一次收割，清空“已提取”记录（同一页面重新查询后卡片节点可能被复用）
+#   scroll  —— 先滚到列表末尾，等第一批新增节点（最多 idleMs，等不到说明列表不再变长），
+#              再等 DOM 安静 quietMs（懒加载的卡片内容填充完毕），总时长不超过 idleMs * 3
+# 已打 data-ehi-stale 的旧结果不计入。返回 {rows, total, grew}。
+HARVEST_JS = r"""
+async ({reset, scroll, idleMs, quietMs}) => {
+""" + CARD_ROW_JS + r"""
+  const live = () => document.querySelectorAll('.cartype-list:not([data-ehi-stale])');
+  let h = window.__ehiHarvest;
+  if (!h) {
+    h = window.__ehiHarvest = {seen: new WeakMap(), listeners: new Set()};
+    new MutationObserver((records) => {
+      if (records.some((r) => r.addedNodes.length)) h.listeners.forEach((f) => f());
+    }).observe(document.body, {childList: true, subtree: true});
+  }
+  if (reset) h.seen = new WeakMap();
+
+  const before = live().length;
+  if (scroll && before) {
+    const last = live()[before - 1];
+    last.scrollIntoView({block: 'end'});
+    // 列表可能在内部滚动容器里：把最近的可滚动祖先也滚到底
+    for (let el = last.parentElement; el && el !== document.body; el = el.parentElement) {
+      if (el.scrollHeight > el.clientHeight + 10 && /(auto|scroll)/.test(getComputedStyle(el).overflowY)) {
+        el.scrollTop = el.scrollHeight;
+        break;
+      }
+    }
+    window.scrollTo(0, (document.scrollingElement || document.body).scrollHeight);
+    await new Promise((resolve) => {
+      let quiet = null;
+      const done = () => {
+        clearTimeout(quiet);
+        clearTimeout(limit);
+        clearTimeout(idle);
+        h.listeners.delete(onMutation);
+        resolve();
+      };
+      const onMutation = () => {
+        clearTimeout(idle);
+        clearTimeout(quiet);
+        quiet = setTimeout(done, quietMs);
+      };
+      const idle = setTimeout(done, idleMs);
+      const limit = setTimeout(done, idleMs * 3);
+      h.listeners.add(onMutation);
+    });
+  }
+
+  const rows = [];
+  const cards = live();
+  cards.forEach((card) => {
+    // textContent 不触发布局，作为“是否已提取过”的签名；只对新卡片做 innerText 提取
+    const sig = card.textContent;
+    if (h.seen.get(card) === sig) return;
+    h.seen.set(card, sig);
+    rows.push(cardRow(card));
+  });
+  return {rows, total: cards.length, grew: cards.length > before};
+}
+"""
+
+
+@dataclass
+class CardRow:
+    source: str
+    name: str
+    price: Optional[float]
+    pickup_mode: str = ""
+    attrs: list[str] = field(default_factory=list)
+    text: str = ""
+
+
+def _price_texts(raw: dict[str, Any]) -> tuple[Optional[float], list[str]]:
+    # 返回 (价格容器里的纯数字价格, 需要按优先级解析的文本)
+    num = str(raw.get("price") or "").strip()
+    if num:
+        # 价格容器 em 一般就是纯数字，如 698
+        try:
+            return float(num.replace(",", "")), []
+        except ValueError:
+            pass
+    texts = [num] if num else []
+    # 有价格容器文本时只看它，否则看整块文本
+    fallback = raw.get("priceText") or raw.get("text")
+    if fallback:
+        texts.append(str(fallback))
+    return None, texts
+
+
+def rows_from_js(raw_rows: Any) -> list[CardRow]:
+    raws = [raw for raw in raw_rows or [] if isinstance(raw, dict)]
+    direct = [_price_texts(raw) for raw in raws]
+    # 所有需要解析的文本一次批量解析（去重后）
+    pending = list(dict.fromkeys(t for _, texts in direct for t in texts))
+    parsed = dict(zip(pending, parse_prices(pending)))
+    rows: list[CardRow] = []
+    for raw, (price, texts) in zip(raws, direct):
+        if price is None:
+            price = next((parsed[t] for t in texts if parsed[t] is not None), None)
+        rows.append(CardRow(
+            source=str(raw.get("source") or ""),
+            name=str(raw.get("name") or "").strip(),
+            price=price,
+            pickup_mode=str(raw.get("pickupMode") or "").strip(),
+            attrs=[str(a) for a in raw.get("attrs") or []],
+            text=str(raw.get("text") or ""),
+        ))
+    return rows
+
+
+def match_for(rows: list[CardRow], car_name: str, include_booking: bool = False) -> tuple[Optional[float], Optional[str]]:
+    # 返回 (价格, 命中的来源)；来源用于统计各提取策略的命中率
+    # 优先 .cartype-list 卡片（同车型不同取还方式时取最低），其次名称就近，最后“预订”锚点块
+    matched = [r.price for r in rows if r.source == "cartype" and r.price is not None and name_matches(r.name, car_name)]
+    if matched:
+        return min(matched), "cartype"
+    for r in rows:
+        if r.source == "near" and r.name == car_name and r.price is not None:
+            return r.price, "near"
+    if include_booking:
+        for r in rows:
+            if r.source == "booking" and r.price is not None and name_matches(r.text, car_name):
+                return r.price, "booking"
+    return None, None
+
+
+def price_for(rows: list[CardRow], car_name: str, include_booking: bool = False) -> Optional[float]:
+    return match_for(rows, car_name, include_booking)[0]
+
+
+class Harvest:
+    # 滚动收割的 Python 侧状态：累积行、判断何时停止（与同步/异步引擎无关）
+    #   found —— 车型全部找到，且最后一张新卡片不是要找的车型（同车型的其他取还方式可能紧随其后）
+    #   end   —— 滚动后列表没有变长，也没有新卡片（虚拟列表会替换节点而不变长）
+    #   limit —— 达到 max_scrolls
+    #   empty —— 页面没有 .cartype-list 卡片（交给整表提取的就近/预订块兜底）
+    def __init__(self, car_names: list[str], max_scrolls: int = 30, full: bool = False) -> None:
+        self.car_names = list(dict.fromkeys(car_names))
+        self.max_scrolls = max(0, max_scrolls)
+        # full：需要整张结果表（库存快照）时不因找齐车型提前停止
+        self.full = full
+        self.rows: list[CardRow] = []
+        self.scrolls = 0
+        self.total = 0
+        self.stop_reason: Optional[str] = None
+
+    def args(self, idle_ms: int, quiet_ms: int) -> dict[str, Any]:
+        return {"reset": self.scrolls == 0, "scroll": self.scrolls > 0, "idleMs": idle_ms, "quietMs": quiet_ms}
+
+    def missing(self) -> list[str]:
+        return [c for c in self.car_names if match_for(self.rows, c)[0] is None]
+
+    def add(self, result: Any) -> bool:
+        # 返回是否继续滚动
+        result = result if isinstance(result, dict) else {}
+        new = rows_from_js(result.get("rows"))
+        self.rows.extend(new)
+        self.total = int(result.get("total") or 0)
+        if self.total == 0:
+            self.stop_reason = "empty"
+        elif not self.full and not self.missing() and not (new and any(name_matches(new[-1].name, c) for c in self.car_names)):
+            self.stop_reason = "found"
+        elif self.scrolls > 0 and not result.get("grew") and not new:
+            self.stop_reason = "end"
+        elif self.scrolls >= self.max_scrolls:
+            self.stop_reason = "limit"
+        if self.stop_reason is None:
+            self.scrolls += 1
+            return True
+        return False
+
+    def summary(self) -> str:
+        return f"{len(self.rows)} cards ({self.total} on page) after {self.scrolls} scrolls, stopped: {self.stop_reason}"
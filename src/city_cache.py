@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from .config import Settings
+
+# 城市选择缓存：首次通过交互（输入 -> 候选 -> 点击）选中城市后，记录该操作对表单造成的全部变化
+# （城市/门店相关 input 的 value 与 title/data-* 属性、隐藏域等），之后的轮询一次性写回，跳过交互。
+# 写回后读 DOM 只能发现写回本身失败；站点是否真的按这两个城市查询，要看查询结果里回显的城市
+# （接口请求/响应或结果页文字，见 route_confirmed），对不上时按完整填表重来。
+# 失效条件：超过 TTL、站点脚本指纹变化（前端发版）、写回失败、结果回显的城市不符、使用缓存的查询拿不到任何价格。
+# 同一站点版本下连续失效 MAX_STRIKES 次（说明站点内部状态无法通过 DOM 写回），该城市不再使用缓存。
+
+MAX_STRIKES = 2
+
+# 表单快照：{key: {"value": ..., "attrs": {...}}}，key 为 id 或 name:<name>
+FORM_STATE_JS = r"""
+() => {
+  const out = {};
+  document.querySelectorAll('input, select, textarea').forEach((el) => {
+    const key = el.id || (el.name ? 'name:' + el.name : '');
+    if (!key || key in out) return;
+    const attrs = {};
+    for (const a of Array.from(el.attributes)) {
+      if (a.name === 'title' || a.name === 'value' || a.name.startsWith('data-')) attrs[a.name] = a.value;
+    }
+    out[key] = {value: el.value, attrs};
+  });
+  return out;
+}
+"""
+
+# 写回快照差异：用原生 setter 赋值（兼容 React/Vue 受控组件），并派发 input/change 事件
+APPLY_FORM_STATE_JS = r"""
+(state) => {
+  const find = (key) => key.startsWith('name:')
+    ? document.querySelector(`[name="${CSS.escape(key.slice(5))}"]`)
+    : document.getElementById(key);
+  let applied = 0;
+  for (const [key, entry] of Object.entries(state)) {
+    const el = find(key);
+    if (!el) continue;
+    for (const [name, value] of Object.entries(entry.attrs || {})) {
+      if (value === null) el.removeAttribute(name); else el.setAttribute(name, value);
+    }
+    if (entry.value !== undefined && entry.value !== null) {
+      const proto = el instanceof HTMLSelectElement ? HTMLSelectElement.prototype
+        : el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+      const setter = Object.getOwnPropertyDescriptor(proto, 'value').set;
+      setter.call(el, entry.value);
+      el.dispatchEvent(new Event('input', {bubbles: true}));
+      el.dispatchEvent(new Event('change', {bubbles: true}));
+    }
+    applied += 1;
+  }
+  return applied;
+}
+"""
+
+# 站点指纹：页面引用的脚本列表，前端发版后缓存整体失效
+SCRIPTS_JS = "() => Array.from(document.scripts).map(s => s.src).filter(Boolean).sort()"
+
+
+# 结果页可见文字（不含输入框的值，避免把刚写回的城市当作回显）
+ROUTE_TEXT_JS = "() => document.body ? document.body.innerText : ''"
+
+
+def route_confirmed(cities: tuple[str, ...], texts: list[str]) -> bool:
+    # 每个城市都出现在某段回显里才算站点采用了写回的城市
+    return all(any(city in text for text in texts) for city in cities)
+
+
+def fingerprint(script_srcs: list[str]) -> str:
+    return hashlib.sha1("\n".join(script_srcs).encode("utf-8")).hexdigest()[:12]
+
+
+def state_diff(before: dict[str, Any], after: dict[str, Any]) -> dict[str, Any]:
+    # 只保留选择城市前后发生变化的字段；被移除的属性记为 None
+    diff: dict[str, Any] = {}
+    for key, now in (after or {}).items():
+        old = (before or {}).get(key) or {"value": None, "attrs": {}}
+        attrs = {k: v for k, v in now.get("attrs", {}).items() if old.get("attrs", {}).get(k) != v}
+        attrs.update({k: None for k in old.get("attrs", {}) if k not in now.get("attrs", {})})
+        value_changed = now.get("value") != old.get("value")
+        if attrs or value_changed:
+            diff[key] = {"value": now.get("value") if value_changed else None, "attrs": attrs}
+    return diff
+
+
+class CityCache:
+    def __init__(self, path: str | Path = "data/city_cache.json", ttl_seconds: float = 30 * 86400) -> None:
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._data: dict[str, Any] = {}
+        self._mtime: Optional[float] = None
+
+    @staticmethod
+    def key(field_id: str, city: str) -> str:
+        return f"{field_id}:{city}"
+
+    def _load(self) -> None:
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            self._data, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        self._data = data if isinstance(data, dict) else {}
+        self._mtime = mtime
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self._data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._mtime = self.path.stat().st_mtime
+
+    def get(self, field_id: str, city: str, site: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            self._load()
+            entry = self._data.get(self.key(field_id, city))
+        if not isinstance(entry, dict) or not entry.get("state"):
+            return None
+        if entry.get("site") != site or int(entry.get("strikes", 0)) >= MAX_STRIKES:
+            return None
+        if time.time() - float(entry.get("ts", 0)) > self.ttl_seconds:
+            return None
+        return entry["state"]
+
+    def put(self, field_id: str, city: str, site: str, state: dict[str, Any]) -> None:
+        if not state:
+            return
+        with self._lock:
+            self._load()
+            old = self._data.get(self.key(field_id, city)) or {}
+            strikes = int(old.get("strikes", 0)) if old.get("site") == site else 0
+            self._data[self.key(field_id, city)] = {"site": site, "ts": int(time.time()), "strikes": strikes, "state": state}
+            self._save()
+
+    def confirm(self, field_id: str, city: str) -> None:
+        # 使用缓存的查询拿到了价格：清零失效次数
+        with self._lock:
+            self._load()
+            entry = self._data.get(self.key(field_id, city))
+            if isinstance(entry, dict) and entry.get("strikes"):
+                entry["strikes"] = 0
+                self._save()
+
+    def invalidate(self, field_id: Optional[str] = None, city: Optional[str] = None) -> None:
+        with self._lock:
+            self._load()
+            for k, v in list(self._data.items()):
+                if (field_id is None or k.startswith(f"{field_id}:")) and (city is None or k.endswith(f":{city}")):
+                    # 保留站点版本与失效次数，清掉状态
+                    self._data[k] = {"site": v.get("site"), "ts": v.get("ts", 0), "strikes": int(v.get("strikes", 0)) + 1}
+            self._save()
+
+
+_caches: dict[str, CityCache] = {}
+
+
+def city_cache_from_settings(settings: Settings) -> Optional[CityCache]:
+    # 同一路径共用一个实例（多次轮询/多个 FormSession 之间复用已加载的内容）
+    if not settings.city_cache:
+        return None
+    cache = _caches.get(settings.city_cache_path)
+    if cache is None:
+        cache = _caches[settings.city_cache_path] = CityCache(settings.city_cache_path, settings.city_cache_ttl_days * 86400)
+    return cache
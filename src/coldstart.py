@@ -0,0 +1,175 @@
+import argparse
+import compileall
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+# 冷启动测量：每次都在新的解释器进程里计时，贴近 cron / docker compose run 的真实开销
+#   python -m src.coldstart --runs 5 [--browser] [--budget-ms 400] [--out bench/results/coldstart.json]
+# 检查项：
+#   - import run 的耗时（含解释器启动，进程墙钟）与最慢的导入模块
+#   - 不需要浏览器的路径（import run、history 查询、重放/调度/存储等纯模块）不得加载 Playwright
+#   - --browser：Playwright 导入、驱动启动、Chromium 启动、首个 page 的耗时
+# 超出预算或不该加载的模块被加载时退出码 1。
+# --prewarm：预编译字节码并启动一次 Chromium（字体缓存等），供 Docker 构建时使用。
+
+ROOT = Path(__file__).resolve().parent.parent
+# 预编译时跳过运行期目录
+SKIP_DIRS = re.compile(r"[/\\](\.git|data|logs|debug)([/\\]|$)")
+# 非浏览器路径上不应出现的模块
+FORBIDDEN = ("playwright", "greenlet", "src.fetcher", "src.async_fetcher")
+
+PATH_CHECKS = {
+    "import_run": "import run",
+    "history": (
+        "import sys, tempfile, os\n"
+        "os.environ['STORE_PATH'] = os.path.join(tempfile.mkdtemp(), 'obs.db')\n"
+        "sys.argv = ['run.py', 'history', '--days', '1']\n"
+        "import run\n"
+        "run.main()\n"
+    ),
+    "pure_modules": "import src.replay, src.scheduler, src.store, src.outbox, src.browser_pool, src.watches, src.metrics, src.watchdog, src.snapshot, src.serve, src.jobqueue",
+}
+REPORT_MODULES = "import sys, json; print('\\n' + json.dumps(sorted(m for m in sys.modules if m.startswith(FORBIDDEN))))"
+
+BROWSER_PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from playwright.sync_api import sync_playwright
+from src.browser_pool import launch_options, context_options
+t1 = time.perf_counter()
+p = sync_playwright().start()
+t2 = time.perf_counter()
+browser = p.chromium.launch(**launch_options(False, True))
+t3 = time.perf_counter()
+page = browser.new_context(**context_options()).new_page()
+page.goto("about:blank")
+t4 = time.perf_counter()
+browser.close()
+p.stop()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "driver_ms": (t2 - t1) * 1000, "launch_ms": (t3 - t2) * 1000, "page_ms": (t4 - t3) * 1000}))
+"""
+
+
+def _run(code: str, importtime: bool = False, timeout: float = 120.0) -> tuple[float, str, str]:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    t0 = time.perf_counter()
+    out = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout)
+    wall_ms = (time.perf_counter() - t0) * 1000
+    if out.returncode != 0:
+        raise RuntimeError(f"{code.splitlines()[-1]!r} failed: {out.stderr.strip()[-500:]}")
+    return wall_ms, out.stdout, out.stderr
+
+
+def slowest_imports(importtime_log: str, top: int = 10) -> list[dict[str, Any]]:
+    # -X importtime 的输出：self [us] | cumulative | 模块（缩进表示层级）；只看顶层导入
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(parts[1])
+        except (IndexError, ValueError):
+            continue
+        name = parts[2]
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            rows.append({"module": name.strip(), "ms": round(cumulative / 1000, 1)})
+    rows.sort(key=lambda r: r["ms"], reverse=True)
+    return rows[:top]
+
+
+def check_paths() -> dict[str, list[str]]:
+    loaded = {}
+    for name, code in PATH_CHECKS.items():
+        _, stdout, _ = _run(f"FORBIDDEN = {FORBIDDEN!r}\n{code}\n{REPORT_MODULES}")
+        loaded[name] = json.loads(stdout.strip().splitlines()[-1])
+    return loaded
+
+
+def measure(runs: int) -> dict[str, Any]:
+    walls = []
+    log = ""
+    for _ in range(max(1, runs)):
+        wall, _, log = _run("import run", importtime=True)
+        walls.append(wall)
+    baseline = [_run("pass")[0] for _ in range(max(1, runs))]
+    return {
+        "wall_ms": {"median": round(statistics.median(walls), 1), "max": round(max(walls), 1)},
+        "interpreter_ms": round(statistics.median(baseline), 1),
+        "slowest_imports": slowest_imports(log),
+    }
+
+
+def measure_browser(runs: int) -> dict[str, Any]:
+    samples: dict[str, list[float]] = {}
+    for _ in range(max(1, runs)):
+        _, stdout, _ = _run(BROWSER_PROBE)
+        for k, v in json.loads(stdout.strip().splitlines()[-1]).items():
+            samples.setdefault(k, []).append(v)
+    out = {k: round(statistics.median(v), 1) for k, v in samples.items()}
+    out["total_ms"] = round(sum(out.values()), 1)
+    return out
+
+
+def prewarm() -> None:
+    # 预编译项目字节码（容器每次 run 都是全新文件系统，否则首次导入要现编译），
+    # 再启动一次 Chromium，让字体缓存等首次启动产物进入镜像层
+    compileall.compile_dir(str(ROOT), quiet=1, rx=SKIP_DIRS)
+    t0 = time.perf_counter()
+    _run(BROWSER_PROBE)
+    print(f"[coldstart] prewarm: bytecode compiled, Chromium launched in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure cold start of run.py and check that non-browser paths stay light")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=400.0, help="Budget for `import run` in a fresh interpreter (wall clock)")
+    parser.add_argument("--browser", action="store_true", help="Also time Playwright import, driver start, Chromium launch and first page")
+    parser.add_argument("--browser-budget-ms", type=float, default=0.0, help="Budget for the browser start (0 = report only)")
+    parser.add_argument("--prewarm", action="store_true", help="Precompile bytecode and launch Chromium once, then exit")
+    parser.add_argument("--out", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    if args.prewarm:
+        prewarm()
+        return
+
+    report: dict[str, Any] = {"python": sys.version.split()[0], "runs": args.runs, "budget_ms": args.budget_ms}
+    report["import"] = measure(args.runs)
+    report["forbidden_loaded"] = check_paths()
+    browser: Optional[dict[str, Any]] = measure_browser(args.runs) if args.browser else None
+    if browser is not None:
+        report["browser"] = browser
+
+    failures = []
+    if report["import"]["wall_ms"]["median"] > args.budget_ms:
+        failures.append(f"import run {report['import']['wall_ms']['median']:.0f} ms > {args.budget_ms:.0f} ms")
+    for path, modules in report["forbidden_loaded"].items():
+        if modules:
+            failures.append(f"{path} loads {', '.join(modules)}")
+    if browser is not None and args.browser_budget_ms > 0 and browser["total_ms"] > args.browser_budget_ms:
+        failures.append(f"browser start {browser['total_ms']:.0f} ms > {args.browser_budget_ms:.0f} ms")
+    report["failures"] = failures
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if failures:
+        print(f"Cold start over budget: {'; '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
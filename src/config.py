@@ -4,6 +4,23 @@ from dataclasses import dataclass
 # 固定站点与时区（不再通过环境变量配置）
 EHI_BASE_URL = "https://booking.1hai.cn/order/firstStep"
 EHI_TZ = "Asia/Shanghai"
+# 结果页查询接口的默认 URL 匹配（可用 RESULTS_API_PATTERN 覆盖）
+# 关键词必须出现在接口名（最后一段路径）里，避免把图片、城市、保险、优惠等其他 JSON 接口当成结果列表
+DEFAULT_RESULTS_API_PATTERN = r"(?i)1hai\.cn/(?:[^?#]*/)?[^/?#]*(?:cartype|carlist|carmodel|vehicle|pricelist|search|query)[^/?#]*(?:[?#]|$)"
+# 请求拦截默认规则：样式表不屏蔽（AntD 弹层的显隐依赖 CSS）
+DEFAULT_BLOCK_TYPES = ("image", "media", "font")
+DEFAULT_BLOCK_PATTERNS = (
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"hm\.baidu\.com",
+    r"cnzz\.com",
+    r"umeng\.com",
+    r"growingio\.com",
+    r"sensorsdata",
+    r"/(beacon|collect|track|stat)(\?|/|$)",
+)
+DEFAULT_ALLOW_PATTERNS = (r"1hai\.cn/.*\.js(\?|$)",)
 
 
 @dataclass
@@ -32,6 +49,118 @@ class Settings:
     # Alerts
     alert_price: float | None
 
+    # 快速模式：不用 slow_mo 与固定等待，所有等待绑定 DOM/网络条件
+    fast_mode: bool = False
+
+    # Browser pool：长驻浏览器，按使用次数/存活时间回收
+    browser_max_uses: int = 50
+    browser_max_age_seconds: int = 3600
+    # 浏览器进程树内存（PSS，共享页分摊计入）超过该值（MB）时在下次使用前重启，0 关闭
+    browser_max_rss_mb: float = 1024.0
+
+    # 内存看门狗：采样间隔（0 关闭）；监控进程 RSS 超限（MB，0 关闭）时退出交给 restart 策略；清理孤儿 Chromium
+    memory_check_seconds: float = 30.0
+    monitor_max_rss_mb: float = 0.0
+    kill_orphan_chromium: bool = False
+
+    # 分阶段重试（同一页面上重试单个阶段）与按 watch 的熔断
+    phase_attempts: int = 3
+    phase_retry_wait_seconds: float = 1.0
+    breaker_threshold: int = 3
+    breaker_cooldown_seconds: float = 1800.0
+    breaker_max_cooldown_seconds: float = 14400.0
+
+    # 持久化 profile（可选）：保存 cookie/localStorage，静态资源走磁盘 HTTP 缓存；关闭时每次都是全新 context
+    persistent_profile: bool = False
+    profile_dir: str = "data/profile"
+    http_cache_max_mb: float = 200.0
+    http_cache_ttl_hours: float = 24.0
+    http_cache_max_ttl_days: float = 7.0
+
+    # 多车型/多行程：JSON watch 列表；为空时只监控上面的单一配置
+    watches_file: str = ""
+
+    # 本地查询服务（run.py serve）：按查询条件缓存结果，并发的相同查询合并为一次
+    serve_host: str = "127.0.0.1"
+    serve_port: int = 8765
+    serve_cache_ttl_seconds: float = 300.0
+    serve_negative_ttl_seconds: float = 60.0
+    serve_timeout_seconds: float = 300.0
+
+    # 分布式执行：local（本进程抓取）或 queue（写入共享任务队列，由 run.py worker 进程领取执行）
+    dispatch_mode: str = "local"
+    job_queue_path: str = "data/jobs.db"
+    job_lease_seconds: float = 60.0
+    job_max_attempts: int = 3
+    job_wait_seconds: float = 600.0
+    job_queue_wal: bool = True
+
+    # 观测数据索引库（SQLite）
+    store_path: str = "data/observations.db"
+
+    # 日志：monitor.log 按大小轮换；观测 JSONL 只在变化时写入（外加心跳），旧段后台压缩归档
+    log_max_mb: float = 10.0
+    log_backup_count: int = 5
+    obs_log_path: str = "logs/price_observations.jsonl"
+    obs_heartbeat_minutes: float = 60.0
+    obs_segment_mb: float = 5.0
+    obs_compact_hours: float = 6.0
+
+    # 全量库存快照（可选）：每次查询的整张结果表按线路/天写入列式文件
+    snapshot_mode: bool = False
+    snapshot_dir: str = "data/snapshots"
+
+    # 抓取引擎：sync（逐个查询，复用 BrowserPool）或 async（一个浏览器内并发多个查询）
+    fetch_engine: str = "sync"
+    async_concurrency: int = 4
+    search_timeout_seconds: float = 120.0
+
+    # 混合模式：浏览器查询一次后记录结果接口请求与 cookie，之后用 HTTP 直接重放，失效时回退浏览器
+    hybrid_mode: bool = False
+    replay_path: str = "data/replay.json"
+    replay_max_age_minutes: float = 120.0
+    replay_timeout_seconds: float = 15.0
+
+    # 城市选择缓存：首次交互选中后记录表单状态，之后一步写回（失效时回退到交互）
+    city_cache: bool = False
+    city_cache_path: str = "data/city_cache.json"
+    city_cache_ttl_days: float = 30.0
+
+    # 结果接口拦截：命中时直接解析 JSON，未命中回退 DOM 解析
+    results_capture: bool = True
+    results_api_pattern: str = DEFAULT_RESULTS_API_PATTERN
+    results_api_timeout_seconds: float = 10.0
+
+    # 结果列表滚动收割（DOM 解析时）：滚到底并等列表变化（MutationObserver），直到找齐车型或列表不再变长
+    harvest_max_scrolls: int = 30
+    harvest_idle_ms: int = 1500
+    harvest_quiet_ms: int = 150
+
+    # 请求拦截：按资源类型/URL 正则丢弃无用请求，白名单优先
+    block_requests: bool = True
+    block_resource_types: tuple[str, ...] = DEFAULT_BLOCK_TYPES
+    block_url_patterns: tuple[str, ...] = DEFAULT_BLOCK_PATTERNS
+    allow_url_patterns: tuple[str, ...] = DEFAULT_ALLOW_PATTERNS
+
+    # 轮询节奏：fixed（固定 CHECK_INTERVAL_SECONDS）或 adaptive（按波动/临近取车/错误率调整，全局每小时预算）
+    poll_mode: str = "fixed"
+    min_interval_seconds: int = 120
+    max_interval_seconds: int = 3600
+    interval_jitter: float = 0.1
+    sessions_per_hour: int = 30
+
+    # 指标：Prometheus 文本格式，本地 HTTP 端点（0 关闭）与定期写出的文件（空串关闭）
+    metrics_port: int = 0
+    metrics_host: str = "127.0.0.1"
+    metrics_file: str = "data/metrics.prom"
+    metrics_file_interval_seconds: float = 60.0
+
+    # 通知发件箱：后台线程发信，批处理窗口内的变动合并为一封摘要，失败指数退避
+    outbox_enabled: bool = True
+    outbox_path: str = "data/outbox.db"
+    outbox_batch_seconds: float = 30.0
+    outbox_max_backoff_seconds: float = 1800.0
+
     @staticmethod
     def from_env() -> "Settings":
         def req(name: str) -> str:
@@ -40,6 +169,13 @@ class Settings:
                 raise ValueError(f"Missing required environment variable: {name}")
             return v
 
+        def csv(name: str, default: tuple[str, ...]) -> tuple[str, ...]:
+            # 逗号分隔；未设置时用默认值，设为空串表示清空
+            v = os.getenv(name)
+            if v is None:
+                return default
+            return tuple(x.strip() for x in v.split(",") if x.strip())
+
         return Settings(
             car_name=os.getenv("EH_CAR_NAME", "大众新探影"),
             check_interval_seconds=int(os.getenv("CHECK_INTERVAL_SECONDS", "600")),
@@ -61,4 +197,75 @@ class Settings:
                 if os.getenv("ALERT_PRICE", "").strip() not in ("", None)
                 else None
             ),
+            fast_mode=os.getenv("FAST_MODE", "0") in ("1", "true", "TRUE", "yes", "on"),
+            browser_max_uses=int(os.getenv("BROWSER_MAX_USES", "50")),
+            browser_max_age_seconds=int(os.getenv("BROWSER_MAX_AGE_SECONDS", "3600")),
+            browser_max_rss_mb=float(os.getenv("BROWSER_MAX_RSS_MB", "1024")),
+            memory_check_seconds=float(os.getenv("MEMORY_CHECK_SECONDS", "30")),
+            monitor_max_rss_mb=float(os.getenv("MONITOR_MAX_RSS_MB", "0")),
+            kill_orphan_chromium=os.getenv("KILL_ORPHAN_CHROMIUM", "0") in ("1", "true", "TRUE", "yes", "on"),
+            phase_attempts=int(os.getenv("PHASE_ATTEMPTS", "3")),
+            phase_retry_wait_seconds=float(os.getenv("PHASE_RETRY_WAIT_SECONDS", "1")),
+            breaker_threshold=int(os.getenv("BREAKER_THRESHOLD", "3")),
+            breaker_cooldown_seconds=float(os.getenv("BREAKER_COOLDOWN_SECONDS", "1800")),
+            breaker_max_cooldown_seconds=float(os.getenv("BREAKER_MAX_COOLDOWN_SECONDS", "14400")),
+            persistent_profile=os.getenv("PERSISTENT_PROFILE", "0") in ("1", "true", "TRUE", "yes", "on"),
+            profile_dir=os.getenv("PROFILE_DIR", "data/profile").strip() or "data/profile",
+            http_cache_max_mb=float(os.getenv("HTTP_CACHE_MAX_MB", "200")),
+            http_cache_ttl_hours=float(os.getenv("HTTP_CACHE_TTL_HOURS", "24")),
+            http_cache_max_ttl_days=float(os.getenv("HTTP_CACHE_MAX_TTL_DAYS", "7")),
+            watches_file=os.getenv("WATCHES_FILE", "").strip(),
+            store_path=os.getenv("STORE_PATH", "data/observations.db").strip() or "data/observations.db",
+            serve_host=os.getenv("SERVE_HOST", "127.0.0.1").strip() or "127.0.0.1",
+            serve_port=int(os.getenv("SERVE_PORT", "8765")),
+            serve_cache_ttl_seconds=float(os.getenv("SERVE_CACHE_TTL_SECONDS", "300")),
+            serve_negative_ttl_seconds=float(os.getenv("SERVE_NEGATIVE_TTL_SECONDS", "60")),
+            serve_timeout_seconds=float(os.getenv("SERVE_TIMEOUT_SECONDS", "300")),
+            dispatch_mode=os.getenv("DISPATCH", "local").strip().lower() or "local",
+            job_queue_path=os.getenv("JOB_QUEUE_PATH", "data/jobs.db").strip() or "data/jobs.db",
+            job_lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+            job_max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            job_wait_seconds=float(os.getenv("JOB_WAIT_SECONDS", "600")),
+            job_queue_wal=os.getenv("JOB_QUEUE_WAL", "1") in ("1", "true", "TRUE", "yes", "on"),
+            log_max_mb=float(os.getenv("LOG_MAX_MB", "10")),
+            log_backup_count=int(os.getenv("LOG_BACKUP_COUNT", "5")),
+            obs_log_path=os.getenv("OBS_LOG_PATH", "logs/price_observations.jsonl").strip() or "logs/price_observations.jsonl",
+            obs_heartbeat_minutes=float(os.getenv("OBS_HEARTBEAT_MINUTES", "60")),
+            obs_segment_mb=float(os.getenv("OBS_SEGMENT_MB", "5")),
+            obs_compact_hours=float(os.getenv("OBS_COMPACT_HOURS", "6")),
+            snapshot_mode=os.getenv("SNAPSHOT_MODE", "0") in ("1", "true", "TRUE", "yes", "on"),
+            snapshot_dir=os.getenv("SNAPSHOT_DIR", "data/snapshots").strip() or "data/snapshots",
+            fetch_engine=os.getenv("FETCH_ENGINE", "sync").strip().lower() or "sync",
+            async_concurrency=int(os.getenv("ASYNC_CONCURRENCY", "4")),
+            search_timeout_seconds=float(os.getenv("SEARCH_TIMEOUT_SECONDS", "120")),
+            hybrid_mode=os.getenv("HYBRID_MODE", "0") in ("1", "true", "TRUE", "yes", "on"),
+            replay_path=os.getenv("REPLAY_PATH", "data/replay.json").strip() or "data/replay.json",
+            replay_max_age_minutes=float(os.getenv("REPLAY_MAX_AGE_MINUTES", "120")),
+            replay_timeout_seconds=float(os.getenv("REPLAY_TIMEOUT_SECONDS", "15")),
+            city_cache=os.getenv("CITY_CACHE", "0") in ("1", "true", "TRUE", "yes", "on"),
+            city_cache_path=os.getenv("CITY_CACHE_PATH", "data/city_cache.json").strip() or "data/city_cache.json",
+            city_cache_ttl_days=float(os.getenv("CITY_CACHE_TTL_DAYS", "30")),
+            results_capture=os.getenv("RESULTS_CAPTURE", "1") in ("1", "true", "TRUE", "yes", "on"),
+            results_api_pattern=os.getenv("RESULTS_API_PATTERN", "").strip() or DEFAULT_RESULTS_API_PATTERN,
+            results_api_timeout_seconds=float(os.getenv("RESULTS_API_TIMEOUT_SECONDS", "10")),
+            harvest_max_scrolls=int(os.getenv("HARVEST_MAX_SCROLLS", "30")),
+            harvest_idle_ms=int(os.getenv("HARVEST_IDLE_MS", "1500")),
+            harvest_quiet_ms=int(os.getenv("HARVEST_QUIET_MS", "150")),
+            block_requests=os.getenv("BLOCK_REQUESTS", "1") in ("1", "true", "TRUE", "yes", "on"),
+            block_resource_types=csv("BLOCK_RESOURCE_TYPES", DEFAULT_BLOCK_TYPES),
+            block_url_patterns=csv("BLOCK_URL_PATTERNS", DEFAULT_BLOCK_PATTERNS),
+            allow_url_patterns=csv("ALLOW_URL_PATTERNS", DEFAULT_ALLOW_PATTERNS),
+            poll_mode=os.getenv("POLL_MODE", "fixed").strip().lower() or "fixed",
+            min_interval_seconds=int(os.getenv("MIN_INTERVAL_SECONDS", "120")),
+            max_interval_seconds=int(os.getenv("MAX_INTERVAL_SECONDS", "3600")),
+            interval_jitter=float(os.getenv("INTERVAL_JITTER", "0.1")),
+            sessions_per_hour=int(os.getenv("SESSIONS_PER_HOUR", "30")),
+            metrics_port=int(os.getenv("METRICS_PORT", "0")),
+            metrics_host=os.getenv("METRICS_HOST", "127.0.0.1").strip() or "127.0.0.1",
+            metrics_file=os.getenv("METRICS_FILE", "data/metrics.prom").strip(),
+            metrics_file_interval_seconds=float(os.getenv("METRICS_FILE_INTERVAL_SECONDS", "60")),
+            outbox_enabled=os.getenv("OUTBOX_ENABLED", "1") in ("1", "true", "TRUE", "yes", "on"),
+            outbox_path=os.getenv("OUTBOX_PATH", "data/outbox.db").strip() or "data/outbox.db",
+            outbox_batch_seconds=float(os.getenv("OUTBOX_BATCH_SECONDS", "30")),
+            outbox_max_backoff_seconds=float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "1800")),
         )
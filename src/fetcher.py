@@ -1,138 +1,103 @@
 import re
 from contextlib import contextmanager
+from dataclasses import replace
 from typing import Iterator, Optional
 
 from tenacity import retry, stop_after_attempt, wait_fixed
-from playwright.sync_api import sync_playwright, Browser, Page
-
-from .config import Settings, EHI_BASE_URL, EHI_TZ
+from playwright.sync_api import sync_playwright, Browser, Locator, Page
+
+from .browser_pool import BrowserPool, launch_browser, new_context, prepare_page
+from .config import Settings, EHI_BASE_URL
+from .cards import CARDS_JS, HARVEST_JS, CardRow, Harvest, match_for, rows_from_js
+from .city_cache import (
+    APPLY_FORM_STATE_JS,
+    FORM_STATE_JS,
+    ROUTE_TEXT_JS,
+    SCRIPTS_JS,
+    city_cache_from_settings,
+    fingerprint,
+    route_confirmed,
+    state_diff,
+)
+from .metrics import EXTRACT_STRATEGY, HARVEST_SCROLLS, HARVEST_STOPS, SEARCH_RETRIES, SEARCHES
+from .payload import ResultsCapture
+from .price_parser import parse_price_from_text  # noqa: F401  兼容旧的导入路径
+from .replay import replayer_from_settings
+from .resilience import PhaseError, PhaseRunner
+from .routing import TrafficStats, blocker_from_settings
+from .snapshot import inventory_from_cards, inventory_from_offers, save_inventory
+from .timing import PhaseTimer
+from .watches import SearchKey
+from .watchdog import kill_orphans
+
+# 页面侧脚本，同步/异步引擎共用
+# 强制赋值并触发事件（站点内部状态未必同步，仅作兜底）
+FORCE_SET_JS = (
+    "(el, val) => { el.removeAttribute('readonly'); el.value = val; el.setAttribute('value', val); "
+    "el.dispatchEvent(new Event('input',{bubbles:true})); el.dispatchEvent(new Event('change',{bubbles:true})); el.blur(); }"
+)
+CITY_SEARCH_CLOSED_JS = (
+    "() => document.querySelector('.city-search')===null || "
+    "getComputedStyle(document.querySelector('.city-search')).display==='none'"
+)
+ANTD_DROPDOWNS = ", ".join([
+    ".ant-select-dropdown:not(.ant-select-dropdown-hidden)",
+    ".ant-cascader-dropdown:not(.ant-cascader-dropdown-hidden)",
+    ".ant-dropdown:not(.ant-dropdown-hidden)",
+    "[role='listbox']",
+])
+CITY_APPLIED_JS = "([el, v]) => (el.getAttribute('title')||'').includes(v) || (el.value||'').includes(v)"
+DATE_APPLIED_JS = "([el, v]) => (el.getAttribute('value')||'')===v || (el.getAttribute('title')||'')===v"
+SEARCH_BUTTON_RE = re.compile(r"查\s*询")
+# 按角色找不到“查询”按钮时依次尝试的选择器，都不行再按回车
+SEARCH_FALLBACK_SELECTORS = ("button:has-text('查')", "text=查询")
+
+
+def month_delta(header: str, date_value: str) -> int:
+    # 日历面板标题（如“2025年10月”）到目标日期 YYYY-MM-DD 相差的月数；无法解析时为 0
+    m = re.match(r"(\d{4})-(\d{1,2})", date_value)
+    nums = re.findall(r"\d+", header)
+    if not m or len(nums) < 2:
+        return 0
+    return (int(m.group(1)) - int(nums[0])) * 12 + (int(m.group(2)) - int(nums[1]))
 
 
 @contextmanager
-def browser_ctx(headful: bool = False) -> Iterator[tuple[Browser, Page]]:
-    with sync_playwright() as p:
-        # 为了在无头模式下也稳定触发前端交互，这里在 headless 下也给一点 slow_mo
-        slow = 100 if headful else 50
-        browser = p.chromium.launch(headless=not headful, slow_mo=slow)
-        context = browser.new_context(locale="zh-CN", timezone_id=EHI_TZ, user_agent=(
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
-        ))
-        page = context.new_page()
-        # 提高默认超时，缓解偶发加载变慢导致的超时
-        try:
-            page.set_default_navigation_timeout(60000)  # 60s 导航超时
-            page.set_default_timeout(15000)             # 15s 通用超时
-        except Exception:
-            pass
-        try:
-            yield browser, page
-        finally:
-            context.close()
-            browser.close()
-
-
-def parse_price_from_text(text: str) -> Optional[float]:
-    # 更严格：优先匹配带货币符号的价格；避免误匹配 “1.2T”“5座”等
-    # 1) 带货币符号
-    m = re.search(r"(?:¥|RMB|￥)\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{1,2})?|[0-9]+(?:\.[0-9]{1,2})?)", text)
-    # 2) 或者数字后面紧跟价格语境（/日均、天、元），避免小数字
-    if not m:
-        m = re.search(r"([0-9]{2,5}(?:\.[0-9]{1,2})?)\s*(?:/\s*日均|日均|/\s*天|天|元)", text)
-    if not m:
-        return None
-    raw = m.group(1).replace(",", "")
+def browser_ctx(headful: bool = False, fast: bool = False, cleanup: bool = False) -> Iterator[tuple[Browser, Page]]:
+    # 一次性浏览器：仅在未提供 BrowserPool 时使用；cleanup 对应 KILL_ORPHAN_CHROMIUM
     try:
-        val = float(raw)
-        # 保护：过滤明显不是价格的极小值（如 1.2T、5 座等已通过语境避免，这里再兜底）
-        if val < 20:
-            return None
-        return val
-    except ValueError:
-        return None
-
-
-def _extract_price_near_model(page: Page, car_name: str) -> Optional[float]:
-    # Try to find an element containing the car name and extract price nearby
-    locator = page.locator(f"text={car_name}")
-    if locator.count() == 0:
-        name_compact = car_name.replace(" ", "")
-        locator = page.locator(f"text={name_compact}")
-    if locator.count() == 0:
-        return None
-
-    handle = locator.first
-    container = handle.locator("xpath=ancestor-or-self::div[1]")
-    if container.count() > 0 and container.bounding_box() and container.bounding_box()["height"] < 40:
-        container = handle.locator("xpath=ancestor::div[1]")
-    try:
-        text = container.inner_text()
-        price = parse_price_from_text(text)
-        if price is not None:
-            return price
+        with sync_playwright() as p:
+            browser = launch_browser(p, headful, fast)
+            context = new_context(browser)
+            page = prepare_page(context.new_page())
+            try:
+                yield browser, page
+            finally:
+                context.close()
+                browser.close()
     except Exception:
-        pass
+        # 异常退出时浏览器未必关掉：清理本进程启动过、已失去驱动的 Chromium
+        if cleanup:
+            killed = kill_orphans()
+            if killed:
+                print(f"[browser] killed orphaned Chromium: {killed}")
+        raise
 
-    price_like = handle.locator("xpath=ancestor::div[1]//*[contains(text(),'¥') or contains(text(),'￥') or matches(text(),'\\d{2,}')]")
-    if price_like.count() > 0:
-        for i in range(min(10, price_like.count())):
-            try:
-                t = price_like.nth(i).inner_text()
-                p = parse_price_from_text(t)
-                if p is not None:
-                    return p
-            except Exception:
-                continue
-    return None
 
-def _extract_from_cartype_lists(page: Page, car_name: str) -> Optional[float]:
-    # 针对当前页面结构的精准解析：只从价格容器读取，避免误取“1.2T”等规格数值
+@contextmanager
+def _blocking(page: Page, settings: Settings) -> Iterator[Optional[TrafficStats]]:
+    # 按配置屏蔽无用请求，轮询结束时打印本次流量
+    blocker = blocker_from_settings(settings)
+    if blocker is None:
+        yield None
+        return
+    page.route("**/*", blocker.handle)
+    page.on("requestfinished", blocker.on_finished)
     try:
-        cards = page.locator(".cartype-list")
-        n = cards.count()
-    except Exception:
-        n = 0
-    if n == 0:
-        return None
-
-    target = (car_name or "").strip()
-    synonyms = [target] if target else []
-    if "大众" not in target:
-        synonyms.append("大众")
-    if ("新探影" not in target) and ("探影" not in target):
-        synonyms.append("探影")
-
-    matched_prices: list[float] = []
-    for i in range(min(40, n)):
-        card = cards.nth(i)
-        try:
-            name = card.locator(".cartype-name").first.inner_text().strip()
-        except Exception:
-            name = ""
-        matched = False
-        if target and target in name:
-            matched = True
-        elif all(kw in name for kw in [kw for kw in synonyms if kw in ("大众", "探影", "新探影")]):
-            matched = True
-        if not matched:
-            continue
-        # 仅从价格容器读取，优先 em 文本
-        try:
-            num = card.locator(".cartype-price .cartype-price-current em").first.inner_text()
-            # 这里 num 一般就是纯数字，如 698
-            p = None
-            try:
-                p = float(num.replace(",", ""))
-            except Exception:
-                p = parse_price_from_text(num)
-            if p is not None:
-                matched_prices.append(p)
-        except Exception:
-            pass
-    if matched_prices:
-        # 返回最小价（同车型不同取还方式时，取最低）
-        return min(matched_prices)
-    return None
+        yield blocker.stats
+    finally:
+        stats = blocker.collect_bytes()
+        print(f"[net] {stats.summary()}")
 
 
 def _debug_dump(page: Page, s: Settings, name: str) -> None:
@@ -153,63 +118,153 @@ def _debug_dump(page: Page, s: Settings, name: str) -> None:
         pass
 
 
-def _form_fill_search(page: Page, s: Settings) -> None:
-    # Fill pickup/return cities and stores, pickup/return dates and times, then submit
-    print("[form] open firstStep page…")
-    # 更宽松的导航等待与超时，降低网络波动导致的超时
-    try:
-        page.goto(EHI_BASE_URL, wait_until="domcontentloaded", timeout=60000)
-    except Exception:
-        # 兜底再等到 networkidle，但不抛出，让上层重试机制接管
+class FormSession:
+    # firstStep 表单的一次页面会话：导航、填城市、选日期、查询、等待结果。
+    # 各步骤可单独调用，便于在同一页面上只改日期重复查询（见 sweep_prices）
+    def __init__(self, page: Page, s: Settings, timer: Optional[PhaseTimer] = None) -> None:
+        self.page = page
+        self.s = s
+        self.t = timer or PhaseTimer()
+        self.fast = s.fast_mode
+        self.cities = city_cache_from_settings(s)
+        # 本次会话中由缓存写回的城市，查询无结果时据此让缓存失效
+        self.cached_cities: list[tuple[str, str]] = []
+        self._site_fp: Optional[str] = None
+
+    def confirm_cached_cities(self) -> None:
+        if self.cities is not None:
+            for field_id, city in self.cached_cities:
+                self.cities.confirm(field_id, city)
+
+    def invalidate_cached_cities(self) -> None:
+        if self.cities is None or not self.cached_cities:
+            return
+        for field_id, city in self.cached_cities:
+            self.cities.invalidate(field_id, city)
+        print(f"[form] no prices with cached city state; cache invalidated for {self.cached_cities}")
+        self.cached_cities = []
+
+    def verify_cached_route(self, pickup_city: str, return_city: str, capture: Optional[ResultsCapture] = None) -> bool:
+        # 用了缓存的城市状态时，确认结果（接口回显或结果页文字）里确实是这两个城市；否则让缓存失效
+        if not self.cached_cities:
+            return True
+        texts = capture.evidence() if capture is not None else []
         try:
-            page.goto(EHI_BASE_URL, wait_until="load", timeout=60000)
+            texts.append(self.page.evaluate(ROUTE_TEXT_JS) or "")
         except Exception:
             pass
-    # 等待关键输入框渲染完成
-    try:
-        page.wait_for_selector("#pickupcity", timeout=30000, state="visible")
-        page.wait_for_selector("#returncity", timeout=30000, state="visible")
-    except Exception:
-        page.wait_for_load_state("networkidle")
-    _debug_dump(page, s, "01_loaded_firstStep")
+        if route_confirmed((pickup_city, return_city), texts):
+            return True
+        for field_id, city in self.cached_cities:
+            self.cities.invalidate(field_id, city)
+        print(f"[form] results do not show {pickup_city}->{return_city} with cached city state; cache invalidated for {self.cached_cities}")
+        self.cached_cities = []
+        return False
+
+    # 保守模式下的固定等待；快速模式跳过，由各处的 DOM/网络条件等待兜底
+    def pause(self, ms: int) -> None:
+        if not self.fast:
+            self.page.wait_for_timeout(ms)
+
+    def navigate(self) -> None:
+        print("[form] open firstStep page…")
+        with self.t.phase("navigate"):
+            # 更宽松的导航等待与超时，降低网络波动导致的超时
+            try:
+                self.page.goto(EHI_BASE_URL, wait_until="domcontentloaded", timeout=60000)
+            except Exception:
+                # 兜底再等到 networkidle，但不抛出，让上层重试机制接管
+                try:
+                    self.page.goto(EHI_BASE_URL, wait_until="load", timeout=60000)
+                except Exception:
+                    pass
+            # 等待关键输入框渲染完成
+            try:
+                self.page.wait_for_selector("#pickupcity", timeout=30000, state="visible")
+                self.page.wait_for_selector("#returncity", timeout=30000, state="visible")
+            except Exception:
+                self.page.wait_for_load_state("networkidle")
+        _debug_dump(self.page, self.s, "01_loaded_firstStep")
 
     # 调试输出工具：仅在 DEBUG=1 时打印
-    def _dbg(msg: str) -> None:
-        if s.debug:
+    def _dbg(self, msg: str) -> None:
+        if self.s.debug:
             try:
                 print(f"[dbg] {msg}")
             except Exception:
                 pass
 
-    # 仅设置城市，不改动门店
-    def fill_city(field_id: str, city: str) -> None:
+    def _site(self) -> str:
+        if self._site_fp is None:
+            try:
+                self._site_fp = fingerprint(self.page.evaluate(SCRIPTS_JS))
+            except Exception:
+                self._site_fp = ""
+        return self._site_fp
+
+    def _form_state(self) -> dict:
+        try:
+            return self.page.evaluate(FORM_STATE_JS) or {}
+        except Exception:
+            return {}
+
+    def _apply_cached_city(self, field_id: str, city: str) -> bool:
+        # 一步写回缓存的表单状态；这里只能发现写回失败，站点是否采用由 verify_cached_route 按结果确认
+        state = self.cities.get(field_id, city, self._site()) if self.cities is not None else None
+        if not state:
+            return False
         try:
-            el = page.locator(f"#{field_id}").first
+            self.page.evaluate(APPLY_FORM_STATE_JS, state)
+            el = self.page.locator(f"#{field_id}").first
+            if el.count() > 0 and self.page.evaluate(CITY_APPLIED_JS, [el.element_handle(), city]):
+                self._dbg(f"city[{field_id}] applied cached state ({len(state)} fields)")
+                self.cached_cities.append((field_id, city))
+                return True
+        except Exception as e:
+            self._dbg(f"city[{field_id}] cached state failed: {e}")
+        print(f"[form] city cache invalid for {field_id}={city}; fall back to typing")
+        self.cities.invalidate(field_id, city)
+        return False
+
+    # 仅设置城市，不改动门店；命中缓存时一步写回，否则走交互并把结果写入缓存
+    def fill_city(self, field_id: str, city: str) -> None:
+        if self._apply_cached_city(field_id, city):
+            return
+        before = self._form_state() if self.cities is not None else None
+        if self._fill_city_interactive(field_id, city) and before is not None:
+            diff = state_diff(before, self._form_state())
+            if diff:
+                self.cities.put(field_id, city, self._site(), diff)
+                self._dbg(f"city[{field_id}] cached {len(diff)} changed fields")
+
+    def _fill_city_interactive(self, field_id: str, city: str) -> bool:
+        try:
+            el = self.page.locator(f"#{field_id}").first
             if el.count() == 0:
-                return
+                return False
             # 最多尝试两轮：输入 -> 点击候选 -> 校验
             for _ in range(2):
                 el.click()
                 el.fill("")
-                _dbg(f"city[{field_id}] typing '{city}'")
-                el.type(city, delay=20)
-                page.wait_for_timeout(150)
+                self._dbg(f"city[{field_id}] typing '{city}'")
+                el.type(city, delay=0 if self.fast else 20)
+                self.pause(150)
                 # 先按一次回车：该站点会弹出自定义城市候选（.city-search）
                 try:
-                    page.keyboard.press("Enter")
-                    _dbg(f"city[{field_id}] pressed Enter")
+                    self.page.keyboard.press("Enter")
+                    self._dbg(f"city[{field_id}] pressed Enter")
                 except Exception:
                     pass
-                page.wait_for_timeout(150)
+                self.pause(150)
 
                 # 明确等待候选出现，并点击完全匹配的项（必须点击后才继续下一步）
                 variants = [city, f"{city}市"]
                 # 优先匹配该站点自定义候选：.city-search
-                city_dd = page.locator(".city-search").first
+                city_dd = self.page.locator(".city-search").first
                 clicked = False
                 try:
                     city_dd.wait_for(state="visible", timeout=1200)
-                    _dbg(".city-search visible")
+                    self._dbg(".city-search visible")
                     for v in variants:
                         opt = city_dd.locator(f"xpath=.//li[normalize-space(text())='{v}']").first
                         if opt.count() > 0:
@@ -217,28 +272,21 @@ def _form_fill_search(page: Page, s: Settings) -> None:
                                 opt.scroll_into_view_if_needed()
                             except Exception:
                                 pass
-                            _dbg(f"city[{field_id}] click candidate '{v}'")
+                            self._dbg(f"city[{field_id}] click candidate '{v}'")
                             opt.click()
                             clicked = True
                             break
                 except Exception:
-                    _dbg(".city-search not visible; fallback dropdown")
+                    self._dbg(".city-search not visible; fallback dropdown")
 
                 # 若自定义候选未命中，则退回到通用 AntD 类下拉容器
-                dropdowns = page.locator(
-                    ", ".join([
-                        ".ant-select-dropdown:not(.ant-select-dropdown-hidden)",
-                        ".ant-cascader-dropdown:not(.ant-cascader-dropdown-hidden)",
-                        ".ant-dropdown:not(.ant-dropdown-hidden)",
-                        "[role='listbox']",
-                    ])
-                )
+                dropdowns = self.page.locator(ANTD_DROPDOWNS)
                 if not clicked:
                     try:
                         dropdowns.wait_for(state="visible", timeout=3000)
-                        _dbg("AntD dropdown visible")
+                        self._dbg("AntD dropdown visible")
                     except Exception:
-                        _dbg("AntD dropdown not visible")
+                        self._dbg("AntD dropdown not visible")
                     for v in variants:
                         # 先在可见下拉里找完全匹配
                         opt = dropdowns.locator(
@@ -246,7 +294,7 @@ def _form_fill_search(page: Page, s: Settings) -> None:
                         ).first
                         if opt.count() == 0:
                             # 退一步：全局第一个可见 li/div/a/span 精确文本
-                            opt = page.locator(
+                            opt = self.page.locator(
                                 f"xpath=(//*[self::li or self::div or self::a or self::span][normalize-space(text())='{v}' and not(ancestor::*[contains(@style,'display: none')])])[1]"
                             )
                         if opt.count() > 0:
@@ -254,18 +302,24 @@ def _form_fill_search(page: Page, s: Settings) -> None:
                                 opt.scroll_into_view_if_needed()
                             except Exception:
                                 pass
-                            _dbg(f"city[{field_id}] click AntD candidate '{v}'")
+                            self._dbg(f"city[{field_id}] click AntD candidate '{v}'")
                             opt.click()
                             clicked = True
                             break
 
                 # 如果没有可点项，使用键盘选中第一项
                 if not clicked:
-                    _dbg(f"city[{field_id}] fallback ArrowDown+Enter")
-                    page.keyboard.press("ArrowDown")
-                    page.keyboard.press("Enter")
+                    self._dbg(f"city[{field_id}] fallback ArrowDown+Enter")
+                    self.page.keyboard.press("ArrowDown")
+                    self.page.keyboard.press("Enter")
                     # 键盘选择后也等待一会，避免立即进入下一步
-                    page.wait_for_timeout(600)
+                    if self.fast:
+                        try:
+                            self.page.wait_for_function(CITY_APPLIED_JS, arg=[el.element_handle(), city], timeout=1500)
+                        except Exception:
+                            pass
+                    else:
+                        self.page.wait_for_timeout(600)
 
                 # 校验是否已选中目标城市
                 title = el.get_attribute("title") or ""
@@ -273,29 +327,25 @@ def _form_fill_search(page: Page, s: Settings) -> None:
                 if (city in title) or (city in value):
                     # 等待候选消失或门店输入框可用
                     try:
-                        page.wait_for_function("() => document.querySelector('.city-search')===null || getComputedStyle(document.querySelector('.city-search')).display==='none'", timeout=1200)
+                        self.page.wait_for_function(CITY_SEARCH_CLOSED_JS, timeout=1200)
                     except Exception:
                         pass
-                    _dbg(f"city[{field_id}] selected title='{title}' value='{value}'")
-                    break
-            else:
-                # 两轮后仍未命中，强制赋值并触发事件
-                _dbg(f"city[{field_id}] force set '{city}'")
-                page.evaluate(
-                    "(el, val) => { el.removeAttribute('readonly'); el.value = val; el.setAttribute('value', val); el.dispatchEvent(new Event('input',{bubbles:true})); el.dispatchEvent(new Event('change',{bubbles:true})); el.blur(); }",
-                    el,
-                    city,
-                )
+                    self._dbg(f"city[{field_id}] selected title='{title}' value='{value}'")
+                    return True
+            # 两轮后仍未命中，强制赋值并触发事件（不写缓存）
+            self._dbg(f"city[{field_id}] force set '{city}'")
+            el.evaluate(FORCE_SET_JS, city)
         except Exception:
             pass
+        return False
     # 门店选择逻辑已移除，沿用页面默认门店
 
     # 日期（仅日期）选择：点击对应日期输入，打开 AntD 日历，点指定 title=YYYY-MM-DD 的单元格
-    def set_date(date_id: str, date_label: str, date_value: str) -> bool:
+    def set_date(self, date_id: str, date_label: str, date_value: str) -> bool:
         print(f"[form] set {date_label}: {date_value}")
-        inp = page.locator(f"#{date_id}").first
+        inp = self.page.locator(f"#{date_id}").first
         if inp.count() == 0:
-            inp = page.locator(f"xpath=//*[contains(text(), '{date_label}')]/following::input[1]").first
+            inp = self.page.locator(f"xpath=//*[contains(text(), '{date_label}')]/following::input[1]").first
         if inp.count() == 0:
             print(f"[form] err: 未找到 {date_label} 输入框")
             return False
@@ -309,18 +359,30 @@ def _form_fill_search(page: Page, s: Settings) -> None:
                     (container if container.count() > 0 else inp).click()
                 except Exception:
                     inp.click(force=True)
-                dd_all = page.locator(".ant-picker-dropdown:not(.ant-picker-dropdown-hidden)")
+                dd_all = self.page.locator(".ant-picker-dropdown:not(.ant-picker-dropdown-hidden)")
                 dd_all.wait_for(state="visible", timeout=6000)
                 dd = dd_all.last
                 # 选择指定日期
                 cell = dd.locator(f".ant-picker-cell[title='{date_value}']").first
+                if cell.count() == 0 and self._jump_to_month(dd, date_value):
+                    try:
+                        cell.wait_for(state="attached", timeout=1500)
+                    except Exception:
+                        pass
                 if cell.count() == 0:
                     # 可能跨月，向右翻最多 12 次
                     try:
                         for _ in range(12):
                             dd.locator(".ant-picker-header-next-btn").first.click()
-                            page.wait_for_timeout(120)
                             cell = dd.locator(f".ant-picker-cell[title='{date_value}']").first
+                            if self.fast:
+                                # 翻页后直接等目标单元格出现，超时说明还需继续翻
+                                try:
+                                    cell.wait_for(state="attached", timeout=250)
+                                    break
+                                except Exception:
+                                    continue
+                            self.page.wait_for_timeout(120)
                             if cell.count() > 0:
                                 break
                     except Exception:
@@ -333,11 +395,10 @@ def _form_fill_search(page: Page, s: Settings) -> None:
                     cell.click()
                     # 等待输入值更新
                     try:
-                        page.wait_for_function(
-                            "(el, v) => (el.getAttribute('value')||'')===v || (el.getAttribute('title')||'')===v",
-                            arg=inp,
+                        self.page.wait_for_function(
+                            DATE_APPLIED_JS,
+                            arg=[inp.element_handle(), date_value],
                             timeout=1500,
-                            **{"v": date_value}
                         )
                     except Exception:
                         pass
@@ -348,9 +409,9 @@ def _form_fill_search(page: Page, s: Settings) -> None:
                         ok_btn.click()
                 except Exception:
                     pass
-                page.keyboard.press("Escape")
+                self.page.keyboard.press("Escape")
             except Exception as e:
-                _dbg(f"date[{date_id}] exception: {e}")
+                self._dbg(f"date[{date_id}] exception: {e}")
             # 校验是否已生效
             try:
                 val_now = inp.get_attribute("value") or ""
@@ -360,27 +421,23 @@ def _form_fill_search(page: Page, s: Settings) -> None:
             except Exception:
                 pass
             # 若第一轮未成功，短暂等待后重试
-            page.wait_for_timeout(120)
+            self.pause(120)
         # 校验
         try:
             val = inp.get_attribute("value") or ""
             title = inp.get_attribute("title") or ""
             ok = (date_value in val) or (date_value in title)
-            _dbg(f"date[{date_id}] check val='{val}' title='{title}' ok={ok}")
+            self._dbg(f"date[{date_id}] check val='{val}' title='{title}' ok={ok}")
             if not ok:
                 # 最后兜底：直接赋值 + 触发事件 + blur（注意：部分站点不会更新内部状态，此兜底可能无效）
                 print(f"[form] warn: {date_label} 未生效 -> 直接赋值兜底")
                 try:
-                    page.evaluate(
-                        "(el, val) => { el.removeAttribute('readonly'); el.value = val; el.setAttribute('value', val); el.dispatchEvent(new Event('input',{bubbles:true})); el.dispatchEvent(new Event('change',{bubbles:true})); el.blur(); }",
-                        inp,
-                        date_value,
-                    )
-                    page.wait_for_timeout(120)
+                    inp.evaluate(FORCE_SET_JS, date_value)
+                    self.pause(120)
                     val2 = inp.get_attribute("value") or ""
                     title2 = inp.get_attribute("title") or ""
                     ok2 = (date_value in val2) or (date_value in title2)
-                    _dbg(f"date[{date_id}] after force-set val='{val2}' title='{title2}' ok={ok2}")
+                    self._dbg(f"date[{date_id}] after force-set val='{val2}' title='{title2}' ok={ok2}")
                     return ok2
                 except Exception:
                     return False
@@ -388,134 +445,431 @@ def _form_fill_search(page: Page, s: Settings) -> None:
         except Exception:
             return False
 
-    # 已移除时间选择逻辑（沿用页面默认时间），避免复杂的下拉兼容问题
-    # 保留占位，防止意外调用
-    def set_time_only(time_id: str, time_label: str, time_value: str) -> None:
-        _dbg(f"skip time select [{time_id}] -> use default")
-        return
+    def _jump_to_month(self, dd: Locator, date_value: str) -> bool:
+        # 直接跳到目标月份：读取面板标题的年月，算出差值后连续翻页（中间不等待），跨年用双箭头
+        try:
+            header = dd.locator(".ant-picker-header-view").first.inner_text()
+        except Exception:
+            return False
+        delta = month_delta(header, date_value)
+        if delta == 0:
+            return False
+        forward = delta > 0
+        years, months = divmod(abs(delta), 12)
+        self._dbg(f"date jump {header!r} -> {date_value}: {delta:+d} months")
+        try:
+            year_btn = dd.locator(".ant-picker-header-super-next-btn" if forward else ".ant-picker-header-super-prev-btn").first
+            month_btn = dd.locator(".ant-picker-header-next-btn" if forward else ".ant-picker-header-prev-btn").first
+            for _ in range(years):
+                year_btn.click()
+            for _ in range(months):
+                month_btn.click()
+        except Exception:
+            return False
+        return True
 
+    # 分阶段重试的检查点：阶段结束后校验页面状态，不满足时抛 PhaseError 交给 PhaseRunner 重试
+    def check_loaded(self) -> None:
+        try:
+            ok = self.page.locator("#pickupcity").first.is_visible() and self.page.locator("#returncity").first.is_visible()
+        except Exception:
+            ok = False
+        if not ok:
+            raise PhaseError("navigate", "city inputs not visible")
 
-    # 仅设置城市（门店使用页面默认）
-    fill_city("pickupcity", s.pickup_city)
-    fill_city("returncity", s.return_city)
+    def check_cities(self, pickup_city: str, return_city: str) -> None:
+        for field_id, city in (("pickupcity", pickup_city), ("returncity", return_city)):
+            try:
+                el = self.page.locator(f"#{field_id}").first
+                ok = el.count() > 0 and bool(self.page.evaluate(CITY_APPLIED_JS, [el.element_handle(), city]))
+            except Exception:
+                ok = False
+            if not ok:
+                raise PhaseError("city", f"{field_id} is not {city}")
 
-    # 简单直接：仅设置日期，跳过时间选择，使用页面默认时间
-    ok1 = set_date("pickupdate", "取车日期", s.pickup_date)
-    ok2 = set_date("returndate", "还车日期", s.return_date)
-    print("[form] skip 取/还车时间选择，沿用页面默认时间")
-    _debug_dump(page, s, "02_filled_form")
+    def results_seen(self, capture: Optional[ResultsCapture] = None) -> bool:
+        if capture is not None and capture.offers:
+            return True
+        try:
+            if self.page.locator(".cartype-list:not([data-ehi-stale])").count() > 0:
+                return True
+            # 页面上只剩上一次查询的旧卡片：视为还没出结果
+            if self.page.locator("[data-ehi-stale]").count() > 0:
+                return False
+            return self.page.locator("text=预订").count() > 0 or self.page.locator("text=日均").count() > 0
+        except Exception:
+            return False
 
-    # Click search button
-    try:
-        print("[form] click 查询…")
-        # 匹配“查询/查 询”等变体
-        import re as _re
-        page.get_by_role("button", name=_re.compile(r"查\s*询")).first.click()
-    except Exception:
+    def navigate_checked(self) -> None:
+        self.navigate()
+        self.check_loaded()
+
+    def fill_cities_checked(self, pickup_city: str, return_city: str) -> None:
+        self.fill_cities(pickup_city, return_city)
+        self.check_cities(pickup_city, return_city)
+
+    def set_dates_checked(self, pickup_date: str, return_date: str) -> None:
+        if not self.set_dates(pickup_date, return_date):
+            raise PhaseError("date", f"{pickup_date} ~ {return_date} not applied")
+
+    def submit_checked(self, capture: Optional[ResultsCapture] = None) -> None:
+        self.submit(capture)
+        if not self.results_seen(capture):
+            raise PhaseError("search", "no results rendered")
+
+    # 重试前的恢复：只回到该阶段的前置状态，不重开页面
+    def ensure_loaded(self) -> None:
         try:
-            page.locator("button:has-text('查')").first.click()
+            self.check_loaded()
+        except PhaseError:
+            self.navigate_checked()
+
+    def ensure_form(self, pickup_city: str, return_city: str) -> None:
+        try:
+            # 关掉可能残留的日历/候选弹层
+            self.page.keyboard.press("Escape")
         except Exception:
-            try:
-                page.locator("text=查询").first.click()
-            except Exception:
-                # last resort: press Enter
-                page.keyboard.press("Enter")
+            pass
+        if not self.form_ready():
+            self.back_to_form(pickup_city, return_city)
 
-    # Wait for results to load: look for car cards or booking buttons
-    # 适当等待页面刷新，确保渲染完成
-    page.wait_for_load_state("networkidle")
-    page.wait_for_timeout(800)
-    try:
-        page.wait_for_selector(".cartype-list, text=预订", timeout=15000)
-    except Exception:
+    def prepare_resubmit(self, pickup_city: str, return_city: str, pickup_date: str, return_date: str) -> None:
+        if not self.form_ready():
+            self.back_to_form(pickup_city, return_city)
+            self.set_dates_checked(pickup_date, return_date)
+        self.mark_results_stale()
+
+    def form_ready(self) -> bool:
         try:
-            page.wait_for_selector("text=日均", timeout=6000)
+            return self.page.locator("#pickupdate").count() > 0 and self.page.locator("#pickupdate").first.is_visible()
+        except Exception:
+            return False
+
+    def back_to_form(self, pickup_city: str, return_city: str) -> None:
+        # 查询后若跳到了不含表单的结果页：先尝试后退，仍不行再完整重载并重填城市
+        try:
+            self.page.go_back(wait_until="domcontentloaded", timeout=15000)
+            self.page.wait_for_selector("#pickupdate", timeout=5000, state="visible")
+            return
         except Exception:
             pass
-    _debug_dump(page, s, "03_results")
-
-
-def _extract_by_cards(page: Page, car_name: str) -> Optional[float]:
-    # 备用方案：以“预订”按钮为锚点，向上找到卡片容器，匹配车型关键字并解析价格
-    keywords = []
-    if car_name and car_name.strip():
-        keywords.append(car_name.strip())
-    # 中文关键词启发（大众 + 探影/新探影）
-    if "大众" not in "".join(keywords):
-        keywords.append("大众")
-    if "探影" not in "".join(keywords):
-        keywords.append("探影")
-
-    buttons = page.locator("text=预订")
-    count = buttons.count()
-    for i in range(min(20, count)):
-        btn = buttons.nth(i)
-        card = btn.locator("xpath=ancestor::div[1]")
+        self.navigate()
+        self.fill_cities(pickup_city, return_city)
+
+    def mark_results_stale(self) -> None:
+        # 同一页面重复查询前给旧结果打标记，避免把上一次的卡片当作新结果
         try:
-            text = card.inner_text()
+            self.page.evaluate("() => document.querySelectorAll('.cartype-list').forEach(e => e.setAttribute('data-ehi-stale', '1'))")
         except Exception:
-            try:
-                text = btn.locator("xpath=ancestor::div[2]").inner_text()
-            except Exception:
-                continue
-        if all(k in text for k in [kw for kw in keywords if kw]):
-            # 更谨慎：只在价格容器附近找
-            try:
-                price_text = btn.locator("xpath=ancestor::li[contains(@class,'cartype-operate')]//div[contains(@class,'cartype-price-current')]//text()")
-                # Playwright 不支持直接 text() 列表，这里退回用祖先块文本解析
-                p = parse_price_from_text(text)
-            except Exception:
-                p = parse_price_from_text(text)
-            if p is not None:
-                return p
+            pass
 
-    # 最后尝试：页面任意节点同时包含“大众”与“探影/新探影”
-    try:
-        nodes = page.locator("xpath=//*[contains(normalize-space(.),'大众') and (contains(normalize-space(.),'探影') or contains(normalize-space(.),'新探影'))]")
-        n = nodes.count()
-        for i in range(min(10, n)):
-            node = nodes.nth(i)
+    # 已移除时间选择逻辑（沿用页面默认时间），避免复杂的下拉兼容问题
+    # 保留占位，防止意外调用
+    def set_time_only(self, time_id: str, time_label: str, time_value: str) -> None:
+        self._dbg(f"skip time select [{time_id}] -> use default")
+        return
+
+    def fill_cities(self, pickup_city: str, return_city: str) -> None:
+        # 仅设置城市（门店使用页面默认）
+        with self.t.phase("fill_city"):
+            self.fill_city("pickupcity", pickup_city)
+            self.fill_city("returncity", return_city)
+
+    def set_dates(self, pickup_date: str, return_date: str) -> bool:
+        # 简单直接：仅设置日期，跳过时间选择，使用页面默认时间
+        with self.t.phase("set_date"):
+            ok1 = self.set_date("pickupdate", "取车日期", pickup_date)
+            ok2 = self.set_date("returndate", "还车日期", return_date)
+        return ok1 and ok2
+
+    def click_search(self) -> None:
+        try:
+            print("[form] click 查询…")
+            # 匹配“查询/查 询”等变体
+            self.page.get_by_role("button", name=SEARCH_BUTTON_RE).first.click()
+            return
+        except Exception:
+            pass
+        for selector in SEARCH_FALLBACK_SELECTORS:
             try:
-                text = node.inner_text()
-                p = parse_price_from_text(text)
-                if p is not None:
-                    return p
+                self.page.locator(selector).first.click()
+                return
             except Exception:
                 continue
-    except Exception:
-        pass
-    return None
-
-
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-def get_current_price(settings: Settings) -> Optional[float]:
-    # 始终使用 firstStep 表单模式，地址固定
-    with browser_ctx(headful=settings.headful) as (_browser, page):
-        _form_fill_search(page, settings)
-
-        # 优先使用针对页面结构的解析
-        price = _extract_from_cartype_lists(page, settings.car_name)
-        if price is None:
-            # 其次使用名称就近解析
-            price = _extract_price_near_model(page, settings.car_name)
-        if price is None:
-            # Try scrolling to load more and retry
+        # last resort: press Enter
+        self.page.keyboard.press("Enter")
+
+    def wait_results_dom(self) -> None:
+        # Wait for results to load: look for car cards or booking buttons
+        # 适当等待页面刷新，确保渲染完成；快速模式直接等结果卡片出现
+        if not self.fast:
+            self.page.wait_for_load_state("networkidle")
+            self.page.wait_for_timeout(800)
+        try:
+            self.page.wait_for_selector(".cartype-list:not([data-ehi-stale]), text=预订", timeout=15000)
+        except Exception:
             try:
-                page.mouse.wheel(0, 1200)
-                page.wait_for_timeout(800)
-                price = _extract_from_cartype_lists(page, settings.car_name) or _extract_price_near_model(page, settings.car_name)
+                self.page.wait_for_selector("text=日均", timeout=6000)
             except Exception:
                 pass
-        if price is None:
-            # 针对 .cartype-list 的直接解析
+
+    def submit(self, capture: Optional[ResultsCapture] = None) -> None:
+        if capture is None:
+            with self.t.phase("search"):
+                self.click_search()
+            with self.t.phase("results"):
+                self.wait_results_dom()
+        else:
+            # 接口拦截：拿到查询接口的 JSON 即可解析全部车型价格，无需等待渲染
+            self.page.on("response", capture.record)
             try:
-                price = _extract_from_cartype_lists(page, settings.car_name)
-            except Exception:
-                pass
-        if price is None:
-            # 尝试卡片式提取
+                with self.t.phase("search"):
+                    try:
+                        with self.page.expect_response(capture.matches, timeout=int(self.s.results_api_timeout_seconds * 1000)):
+                            self.click_search()
+                    except Exception:
+                        self._dbg("results API response not seen in time")
+                with self.t.phase("results"):
+                    if not capture.drain():
+                        self._dbg("no offers in results API yet; wait for DOM")
+                        self.wait_results_dom()
+                        # 渲染期间可能才收到真正的列表接口
+                        capture.drain()
+                if capture.offers:
+                    print(f"[form] results API captured: {len(capture.offers)} offers")
+            finally:
+                self.page.remove_listener("response", capture.record)
+        _debug_dump(self.page, self.s, "03_results")
+
+
+def _form_fill_search(
+    page: Page,
+    s: Settings,
+    capture: Optional[ResultsCapture] = None,
+    timer: Optional[PhaseTimer] = None,
+    runner: Optional[PhaseRunner] = None,
+) -> FormSession:
+    # Fill pickup/return cities and stores, pickup/return dates and times, then submit
+    # 每个阶段单独重试：失败时在同一页面上回到前一个检查点继续，而不是重开浏览器
+    form = FormSession(page, s, timer)
+    r = runner or PhaseRunner.from_settings(s)
+    r.run("navigate", form.navigate_checked)
+    r.run("city", lambda: form.fill_cities_checked(s.pickup_city, s.return_city), restore=form.ensure_loaded)
+    r.run("date", lambda: form.set_dates_checked(s.pickup_date, s.return_date), restore=lambda: form.ensure_form(s.pickup_city, s.return_city))
+    print("[form] skip 取/还车时间选择，沿用页面默认时间")
+    _debug_dump(page, s, "02_filled_form")
+    # 结果为空也可能是真的无车：重试用尽后继续提取（价格为 None），不抛出
+    r.run(
+        "search",
+        lambda: form.submit_checked(capture),
+        restore=lambda: form.prepare_resubmit(s.pickup_city, s.return_city, s.pickup_date, s.return_date),
+        required=False,
+    )
+    return form
+
+
+def _scan_cards(page: Page, car_names: list[str], timer: Optional[PhaseTimer] = None) -> list[CardRow]:
+    # 一次 evaluate 取回整页卡片表，匹配全部在 Python 侧完成
+    t = timer or PhaseTimer()
+    with t.phase("extract"):
+        try:
+            rows = rows_from_js(page.evaluate(CARDS_JS, car_names))
+        except Exception:
+            rows = []
+    print(f"[form] extract: {len(rows)} rows in {t.last('extract') * 1000:.1f} ms")
+    return rows
+
+
+def _harvest_cards(page: Page, settings: Settings, car_names: list[str], timer: Optional[PhaseTimer] = None) -> list[CardRow]:
+    # 滚动收割 .cartype-list：每轮只提取新出现的卡片，找齐车型或列表不再变长即停（见 cards.HARVEST_JS）
+    t = timer or PhaseTimer()
+    h = Harvest(car_names, settings.harvest_max_scrolls, full=settings.snapshot_mode)
+    while True:
+        scrolling = h.scrolls > 0
+        with t.phase("scroll" if scrolling else "extract"):
             try:
-                price = _extract_by_cards(page, settings.car_name)
-            except Exception:
-                pass
-        return price
+                result = page.evaluate(HARVEST_JS, h.args(settings.harvest_idle_ms, settings.harvest_quiet_ms))
+            except Exception as e:
+                print(f"[harvest] evaluate failed: {e}")
+                break
+        if scrolling:
+            HARVEST_SCROLLS.inc()
+        if not h.add(result):
+            break
+    HARVEST_STOPS.inc(reason=h.stop_reason or "error")
+    print(f"[harvest] {h.summary()}")
+    return h.rows
+
+
+@contextmanager
+def _page_for(settings: Settings, pool: Optional[BrowserPool]) -> Iterator[Page]:
+    if pool is not None:
+        # 复用长驻浏览器：重试时只重新开 page，不再重新启动 Chromium
+        with pool.page() as page:
+            yield page
+    elif settings.persistent_profile:
+        # 一次性浏览器也沿用持久化 profile（storage_state + 磁盘 HTTP 缓存）
+        with BrowserPool.from_settings(settings) as tmp, tmp.page() as page:
+            yield page
+    else:
+        with browser_ctx(headful=settings.headful, fast=settings.fast_mode, cleanup=settings.kill_orphan_chromium) as (_browser, page):
+            yield page
+
+
+def _count_retry(retry_state) -> None:
+    SEARCH_RETRIES.inc()
+
+
+# 阶段内的重试由 PhaseRunner 负责；这里只在页面/浏览器本身失效（阶段重试用尽或崩溃）时换新页面再来一次
+@retry(stop=stop_after_attempt(2), wait=wait_fixed(2), before_sleep=_count_retry)
+def get_prices_for_search(
+    settings: Settings,
+    car_names: list[str],
+    pool: Optional[BrowserPool] = None,
+    timer: Optional[PhaseTimer] = None,
+) -> dict[str, Optional[float]]:
+    # 一次填表查询，从同一结果页读取多个车型的价格（settings 中的城市/日期即查询条件）
+    t = timer or PhaseTimer()
+    runner = PhaseRunner.from_settings(settings)
+    try:
+        with _page_for(settings, pool) as page, _blocking(page, settings):
+            prices = _search_and_extract(page, settings, list(dict.fromkeys(car_names)), t, runner)
+        SEARCHES.inc(result="ok")
+        return prices
+    except Exception:
+        SEARCHES.inc(result="error")
+        raise
+    finally:
+        print(f"[timing] {'fast' if settings.fast_mode else 'conservative'}: {t.summary()}")
+        if runner.report.attempts:
+            print(f"[retry] {runner.report.summary()}")
+
+
+def _search_and_extract(
+    page: Page,
+    settings: Settings,
+    names: list[str],
+    t: PhaseTimer,
+    runner: Optional[PhaseRunner] = None,
+) -> dict[str, Optional[float]]:
+    r = runner or PhaseRunner.from_settings(settings)
+    capture = ResultsCapture(settings.results_api_pattern) if settings.results_capture else None
+    form = _form_fill_search(page, settings, capture, t, r)
+    if not form.verify_cached_route(settings.pickup_city, settings.return_city, capture):
+        # 写回的城市没有被站点采用：不用缓存，完整填表重新查询
+        capture = ResultsCapture(settings.results_api_pattern) if settings.results_capture else None
+        form = _form_fill_search(page, replace(settings, city_cache=False), capture, t, r)
+    prices = r.run("extract", lambda: _extract_prices(page, settings, names, t, capture))
+    if all(p is None for p in prices.values()):
+        form.invalidate_cached_cities()
+    else:
+        form.confirm_cached_cities()
+        _remember_replay(page, settings, capture)
+    return prices
+
+
+def _remember_replay(page: Page, settings: Settings, capture: Optional[ResultsCapture]) -> None:
+    # 混合模式：记下本次查询的结果接口请求与 cookie，后续轮询直接 HTTP 重放
+    replayer = replayer_from_settings(settings)
+    if replayer is None or capture is None or capture.request is None:
+        return
+    try:
+        replayer.remember(settings, capture.request, page.context.cookies())
+    except Exception as e:
+        print(f"[replay] could not save template: {e}")
+
+
+def _extract_prices(
+    page: Page,
+    settings: Settings,
+    names: list[str],
+    t: PhaseTimer,
+    capture: Optional[ResultsCapture],
+    search: Optional[SearchKey] = None,
+) -> dict[str, Optional[float]]:
+    # search：本次查询条件（日期扫描时与 settings 中的日期不同），用于库存快照
+    if capture is not None and capture.offers:
+        # 接口数据已包含全部车型，不再走 DOM 解析
+        prices = {c: capture.price_for(c) for c in names}
+        for p in prices.values():
+            EXTRACT_STRATEGY.inc(strategy="api" if p is not None else "miss")
+        save_inventory(settings, inventory_from_offers(capture.offers, "api"), search)
+        return prices
+
+    rows = _harvest_cards(page, settings, names, t)
+    save_inventory(settings, inventory_from_cards(rows), search)
+    prices: dict[str, Optional[float]] = {}
+    for c in names:
+        prices[c], source = match_for(rows, c)
+        if source:
+            EXTRACT_STRATEGY.inc(strategy=source)
+    missing = [c for c, p in prices.items() if p is None]
+    if missing:
+        # 卡片里没有（或页面没有 .cartype-list 结构）：整表提取的名称就近 / “预订”块兜底，列表此时已滚到底
+        rows = _scan_cards(page, missing, t)
+        for c in missing:
+            # 最后才用“预订”按钮锚点的卡片块
+            prices[c], source = match_for(rows, c, include_booking=True)
+            EXTRACT_STRATEGY.inc(strategy=source or "miss")
+    return prices
+
+
+def get_current_price(settings: Settings, pool: Optional[BrowserPool] = None) -> Optional[float]:
+    return get_prices_for_search(settings, [settings.car_name], pool).get(settings.car_name)
+
+
+def sweep_prices(
+    settings: Settings,
+    date_pairs: list[tuple[str, str]],
+    car_names: list[str],
+    pool: Optional[BrowserPool] = None,
+    timer: Optional[PhaseTimer] = None,
+) -> dict[tuple[str, str], dict[str, Optional[float]]]:
+    # 日期扫描：同一页面只加载一次、城市只填一次，之后每组日期只改日期并重新查询
+    t = timer or PhaseTimer()
+    names = list(dict.fromkeys(car_names))
+    matrix: dict[tuple[str, str], dict[str, Optional[float]]] = {}
+    r = PhaseRunner.from_settings(settings)
+    cities = (settings.pickup_city, settings.return_city)
+
+    def open_form(s: Settings) -> FormSession:
+        form = FormSession(page, s, t)
+        r.run("navigate", form.navigate_checked)
+        r.run("city", lambda: form.fill_cities_checked(*cities), restore=form.ensure_loaded)
+        return form
+
+    def search_dates(pickup_date: str, return_date: str) -> Optional[ResultsCapture]:
+        if not form.form_ready():
+            form.back_to_form(*cities)
+        r.run("date", lambda: form.set_dates_checked(pickup_date, return_date), restore=lambda: form.ensure_form(*cities))
+        form.mark_results_stale()
+        capture = ResultsCapture(settings.results_api_pattern) if settings.results_capture else None
+        r.run(
+            "search",
+            lambda: form.submit_checked(capture),
+            restore=lambda: form.prepare_resubmit(*cities, pickup_date, return_date),
+            required=False,
+        )
+        return capture
+
+    with _page_for(settings, pool) as page, _blocking(page, settings):
+        form = open_form(settings)
+        for pickup_date, return_date in date_pairs:
+            print(f"[sweep] {pickup_date} ~ {return_date}")
+            try:
+                capture = search_dates(pickup_date, return_date)
+                if not form.verify_cached_route(*cities, capture):
+                    # 写回的城市没有被站点采用：不用缓存重新打开表单，本组日期重查
+                    form = open_form(replace(settings, city_cache=False))
+                    capture = search_dates(pickup_date, return_date)
+                search = SearchKey(settings.pickup_city, settings.return_city, pickup_date, return_date)
+                matrix[(pickup_date, return_date)] = _extract_prices(page, settings, names, t, capture, search)
+            except Exception as e:
+                print(f"[sweep] error {pickup_date} ~ {return_date}: {e}")
+                matrix[(pickup_date, return_date)] = {c: None for c in names}
+        if all(p is None for row in matrix.values() for p in row.values()):
+            form.invalidate_cached_cities()
+    print(f"[timing] sweep {len(date_pairs)} pairs: {t.summary()}")
+    if r.report.attempts:
+        print(f"[retry] {r.report.summary()}")
+    return matrix
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Optional
+
+# 磁盘 HTTP 缓存（按路由实现）：Playwright 在启用 route 后会关闭浏览器自身的 HTTP 缓存，
+# 而请求拦截（routing.RequestBlocker）默认开启，所以静态资源改由这里在 context 级路由中缓存：
+#   命中且未过期 -> route.fulfill 直接返回磁盘内容，不发网络请求
+#   未命中 -> route.fetch 取回后落盘再返回
+# 只缓存 GET + 200 的静态资源；过期时间取 Cache-Control max-age / Expires，缺省用 default_ttl，最长 max_ttl。
+# 超过 max_bytes 时按最近访问时间淘汰。
+
+CACHEABLE_TYPES = ("script", "stylesheet", "font", "image")
+# route.fetch 取回的 body 已解压，这些头不能原样返回；落盘时另外去掉 set-cookie
+BODY_HEADERS = frozenset(("content-encoding", "content-length", "transfer-encoding", "connection"))
+DROP_HEADERS = BODY_HEADERS | {"set-cookie"}
+MAX_AGE_RE = re.compile(r"max-age\s*=\s*(\d+)", re.I)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stored: int = 0
+    bytes_saved: int = 0
+
+    def summary(self) -> str:
+        return f"hits={self.hits} misses={self.misses} stored={self.stored} saved={self.bytes_saved / 1024:.1f}KB"
+
+
+def _strip(headers: dict[str, str], drop: frozenset) -> dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in drop}
+
+
+def _ttl_from_headers(headers: dict[str, str], default_ttl: float, max_ttl: float) -> Optional[float]:
+    # None 表示不可缓存：no-store/no-cache（需每次向服务器确认，这里不做再验证）、max-age=0、已过期的 Expires。
+    # 只有完全没有缓存相关响应头时才按 default_ttl 复用
+    cc = headers.get("cache-control", "").lower()
+    directives = {d.strip().split("=", 1)[0].strip() for d in cc.split(",")}
+    if "no-store" in directives or "no-cache" in directives:
+        return None
+    if not cc and "no-cache" in headers.get("pragma", "").lower():
+        return None
+    m = MAX_AGE_RE.search(cc)
+    if m:
+        ttl = float(m.group(1))
+    elif "expires" in headers:
+        try:
+            ttl = parsedate_to_datetime(headers["expires"]).timestamp() - time.time()
+        except (TypeError, ValueError):
+            # 无法解析的 Expires 按已过期处理（RFC 9111）
+            return None
+    else:
+        ttl = default_ttl
+    if ttl <= 0:
+        return None
+    return min(ttl, max_ttl)
+
+
+class DiskHttpCache:
+    def __init__(
+        self,
+        directory: str | Path,
+        max_bytes: int = 200 * 1024 * 1024,
+        default_ttl: float = 86400.0,
+        max_ttl: float = 7 * 86400.0,
+        resource_types: tuple[str, ...] = CACHEABLE_TYPES,
+    ) -> None:
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.max_ttl = max_ttl
+        self.resource_types = frozenset(resource_types)
+        self.stats = CacheStats()
+        # key -> (size, last_access)
+        self._index: dict[str, tuple[int, float]] = {}
+        for meta in self.dir.glob("*.json"):
+            body = meta.with_suffix(".body")
+            try:
+                self._index[meta.stem] = (body.stat().st_size, meta.stat().st_mtime)
+            except OSError:
+                continue
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    @property
+    def size(self) -> int:
+        return sum(s for s, _ in self._index.values())
+
+    def reset_stats(self) -> CacheStats:
+        stats, self.stats = self.stats, CacheStats()
+        return stats
+
+    def get(self, url: str) -> Optional[tuple[int, dict[str, str], bytes]]:
+        k = self.key(url)
+        if k not in self._index:
+            return None
+        meta_path = self.dir / f"{k}.json"
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if meta.get("url") != url:
+                return None
+            if float(meta.get("expires", 0)) < time.time():
+                self._remove(k)
+                return None
+            body = (self.dir / f"{k}.body").read_bytes()
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            self._remove(k)
+            return None
+        self._index[k] = (len(body), time.time())
+        return int(meta.get("status", 200)), dict(meta.get("headers", {})), body
+
+    def put(self, url: str, status: int, headers: dict[str, str], body: bytes) -> bool:
+        lowered = {k.lower(): v for k, v in headers.items()}
+        ttl = _ttl_from_headers(lowered, self.default_ttl, self.max_ttl)
+        if status != 200 or ttl is None or len(body) > self.max_bytes // 10:
+            return False
+        k = self.key(url)
+        kept = _strip(lowered, DROP_HEADERS)
+        meta = {"url": url, "status": status, "headers": kept, "expires": time.time() + ttl, "stored": int(time.time())}
+        try:
+            (self.dir / f"{k}.body").write_bytes(body)
+            tmp = self.dir / f"{k}.json.tmp"
+            tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.dir / f"{k}.json")
+        except OSError:
+            return False
+        self._index[k] = (len(body), time.time())
+        self._evict()
+        return True
+
+    def _remove(self, k: str) -> None:
+        self._index.pop(k, None)
+        for suffix in (".json", ".body"):
+            try:
+                (self.dir / f"{k}{suffix}").unlink()
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        total = self.size
+        if total <= self.max_bytes:
+            return
+        for k, (size, _) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            self._remove(k)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        removed = 0
+        for k in list(self._index):
+            try:
+                meta = json.loads((self.dir / f"{k}.json").read_text(encoding="utf-8"))
+                expired = float(meta.get("expires", 0)) < now
+            except (OSError, ValueError):
+                expired = True
+            if expired:
+                self._remove(k)
+                removed += 1
+        return removed
+
+    def _cacheable(self, request: Any) -> bool:
+        return request.method == "GET" and request.resource_type in self.resource_types
+
+    # sync API：注册在 context 上（page 级的 RequestBlocker 先执行，放行的请求 fallback 到这里）
+    def handle(self, route: Any) -> None:
+        req = route.request
+        if not self._cacheable(req):
+            route.fallback()
+            return
+        hit = self.get(req.url)
+        if hit is not None:
+            status, headers, body = hit
+            self.stats.hits += 1
+            self.stats.bytes_saved += len(body)
+            route.fulfill(status=status, headers=headers, body=body)
+            return
+        self.stats.misses += 1
+        try:
+            resp = route.fetch()
+            body = resp.body()
+        except Exception:
+            # 网络错误或页面已关闭：交还给浏览器自己请求，否则这条路由永远不会被响应，页面一直等到超时
+            try:
+                route.fallback()
+            except Exception:
+                pass
+            return
+        if self.put(req.url, resp.status, resp.headers, body):
+            self.stats.stored += 1
+        route.fulfill(status=resp.status, headers=_strip(resp.headers, BODY_HEADERS), body=body)
+
+    # async API
+    async def handle_async(self, route: Any) -> None:
+        req = route.request
+        if not self._cacheable(req):
+            await route.fallback()
+            return
+        hit = self.get(req.url)
+        if hit is not None:
+            status, headers, body = hit
+            self.stats.hits += 1
+            self.stats.bytes_saved += len(body)
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+        self.stats.misses += 1
+        try:
+            resp = await route.fetch()
+            body = await resp.body()
+        except Exception:
+            try:
+                await route.fallback()
+            except Exception:
+                pass
+            return
+        if self.put(req.url, resp.status, resp.headers, body):
+            self.stats.stored += 1
+        await route.fulfill(status=resp.status, headers=_strip(resp.headers, BODY_HEADERS), body=body)
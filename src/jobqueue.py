@@ -0,0 +1,476 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from .browser_pool import BrowserPool
+from .config import Settings
+from .metrics import JOB_QUEUE_DEPTH, JOBS
+from .replay import replayer_from_settings
+from .watches import SearchKey, settings_for_search
+
+# 分布式执行（DISPATCH=queue）：主进程（协调者）每次轮询把到期的查询写入共享的 SQLite 任务队列，
+# 由任意多个 worker 进程（python run.py worker，可在共享同一 data 卷的多台主机上）领取执行，结果写回队列，
+# 协调者收集后照常做比价、落库与通知——浏览器只在 worker 里启动，通知与索引库仍只有一个写入者。
+#   领取（lease）：BEGIN IMMEDIATE 事务内原子地把一条任务标记为某 worker 所有，租期 JOB_LEASE_SECONDS
+#   心跳：worker 执行期间每 1/3 租期续租一次，单条任务执行超过 SEARCH_TIMEOUT_SECONDS × PHASE_ATTEMPTS 后停止续租；
+#   worker 被杀或抓取卡死后租期过期，任务自动重新投递给别的 worker
+#   失败：按指数退避重新排队，领取次数达到 JOB_MAX_ATTEMPTS 后标记 failed
+#   同一查询条件已在队列中（未领取）时合并车型，不重复排队；已被领取、仍在租期内且覆盖所需车型时直接复用，
+#   不再另排一条。上一轮等待超时的任务记下来，下一轮若它已完成（且在 JOB_WAIT_SECONDS 内）直接收取迟到的结果
+# 多台主机共享网络文件系统时 WAL 不可用（依赖共享内存），设 JOB_QUEUE_WAL=0 改用回滚日志。
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    search TEXT NOT NULL,
+    cars TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_ts REAL NOT NULL,
+    available_ts REAL NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT,
+    finished_ts REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(state, available_ts);
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    started_ts REAL NOT NULL,
+    seen_ts REAL NOT NULL,
+    jobs_done INTEGER NOT NULL DEFAULT 0
+);
+"""
+# worker 空闲时查询队列的间隔
+IDLE_POLL_SECONDS = 2.0
+# 失败重试的退避基数与上限
+RETRY_BASE_SECONDS = 15.0
+RETRY_MAX_SECONDS = 600.0
+
+
+def _search_json(search: SearchKey) -> str:
+    return json.dumps(asdict(search), ensure_ascii=False, sort_keys=True)
+
+
+@dataclass
+class Job:
+    id: int
+    search: SearchKey
+    cars: list[str]
+    attempts: int
+
+
+@dataclass
+class JobResult:
+    state: str
+    prices: dict[str, Optional[float]]
+    error: Optional[str]
+
+
+class JobQueue:
+    def __init__(
+        self,
+        path: str | Path = "data/jobs.db",
+        lease_seconds: float = 60.0,
+        max_attempts: int = 3,
+        wal: bool = True,
+    ) -> None:
+        self.lease_seconds = max(5.0, lease_seconds)
+        self.max_attempts = max(1, max_attempts)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 自己管理事务（BEGIN IMMEDIATE），worker 的心跳线程与主线程共用连接，用锁串行化
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # 协调者本进程内：上一轮等待超时的任务（查询条件 -> 任务 id），下一轮入队时收取迟到的结果
+        self._late: dict[str, int] = {}
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    def _tx(self, fn: Any) -> Any:
+        # 写事务一开始就拿写锁，多个进程同时领取时不会领到同一条
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(self.conn)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return out
+
+    # ---- 协调者 ----
+
+    def enqueue(self, search: SearchKey, cars: list[str], late_max_age: float = 0.0) -> int:
+        key = _search_json(search)
+        late = self._late.pop(key, None)
+
+        def covers(row_cars: str) -> bool:
+            return set(cars) <= set(json.loads(row_cars))
+
+        def run(conn: sqlite3.Connection) -> int:
+            now = time.time()
+            if late is not None:
+                # 上一轮超时的任务已在 late_max_age 内完成：直接用迟到的结果，不重新抓取
+                row = conn.execute("SELECT cars FROM jobs WHERE id = ? AND state = 'done' AND finished_ts >= ?", (late, now - late_max_age)).fetchone()
+                if row is not None and covers(row[0]):
+                    JOBS.inc(result="late")
+                    return late
+            row = conn.execute("SELECT id, cars FROM jobs WHERE search = ? AND state = 'queued' ORDER BY id LIMIT 1", (key,)).fetchone()
+            if row is not None:
+                merged = list(dict.fromkeys(json.loads(row[1]) + cars))
+                conn.execute("UPDATE jobs SET cars = ? WHERE id = ?", (json.dumps(merged, ensure_ascii=False), row[0]))
+                JOBS.inc(result="merged")
+                return int(row[0])
+            # 正在执行（租期未过）且覆盖所需车型：等同一条任务，不再排一条重复的
+            row = conn.execute(
+                "SELECT id, cars FROM jobs WHERE search = ? AND state = 'leased' AND lease_until >= ? ORDER BY id DESC LIMIT 1", (key, now)
+            ).fetchone()
+            if row is not None and covers(row[1]):
+                JOBS.inc(result="joined")
+                return int(row[0])
+            cur = conn.execute(
+                "INSERT INTO jobs (search, cars, enqueued_ts, available_ts) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(cars, ensure_ascii=False), now, now),
+            )
+            JOBS.inc(result="enqueued")
+            return int(cur.lastrowid)
+
+        return self._tx(run)
+
+    def defer(self, search: SearchKey, job_id: int) -> None:
+        # 本轮没等到的任务：下一轮同一查询入队时先看它是否已完成
+        self._late[_search_json(search)] = job_id
+
+    def results(self, ids: list[int]) -> dict[int, JobResult]:
+        # 只返回已结束（done / failed）的任务
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT id, state, result, error FROM jobs WHERE id IN ({marks}) AND state IN ('done', 'failed')", ids
+            ).fetchall()
+        return {int(i): JobResult(state, json.loads(result) if result else {}, error) for i, state, result, error in rows}
+
+    def wait(self, ids: list[int], timeout: float, interval: float = 1.0) -> dict[int, JobResult]:
+        deadline = time.monotonic() + timeout
+        while True:
+            done = self.results(ids)
+            if len(done) == len(set(ids)) or time.monotonic() >= deadline:
+                return done
+            time.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+
+    def stats(self, worker_seen_seconds: float = 300.0) -> dict[str, int]:
+        with self._lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+            workers = self.conn.execute("SELECT COUNT(*) FROM workers WHERE seen_ts >= ?", (time.time() - worker_seen_seconds,)).fetchone()[0]
+        out = {state: int(n) for state, n in rows}
+        for state in ("queued", "leased", "done", "failed"):
+            out.setdefault(state, 0)
+            JOB_QUEUE_DEPTH.set(out[state], state=state)
+        out["workers"] = int(workers)
+        return out
+
+    def purge(self, older_than_seconds: float = 86400.0) -> int:
+        def run(conn: sqlite3.Connection) -> int:
+            cutoff = time.time() - older_than_seconds
+            n = conn.execute("DELETE FROM jobs WHERE state IN ('done', 'failed') AND finished_ts < ?", (cutoff,)).rowcount
+            conn.execute("DELETE FROM workers WHERE seen_ts < ?", (cutoff,))
+            return n
+
+        return self._tx(run)
+
+    # ---- worker ----
+
+    def lease(self, worker: str, limit: int = 1) -> list[Job]:
+        # 可领取：排队中且已到重试时间，或租期已过期（原 worker 已死）；领取次数用尽的过期任务标记 failed
+        def run(conn: sqlite3.Connection) -> list[Job]:
+            now = time.time()
+            conn.execute(
+                "INSERT INTO workers (worker, started_ts, seen_ts) VALUES (?, ?, ?) ON CONFLICT(worker) DO UPDATE SET seen_ts = excluded.seen_ts",
+                (worker, now, now),
+            )
+            jobs: list[Job] = []
+            rows = conn.execute(
+                "SELECT id, search, cars, state, attempts FROM jobs "
+                "WHERE (state = 'queued' AND available_ts <= ?) OR (state = 'leased' AND lease_until < ?) "
+                "ORDER BY available_ts, id",
+                (now, now),
+            ).fetchall()
+            for job_id, search, cars, state, attempts in rows:
+                if len(jobs) >= limit:
+                    break
+                if state == "leased":
+                    JOBS.inc(result="redelivered")
+                    if attempts >= self.max_attempts:
+                        conn.execute(
+                            "UPDATE jobs SET state = 'failed', error = ?, worker = NULL, finished_ts = ? WHERE id = ?",
+                            (f"lease expired {attempts} times", now, job_id),
+                        )
+                        JOBS.inc(result="failed")
+                        continue
+                conn.execute(
+                    "UPDATE jobs SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                    (worker, now + self.lease_seconds, job_id),
+                )
+                jobs.append(Job(int(job_id), SearchKey(**json.loads(search)), json.loads(cars), int(attempts) + 1))
+            return jobs
+
+        return self._tx(run)
+
+    def heartbeat(self, worker: str, ids: list[int]) -> list[int]:
+        # 续租，返回仍由本 worker 持有的任务（其余已过期并被别的 worker 领走）
+        def run(conn: sqlite3.Connection) -> list[int]:
+            now = time.time()
+            conn.execute("UPDATE workers SET seen_ts = ? WHERE worker = ?", (now, worker))
+            held = []
+            for job_id in ids:
+                cur = conn.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                    (now + self.lease_seconds, job_id, worker),
+                )
+                if cur.rowcount:
+                    held.append(job_id)
+            return held
+
+        return self._tx(run)
+
+    def complete(self, worker: str, job_id: int, prices: dict[str, Optional[float]]) -> bool:
+        # 租约已丢（被重新投递）时丢弃结果，以新持有者为准
+        def run(conn: sqlite3.Connection) -> bool:
+            now = time.time()
+            cur = conn.execute(
+                "UPDATE jobs SET state = 'done', result = ?, error = NULL, finished_ts = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                (json.dumps(prices, ensure_ascii=False), now, job_id, worker),
+            )
+            if not cur.rowcount:
+                return False
+            conn.execute("UPDATE workers SET seen_ts = ?, jobs_done = jobs_done + 1 WHERE worker = ?", (now, worker))
+            return True
+
+        ok = self._tx(run)
+        JOBS.inc(result="done" if ok else "lost_lease")
+        return ok
+
+    def fail(self, worker: str, job_id: int, error: str) -> None:
+        def run(conn: sqlite3.Connection) -> Optional[str]:
+            now = time.time()
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND state = 'leased'", (job_id, worker)).fetchone()
+            if row is None:
+                return None
+            attempts = int(row[0])
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET state = 'failed', error = ?, worker = NULL, finished_ts = ? WHERE id = ?",
+                    (error[:500], now, job_id),
+                )
+                return "failed"
+            delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** (attempts - 1)))
+            conn.execute(
+                "UPDATE jobs SET state = 'queued', error = ?, worker = NULL, lease_until = NULL, available_ts = ? WHERE id = ?",
+                (error[:500], now + delay, job_id),
+            )
+            return "retried"
+
+        result = self._tx(run)
+        if result is not None:
+            JOBS.inc(result=result)
+
+    def release(self, worker: str, ids: list[int]) -> None:
+        # worker 正常退出：未完成的任务立即放回队列，不计入领取次数
+        def run(conn: sqlite3.Connection) -> None:
+            for job_id in ids:
+                conn.execute(
+                    "UPDATE jobs SET state = 'queued', worker = NULL, lease_until = NULL, attempts = MAX(0, attempts - 1), available_ts = ? "
+                    "WHERE id = ? AND worker = ? AND state = 'leased'",
+                    (time.time(), job_id, worker),
+                )
+
+        self._tx(run)
+
+
+_queues: dict[str, JobQueue] = {}
+
+
+def queue_from_settings(settings: Settings) -> JobQueue:
+    q = _queues.get(settings.job_queue_path)
+    if q is None:
+        q = _queues[settings.job_queue_path] = JobQueue(settings.job_queue_path, settings.job_lease_seconds, settings.job_max_attempts, settings.job_queue_wal)
+    return q
+
+
+def dispatch(
+    queue: JobQueue, groups: dict[SearchKey, list[str]], timeout: float, logger: Optional[logging.Logger] = None
+) -> dict[SearchKey, dict[str, Optional[float]] | Exception]:
+    # 协调者一次轮询：全部入队后等结果；失败或超时未完成的查询本轮记为出错（任务仍留在队列里，由 worker 继续，
+    # 下一轮复用这条任务或收取它迟到的结果）
+    logger = logger or logging.getLogger("ehi_monitor")
+    queue.purge()
+    ids = {search: queue.enqueue(search, cars, late_max_age=timeout) for search, cars in groups.items()}
+    done = queue.wait(list(ids.values()), timeout)
+    out: dict[SearchKey, dict[str, Optional[float]] | Exception] = {}
+    for search, job_id in ids.items():
+        r = done.get(job_id)
+        if r is None:
+            logger.warning(f"Job {job_id} [{search.label()}] not finished within {timeout:.0f}s")
+            out[search] = TimeoutError(f"job {job_id} not finished within {timeout:.0f}s")
+            queue.defer(search, job_id)
+        elif r.state == "failed":
+            logger.error(f"Job {job_id} [{search.label()}] failed: {r.error}")
+            out[search] = RuntimeError(r.error or "job failed")
+        else:
+            out[search] = r.prices
+    stats = queue.stats()
+    if not stats["workers"]:
+        logger.warning("No live workers on the job queue (start them with: python run.py worker)")
+    logger.info(f"Job queue: {stats['queued']} queued, {stats['leased']} leased, {stats['workers']} workers")
+    return out
+
+
+class Worker:
+    def __init__(self, settings: Settings, queue: JobQueue, logger: Optional[logging.Logger] = None, worker_id: str = "") -> None:
+        self.settings = settings
+        self.queue = queue
+        self.logger = logger or logging.getLogger("ehi_monitor")
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        # async 引擎一次领取多条，在一个浏览器里并发执行
+        self.batch = settings.async_concurrency if settings.fetch_engine == "async" else 1
+        self.pool = BrowserPool.from_settings(settings)
+        # 单条任务最长执行时间：超过后不再续租，卡死的抓取在租期到后重新投递给别的 worker
+        self.job_deadline = max(self.queue.lease_seconds, settings.search_timeout_seconds * max(1, settings.phase_attempts))
+        self._held: dict[int, float] = {}
+        self._overdue: set[int] = set()
+        self._held_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _renew(self) -> None:
+        now = time.monotonic()
+        with self._held_lock:
+            held = [i for i, deadline in self._held.items() if deadline > now]
+            overdue = [i for i, deadline in self._held.items() if deadline <= now and i not in self._overdue]
+            self._overdue.update(overdue)
+        if overdue:
+            self.logger.warning(f"Jobs {sorted(overdue)} still running after {self.job_deadline:.0f}s; no longer renewing their lease")
+        if not held:
+            return
+        try:
+            kept = self.queue.heartbeat(self.id, held)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Heartbeat failed: {e}")
+            return
+        lost = set(held) - set(kept)
+        if lost:
+            self.logger.warning(f"Lost lease on jobs {sorted(lost)}")
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            self._renew()
+
+    def _fetch(self, jobs: list[Job]) -> dict[int, dict[str, Optional[float]] | Exception]:
+        out: dict[int, dict[str, Optional[float]] | Exception] = {}
+        replayer = replayer_from_settings(self.settings)
+        pending = []
+        for job in jobs:
+            prices = replayer.prices(settings_for_search(self.settings, job.search), job.cars) if replayer is not None else None
+            if prices is None:
+                pending.append(job)
+            else:
+                out[job.id] = prices
+        if not pending:
+            return out
+        if self.settings.fetch_engine == "async":
+            from .async_fetcher import get_prices_sync
+
+            # 同一批里可能有同一查询的两条任务（过期重投的旧任务 + 新排的任务）：车型合并后查一次，再按任务拆开
+            cars: dict[SearchKey, list[str]] = {}
+            for j in pending:
+                cars[j.search] = list(dict.fromkeys(cars.get(j.search, []) + j.cars))
+            try:
+                by_search = get_prices_sync(cars, self.settings)
+            except Exception as e:
+                return {**out, **{j.id: e for j in pending}}
+            for j in pending:
+                r = by_search.get(j.search, {})
+                out[j.id] = r if isinstance(r, Exception) else {c: r.get(c) for c in j.cars}
+            return out
+        from .fetcher import get_prices_for_search
+
+        for j in pending:
+            try:
+                out[j.id] = get_prices_for_search(settings_for_search(self.settings, j.search), j.cars, self.pool)
+            except Exception as e:
+                out[j.id] = e
+        return out
+
+    def run_once(self) -> int:
+        # 领取并执行一批任务，返回处理的条数
+        jobs = self.queue.lease(self.id, self.batch)
+        if not jobs:
+            return 0
+        deadline = time.monotonic() + self.job_deadline
+        with self._held_lock:
+            self._held = {j.id: deadline for j in jobs}
+            self._overdue = set()
+        try:
+            for j in jobs:
+                self.logger.info(f"Job {j.id} [{j.search.label()}] attempt {j.attempts}: {', '.join(j.cars)}")
+            results = self._fetch(jobs)
+            for j in jobs:
+                r = results.get(j.id, {})
+                if isinstance(r, Exception):
+                    self.logger.error(f"Job {j.id} [{j.search.label()}] failed: {r}")
+                    self.queue.fail(self.id, j.id, str(r) or type(r).__name__)
+                elif not self.queue.complete(self.id, j.id, r):
+                    self.logger.warning(f"Job {j.id} was re-delivered to another worker; result dropped")
+                else:
+                    self.logger.info(f"Job {j.id} done: {r}")
+        finally:
+            with self._held_lock:
+                # 超时的任务不放回队列（放回会退还领取次数，一直卡死的查询就永远不会标记 failed），等租期过期重投
+                held = [i for i in self._held if i not in self._overdue]
+                self._held, self._overdue = {}, set()
+            # 中途异常/中断：还没写回的任务放回队列
+            unfinished = [i for i in held if i not in self.queue.results(held)]
+            if unfinished:
+                try:
+                    self.queue.release(self.id, unfinished)
+                except sqlite3.Error:
+                    pass
+        return len(jobs)
+
+    def run(self) -> None:
+        beat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        beat.start()
+        self.logger.info(f"Worker {self.id} on {self.queue.path} (lease {self.queue.lease_seconds:g}s, batch {self.batch})")
+        try:
+            while not self._stop.is_set():
+                if not self.run_once():
+                    self._stop.wait(IDLE_POLL_SECONDS)
+        finally:
+            self._stop.set()
+            self.pool.close()
+
+    def stop(self) -> None:
+        self._stop.set()
@@ -0,0 +1,16 @@
+def car_keywords(car_name: str) -> list[str]:
+    # 车型关键词：完整名称之外，“探影”系列的卡片名常写作“大众探影”等变体
+    target = (car_name or "").strip()
+    if "探影" in target:
+        return ["大众", "探影"]
+    return [target.replace(" ", "")] if target else []
+
+
+def name_matches(name: str, car_name: str) -> bool:
+    target = (car_name or "").strip()
+    if not target or not name:
+        return False
+    if target in name or target.replace(" ", "") in name.replace(" ", ""):
+        return True
+    keywords = car_keywords(target)
+    return bool(keywords) and all(kw in name for kw in keywords)
@@ -0,0 +1,247 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator, Optional
+
+# 进程内指标（Prometheus 文本格式），不依赖 prometheus_client：
+#   - 计数器 Counter 与直方图 Histogram，按标签分组，线程安全
+#   - MetricsServer：本地 HTTP 端点 /metrics
+#   - MetricsFileWriter：定期原子写出同样的文本（可供 node_exporter textfile collector 采集）
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._values: dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_labels(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(key)} {_fmt_num(v)}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_labels(labels)] = float(value)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # 每个标签组：[各桶计数..., sum, count]
+        self._values: dict[LabelKey, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels: str) -> None:
+        key = _labels(labels)
+        with self._lock:
+            row = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, b in enumerate(self.buckets):
+                if seconds <= b:
+                    row[i] += 1
+            row[-2] += seconds
+            row[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def count(self, **labels: str) -> float:
+        with self._lock:
+            row = self._values.get(_labels(labels))
+            return row[-1] if row else 0.0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                for b, c in zip(self.buckets, row):
+                    lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', _fmt_num(b)))} {_fmt_num(c)}")
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {_fmt_num(row[-1])}")
+                lines.append(f"{self.name}_sum{_fmt_labels(key)} {row[-2]:.6f}")
+                lines.append(f"{self.name}_count{_fmt_labels(key)} {_fmt_num(row[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls: type, name: str, help: str, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, help, **kw)
+            return m
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: list[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# 抓取
+PHASE_SECONDS = REGISTRY.histogram("ehi_phase_seconds", "Duration of fetch phases (navigate, fill_city, set_date, search, results, extract, scroll, replay)")
+SEARCHES = REGISTRY.counter("ehi_searches_total", "Browser searches by result")
+SEARCH_RETRIES = REGISTRY.counter("ehi_search_retries_total", "Whole-session search retries (new page) after an error")
+PHASE_RETRIES = REGISTRY.counter("ehi_phase_retries_total", "Phase retries on the same page by phase (navigate, city, date, search, extract)")
+PHASE_RECOVERED = REGISTRY.counter("ehi_phase_recovered_total", "Phases that succeeded after a retry on the same page")
+REPLAYS = REGISTRY.counter("ehi_replays_total", "Hybrid mode HTTP replays by result (ok, miss, expired, error)")
+EXTRACT_STRATEGY = REGISTRY.counter("ehi_extract_strategy_total", "Which extraction strategy produced each car price (api, cartype, near, booking, miss)")
+HARVEST_SCROLLS = REGISTRY.counter("ehi_harvest_scrolls_total", "Result-list scroll rounds during card harvesting")
+SNAPSHOT_ROWS = REGISTRY.counter("ehi_snapshot_rows_total", "Inventory rows written to columnar snapshots")
+HARVEST_STOPS = REGISTRY.counter("ehi_harvest_stops_total", "Why card harvesting stopped (found, end, limit, empty, error)")
+# 本地查询服务
+SERVE_REQUESTS = REGISTRY.counter("ehi_serve_requests_total", "Query service requests by result (hit, miss, coalesced, error, timeout, bad_request)")
+SERVE_FLIGHTS = REGISTRY.counter("ehi_serve_flights_total", "Searches started by the query service (after coalescing)")
+# 分布式任务队列
+JOBS = REGISTRY.counter("ehi_jobs_total", "Job queue events (enqueued, merged, joined, late, done, retried, failed, redelivered, lost_lease)")
+JOB_QUEUE_DEPTH = REGISTRY.gauge("ehi_job_queue_jobs", "Jobs in the shared queue by state")
+# 内存与浏览器进程
+RSS_BYTES = REGISTRY.gauge("ehi_rss_bytes", "Resident memory by process (monitor = Python, browser = driver + Chromium tree)")
+CHROMIUM_PROCESSES = REGISTRY.gauge("ehi_chromium_processes", "Chromium processes on the host visible to the monitor")
+BROWSER_RESTARTS = REGISTRY.counter("ehi_browser_restarts_total", "Browser pool restarts by reason (uses, age, rss, unhealthy)")
+ORPHANS_KILLED = REGISTRY.counter("ehi_orphan_chromium_killed_total", "Orphaned Chromium process trees killed")
+# 轮询
+POLLS = REGISTRY.counter("ehi_polls_total", "Monitor polls by result")
+POLL_SECONDS = REGISTRY.histogram("ehi_poll_seconds", "Duration of a monitor poll")
+BREAKER_SKIPS = REGISTRY.counter("ehi_breaker_skips_total", "Watch checks skipped by an open circuit breaker")
+BREAKER_OPEN = REGISTRY.gauge("ehi_breaker_open", "Watches currently skipped by an open circuit breaker")
+# 邮件
+EMAIL_SECONDS = REGISTRY.histogram("ehi_email_seconds", "SMTP latency by stage (connect, send)")
+EMAILS = REGISTRY.counter("ehi_emails_total", "Emails by result")
+
+
+class MetricsServer:
+    def __init__(self, port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> None:
+        reg = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = reg.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        self.thread.start()
+        return self
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class MetricsFileWriter:
+    def __init__(self, path: str | Path, interval_seconds: float = 60.0, registry: Registry = REGISTRY) -> None:
+        self.path = Path(path)
+        self.interval_seconds = max(1.0, interval_seconds)
+        self.registry = registry
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+
+    def write(self) -> None:
+        # 先写临时文件再 rename，读取方不会看到半截内容
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(self.registry.render(), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.write()
+            except OSError:
+                pass
+
+    def start(self) -> "MetricsFileWriter":
+        self.thread.start()
+        return self
+
+    def close(self) -> None:
+        self._stop.set()
+        self.thread.join(timeout=5)
+        try:
+            self.write()
+        except OSError:
+            pass
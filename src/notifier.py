@@ -4,8 +4,16 @@ from email.message import EmailMessage
 from typing import Optional
 
 from .config import Settings, EHI_BASE_URL
+from .metrics import EMAIL_SECONDS, EMAILS
 
-def _send_email_with_fallback(settings: Settings, msg: EmailMessage) -> None:
+
+def _connect_with_fallback(settings: Settings) -> smtplib.SMTP:
+    # 建立已登录的 SMTP 连接；调用方负责 quit/close
+    with EMAIL_SECONDS.time(stage="connect"):
+        return _connect(settings)
+
+
+def _connect(settings: Settings) -> smtplib.SMTP:
     last_err: Exception | None = None
     # 尝试顺序：按配置端口 -> 465(SSL) -> 587(STARTTLS)
     attempts: list[tuple[str,int,str]] = []
@@ -18,36 +26,116 @@ def _send_email_with_fallback(settings: Settings, msg: EmailMessage) -> None:
 
     context = ssl.create_default_context()
     for mode, port, host in attempts:
+        server: smtplib.SMTP | None = None
         try:
             if mode == "SSL":
-                with smtplib.SMTP_SSL(host, port, context=context, timeout=20) as server:
-                    server.ehlo()
-                    if settings.debug:
-                        server.set_debuglevel(1)
-                    server.login(settings.smtp_user, settings.smtp_pass)
-                    server.send_message(msg)
-                    return
+                server = smtplib.SMTP_SSL(host, port, context=context, timeout=20)
+                server.ehlo()
+                if settings.debug:
+                    server.set_debuglevel(1)
             else:
-                with smtplib.SMTP(host, port, timeout=20) as server:
-                    server.ehlo()
-                    if settings.debug:
-                        server.set_debuglevel(1)
-                    server.starttls(context=context)
-                    server.ehlo()
-                    server.login(settings.smtp_user, settings.smtp_pass)
-                    server.send_message(msg)
-                    return
+                server = smtplib.SMTP(host, port, timeout=20)
+                server.ehlo()
+                if settings.debug:
+                    server.set_debuglevel(1)
+                server.starttls(context=context)
+                server.ehlo()
+            server.login(settings.smtp_user, settings.smtp_pass)
+            return server
         except Exception as e:
             last_err = e
+            if server is not None:
+                try:
+                    server.close()
+                except Exception:
+                    pass
             continue
-    if last_err:
-        raise last_err
+    raise last_err or RuntimeError("No SMTP connection attempt made")
 
 
-def send_price_change_email(settings: Settings, old_price: Optional[float], new_price: float) -> None:
-    subject = "一嗨租车价格变动通知"
+def _send_message(server: smtplib.SMTP, msg: EmailMessage) -> None:
+    try:
+        with EMAIL_SECONDS.time(stage="send"):
+            server.send_message(msg)
+    except Exception:
+        EMAILS.inc(result="error")
+        raise
+    EMAILS.inc(result="ok")
+
+
+def _send_email_with_fallback(settings: Settings, msg: EmailMessage) -> None:
+    try:
+        server = _connect_with_fallback(settings)
+    except Exception:
+        EMAILS.inc(result="error")
+        raise
+    try:
+        _send_message(server, msg)
+    finally:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+
+class SmtpSession:
+    # 长连接：一次握手+登录，多封邮件复用；发送前 NOOP 探活，断开则重连一次
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self._server: smtplib.SMTP | None = None
+
+    def _alive(self) -> bool:
+        if self._server is None:
+            return False
+        try:
+            return self._server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def send(self, msg: EmailMessage) -> None:
+        try:
+            if not self._alive():
+                self.close()
+                self._server = _connect_with_fallback(self.settings)
+            try:
+                with EMAIL_SECONDS.time(stage="send"):
+                    self._server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self.close()
+                self._server = _connect_with_fallback(self.settings)
+                with EMAIL_SECONDS.time(stage="send"):
+                    self._server.send_message(msg)
+        except Exception:
+            EMAILS.inc(result="error")
+            raise
+        EMAILS.inc(result="ok")
+
+    def close(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+        self._server = None
+
+
+def _message(settings: Settings, subject: str, body: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = settings.smtp_from
+    msg["To"] = settings.email_to
+    msg.set_content(body)
+    return msg
+
+
+def _price_change_lines(settings: Settings, old_price: Optional[float], new_price: float) -> list[str]:
     lines = []
     lines.append(f"车型：{settings.car_name}")
+    lines.append(f"行程：{settings.pickup_city} {settings.pickup_date} → {settings.return_city} {settings.return_date}")
     lines.append(f"链接：{EHI_BASE_URL}")
     if old_price is None:
         lines.append(f"当前价格：{new_price}")
@@ -56,32 +144,37 @@ def send_price_change_email(settings: Settings, old_price: Optional[float], new_
         sign = "+" if delta >= 0 else "-"
         lines.append(f"原价：{old_price}")
         lines.append(f"现价：{new_price}（{sign}{abs(delta)}）")
+    return lines
 
-    body = "\n".join(lines)
 
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"] = settings.smtp_from
-    msg["To"] = settings.email_to
-    msg.set_content(body)
+def build_price_change_email(settings: Settings, old_price: Optional[float], new_price: float) -> EmailMessage:
+    subject = "一嗨租车价格变动通知"
+    body = "\n".join(_price_change_lines(settings, old_price, new_price))
+    return _message(settings, subject, body)
 
-    _send_email_with_fallback(settings, msg)
+
+def build_digest_email(settings: Settings, changes: list[tuple[Settings, Optional[float], float]]) -> EmailMessage:
+    # 多个价格变动合并为一封摘要；changes 中的 Settings 为各 watch 的覆盖配置
+    if len(changes) == 1:
+        ws, old_price, new_price = changes[0]
+        return build_price_change_email(ws, old_price, new_price)
+    subject = f"一嗨租车价格变动通知（{len(changes)} 项）"
+    blocks = ["\n".join(_price_change_lines(ws, old, new)) for ws, old, new in changes]
+    return _message(settings, subject, "\n\n".join(blocks))
+
+
+def send_price_change_email(settings: Settings, old_price: Optional[float], new_price: float) -> None:
+    _send_email_with_fallback(settings, build_price_change_email(settings, old_price, new_price))
 
 
 def send_current_price_email(settings: Settings, price: float) -> None:
     subject = "一嗨租车价格测试通知"
     lines = [
         f"车型：{settings.car_name}",
+        f"行程：{settings.pickup_city} {settings.pickup_date} → {settings.return_city} {settings.return_date}",
         f"模式：firstStep 自动填表",
         f"链接：{EHI_BASE_URL}",
         f"当前价格：{price}",
     ]
     body = "\n".join(lines)
-
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"] = settings.smtp_from
-    msg["To"] = settings.email_to
-    msg.set_content(body)
-
-    _send_email_with_fallback(settings, msg)
+    _send_email_with_fallback(settings, _message(settings, subject, body))
@@ -0,0 +1,221 @@
+import atexit
+import gzip
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from .config import Settings
+
+# 观测日志（logs/price_observations.jsonl）改为游程编码：
+#   change    —— 价格或查询条件（城市/日期/车型/提醒价）变化时写一条完整记录（字段与旧格式相同）
+#   heartbeat —— 价格不变时不再逐次写入，每 OBS_HEARTBEAT_MINUTES 写一条 {ts, watch_id, price, count}，
+#                count 为自上一条记录以来未变化的观测次数；价格变化或退出前补写当前游程的最后一条
+# 写入经 QueueHandler 交给后台线程，轮询线程不等磁盘。文件超过 OBS_SEGMENT_MB 时整段改名为
+# price_observations.jsonl.<时间戳>（唯一文件名，不做 .1/.2 轮换），由后台压缩线程按同样规则重新编码
+# （旧格式的逐次完整记录也会被合并）后写入 logs/archive/*.jsonl.gz 并删除原段。
+
+OBS_LOGGER = "ehi_monitor.observations"
+# 判断“查询条件是否变化”时忽略的字段
+VOLATILE_KEYS = ("ts", "price", "last_price", "event", "count")
+# 段文件名的序号：同一秒内多次轮换也不会重名（重名时 RotatingFileHandler 会删掉已有文件）
+_segment_seq = itertools.count()
+
+
+def _fingerprint(record: dict[str, Any]) -> str:
+    return json.dumps({k: v for k, v in record.items() if k not in VOLATILE_KEYS}, ensure_ascii=False, sort_keys=True)
+
+
+class RunLengthEncoder:
+    # 按 watch 的游程状态机；实时写入与离线压缩共用
+    def __init__(self, heartbeat_seconds: float = 3600.0) -> None:
+        self.heartbeat_seconds = heartbeat_seconds
+        # watch_id -> {fp, price, written_ts, seen_ts, count}
+        self._runs: dict[str, dict[str, Any]] = {}
+
+    def _heartbeat(self, watch_id: str, run: dict[str, Any]) -> dict[str, Any]:
+        row = {"ts": run["seen_ts"], "watch_id": watch_id, "event": "heartbeat", "price": run["price"], "count": run["count"]}
+        run["written_ts"] = run["seen_ts"]
+        run["count"] = 0
+        return row
+
+    def observe(self, record: dict[str, Any], count: int = 1) -> list[dict[str, Any]]:
+        # record 为完整观测（旧格式字段）；count > 1 表示压缩时读到的心跳行
+        watch_id = str(record.get("watch_id") or "")
+        ts = record.get("ts") or int(time.time())
+        fp = _fingerprint(record)
+        run = self._runs.get(watch_id)
+        out: list[dict[str, Any]] = []
+        if run is not None and run["fp"] == fp and run["price"] == record.get("price"):
+            run["count"] += count
+            run["seen_ts"] = ts
+            if ts - run["written_ts"] >= self.heartbeat_seconds:
+                out.append(self._heartbeat(watch_id, run))
+            return out
+        if run is not None and run["count"] > 0:
+            # 补写上一段游程的最后一次观测，读者据此知道旧价格持续到什么时候
+            out.append(self._heartbeat(watch_id, run))
+        row = {k: v for k, v in record.items() if k not in ("event", "count")}
+        row["event"] = "change"
+        out.append(row)
+        self._runs[watch_id] = {"fp": fp, "record": row, "price": record.get("price"), "written_ts": ts, "seen_ts": ts, "count": 0}
+        return out
+
+    def observe_row(self, row: dict[str, Any]) -> list[dict[str, Any]]:
+        # 读取已写出的行（旧格式完整记录 / change / heartbeat）
+        if row.get("event") == "heartbeat":
+            run = self._runs.get(str(row.get("watch_id") or ""))
+            if run is None:
+                # 段首的心跳缺少完整字段，原样保留
+                return [row]
+            full = dict(run["record"], ts=row.get("ts"), price=row.get("price"))
+            return self.observe(full, int(row.get("count") or 1))
+        return self.observe(row)
+
+    def flush(self) -> list[dict[str, Any]]:
+        return [self._heartbeat(w, run) for w, run in self._runs.items() if run["count"] > 0]
+
+
+def compact_lines(lines: Iterable[str], heartbeat_seconds: float) -> Iterator[str]:
+    # 无法解析的行原样保留
+    enc = RunLengthEncoder(heartbeat_seconds)
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line
+            continue
+        if not isinstance(row, dict):
+            yield line
+            continue
+        for out in enc.observe_row(row):
+            yield json.dumps(out, ensure_ascii=False)
+    for out in enc.flush():
+        yield json.dumps(out, ensure_ascii=False)
+
+
+def _segment_namer(default_name: str) -> str:
+    # RotatingFileHandler 轮换时 .1 改为唯一的时间戳后缀，其余编号不存在（backupCount=1）
+    if default_name.endswith(".1"):
+        return f"{default_name[:-2]}.{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_segment_seq):04d}"
+    return default_name
+
+
+def start_queue_listener(logger: logging.Logger, handlers: list[logging.Handler]) -> logging.handlers.QueueListener:
+    # 文件写入放到后台线程；进程退出时停止监听器（会先写完队列中剩余的记录）
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(q))
+    listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener: logging.handlers.QueueListener) -> None:
+    if getattr(listener, "_thread", None) is not None:
+        listener.stop()
+
+
+class ObservationLog:
+    def __init__(self, path: str | os.PathLike[str] = "logs/price_observations.jsonl", heartbeat_seconds: float = 3600.0, segment_mb: float = 5.0) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.encoder = RunLengthEncoder(heartbeat_seconds)
+        self._lock = threading.Lock()
+        handler = logging.handlers.RotatingFileHandler(self.path, maxBytes=int(segment_mb * 1024 * 1024), backupCount=1, encoding="utf-8", delay=True)
+        handler.namer = _segment_namer
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.logger = logging.getLogger(f"{OBS_LOGGER}.{self.path}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.listener = start_queue_listener(self.logger, [handler])
+        atexit.register(self.close)
+
+    def record(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            rows = self.encoder.observe(record)
+        self._write(rows)
+
+    def _write(self, rows: list[dict[str, Any]]) -> None:
+        for row in rows:
+            self.logger.info(json.dumps(row, ensure_ascii=False))
+
+    def close(self) -> None:
+        # 退出前补写各 watch 当前游程（在监听器停止之前：atexit 后注册先执行）
+        with self._lock:
+            rows = self.encoder.flush()
+        self._write(rows)
+
+
+class Compactor:
+    def __init__(self, path: str | os.PathLike[str], heartbeat_seconds: float, interval_seconds: float, logger: Optional[logging.Logger] = None) -> None:
+        self.path = Path(path)
+        self.archive_dir = self.path.parent / "archive"
+        self.heartbeat_seconds = heartbeat_seconds
+        self.interval_seconds = max(60.0, interval_seconds)
+        self.logger = logger or logging.getLogger("ehi_monitor")
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="obs-compactor", daemon=True)
+
+    def segments(self) -> list[Path]:
+        return sorted(p for p in self.path.parent.glob(f"{self.path.name}.*") if not p.name.endswith((".gz", ".tmp")))
+
+    def compact(self, segment: Path) -> tuple[int, int]:
+        # 返回 (原字节数, 压缩后字节数)；先写临时文件再改名，中途退出不会丢数据
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        suffix = segment.name[len(self.path.name) + 1:]
+        target = self.archive_dir / f"{self.path.stem}-{suffix}.jsonl.gz"
+        tmp = target.with_name(target.name + ".tmp")
+        with segment.open("r", encoding="utf-8", errors="replace") as src, gzip.open(tmp, "wt", encoding="utf-8") as dst:
+            for line in compact_lines(src, self.heartbeat_seconds):
+                dst.write(line + "\n")
+        os.replace(tmp, target)
+        before = segment.stat().st_size
+        segment.unlink()
+        return before, target.stat().st_size
+
+    def run_once(self) -> None:
+        for seg in self.segments():
+            try:
+                before, after = self.compact(seg)
+                self.logger.info(f"Compacted {seg.name}: {before / 1024:.0f} KB -> {after / 1024:.0f} KB")
+            except Exception as e:
+                self.logger.error(f"Could not compact {seg.name}: {e}")
+
+    def _run(self) -> None:
+        self.run_once()
+        while not self._stop.wait(self.interval_seconds):
+            self.run_once()
+
+    def start(self) -> "Compactor":
+        self.thread.start()
+        return self
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+_logs: dict[str, ObservationLog] = {}
+
+
+def observation_log_from_settings(settings: Settings) -> ObservationLog:
+    path = settings.obs_log_path
+    log = _logs.get(path)
+    if log is None:
+        log = _logs[path] = ObservationLog(path, settings.obs_heartbeat_minutes * 60, settings.obs_segment_mb)
+    return log
+
+
+def compactor_from_settings(settings: Settings, logger: Optional[logging.Logger] = None) -> Optional[Compactor]:
+    if settings.obs_compact_hours <= 0:
+        return None
+    return Compactor(settings.obs_log_path, settings.obs_heartbeat_minutes * 60, settings.obs_compact_hours * 3600, logger)
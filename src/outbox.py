@@ -0,0 +1,231 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Optional
+
+from .config import Settings
+from .notifier import SmtpSession, build_digest_email
+
+# 通知发件箱：轮询线程只负责入队（一次 SQLite 写入），后台线程负责发信。
+#   - 入队后等待一个批处理窗口，把窗口内的所有价格变动合并成一封摘要
+#   - 复用同一个已登录的 SMTP 连接（见 notifier.SmtpSession）
+#   - 发送失败按指数退避重试，不阻塞轮询；进程重启后未发送的事件仍在库里
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_ts REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_ts REAL NOT NULL,
+    last_error TEXT,
+    sent_ts REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(sent_ts, next_attempt_ts);
+"""
+
+
+@dataclass
+class PriceChange:
+    watch_id: str
+    car_name: str
+    pickup_city: str
+    return_city: str
+    pickup_date: str
+    return_date: str
+    old_price: Optional[float]
+    new_price: float
+    ts: float = 0.0
+
+    @staticmethod
+    def of(settings: Settings, watch_id: str, old_price: Optional[float], new_price: float) -> "PriceChange":
+        return PriceChange(
+            watch_id=watch_id,
+            car_name=settings.car_name,
+            pickup_city=settings.pickup_city,
+            return_city=settings.return_city,
+            pickup_date=settings.pickup_date,
+            return_date=settings.return_date,
+            old_price=old_price,
+            new_price=new_price,
+            ts=time.time(),
+        )
+
+    def settings(self, base: Settings) -> Settings:
+        return replace(
+            base,
+            car_name=self.car_name,
+            pickup_city=self.pickup_city,
+            return_city=self.return_city,
+            pickup_date=self.pickup_date,
+            return_date=self.return_date,
+        )
+
+
+class Outbox:
+    def __init__(
+        self,
+        settings: Settings,
+        path: str | Path = "data/outbox.db",
+        batch_seconds: float = 30.0,
+        max_backoff_seconds: float = 1800.0,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.settings = settings
+        self.batch_seconds = batch_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.logger = logger or logging.getLogger("ehi_monitor")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 入队（轮询线程）与发送（后台线程）共用一个连接，用锁串行化
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._smtp = SmtpSession(settings)
+        # close() 等不到后台线程结束时（如 SMTP 连接/发送超时），连接与 SMTP 会话由后台线程退出时自己关闭
+        self._owner_lock = threading.Lock()
+        self._running = False
+        self._detached = False
+
+    def __enter__(self) -> "Outbox":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def enqueue(self, change: PriceChange) -> None:
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO outbox (payload, created_ts, next_attempt_ts) VALUES (?, ?, ?)",
+                (json.dumps(asdict(change), ensure_ascii=False), now, now + self.batch_seconds),
+            )
+        self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return int(self.conn.execute("SELECT COUNT(*) FROM outbox WHERE sent_ts IS NULL").fetchone()[0])
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._running = True
+        self._thread = threading.Thread(target=self._run_owned, name="outbox", daemon=True)
+        self._thread.start()
+
+    def close(self, flush_timeout: float = 30.0) -> None:
+        # 退出前尽量把已到期（及批处理窗口内）的事件发出去；失败的留在库里下次启动再发
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout=flush_timeout)
+            self._thread = None
+            with self._owner_lock:
+                if self._running:
+                    # 后台线程仍在用连接：不在这里关闭，交给它退出时处理
+                    self._detached = True
+                    self.logger.warning(f"Outbox still sending after {flush_timeout:.0f}s; it will close when done")
+                    return
+        self._release()
+
+    def _release(self) -> None:
+        self._smtp.close()
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    def _run_owned(self) -> None:
+        try:
+            self._run()
+        finally:
+            with self._owner_lock:
+                self._running = False
+                detached = self._detached
+            if detached:
+                self._release()
+
+    def _next_due(self) -> Optional[float]:
+        with self._lock:
+            row = self.conn.execute("SELECT MIN(next_attempt_ts) FROM outbox WHERE sent_ts IS NULL").fetchone()
+        return None if row[0] is None else float(row[0])
+
+    def _run(self) -> None:
+        while True:
+            due = self._next_due()
+            if self._stop.is_set():
+                # 退出：不再等批处理窗口，但不绕过失败退避
+                if due is not None:
+                    self.flush()
+                return
+            timeout = None if due is None else max(0.0, due - time.time())
+            if timeout is None or timeout > 0:
+                self._wake.wait(timeout)
+                self._wake.clear()
+                continue
+            self.flush()
+
+    def flush(self) -> int:
+        # 窗口以最早到期的事件为准：一旦有事件到期，连同所有尚未尝试过的新事件合并成一封邮件
+        now = time.time()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, payload, attempts FROM outbox "
+                "WHERE sent_ts IS NULL AND (next_attempt_ts <= ? OR attempts = 0) ORDER BY id",
+                (now,),
+            ).fetchall()
+        if not rows:
+            return 0
+        changes = []
+        for _id, payload, _attempts in rows:
+            try:
+                changes.append(PriceChange(**json.loads(payload)))
+            except (TypeError, ValueError):
+                changes.append(None)
+        ids = [r[0] for r in rows]
+        valid = [c for c in changes if c is not None]
+        try:
+            if valid:
+                msg = build_digest_email(self.settings, [(c.settings(self.settings), c.old_price, c.new_price) for c in valid])
+                self._smtp.send(msg)
+        except Exception as e:
+            self._smtp.close()
+            attempts = max(r[2] for r in rows) + 1
+            delay = min(self.max_backoff_seconds, self.batch_seconds * (2 ** attempts))
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    "UPDATE outbox SET attempts = ?, next_attempt_ts = ?, last_error = ? WHERE id = ?",
+                    [(attempts, time.time() + delay, str(e)[:500], i) for i in ids],
+                )
+            self.logger.error(f"Failed to send notification ({len(valid)} changes), retry in {delay:.0f}s: {e}")
+            return 0
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE outbox SET sent_ts = ? WHERE id = ?", [(time.time(), i) for i in ids])
+            # 只保留最近 7 天已发送的记录
+            self.conn.execute("DELETE FROM outbox WHERE sent_ts IS NOT NULL AND sent_ts < ?", (time.time() - 7 * 86400,))
+        self.logger.info(f"Notification email sent ({len(valid)} changes).")
+        return len(valid)
+
+
+def outbox_from_settings(settings: Settings, logger: Optional[logging.Logger] = None) -> Optional[Outbox]:
+    if not settings.outbox_enabled:
+        return None
+    return Outbox(
+        settings,
+        path=settings.outbox_path,
+        batch_seconds=settings.outbox_batch_seconds,
+        max_backoff_seconds=settings.outbox_max_backoff_seconds,
+        logger=logger,
+    )
@@ -0,0 +1,134 @@
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from .price_parser import find_prices_batch, parse_price_from_text, parse_prices
+
+# 价格解析微基准：不需要浏览器，跑标注过的卡片文本语料。
+#   python -m src.parse_bench [--repeat 200] [--batch-size 60] [--out bench/results/parse.json]
+# 输出：逐条解析（旧实现 / 预编译）、批量解析、批量候选提取的吞吐（条/秒、MB/秒），
+# 以及语料上的准确率：误报（无价格却解析出价格，或价格错误）与漏报。
+# --max-false-positive-rate 超出时退出码 1。
+#
+# 语料（默认 bench/fixtures/price_texts.jsonl），每行一个 JSON：
+#   {"source": "cartype|near|booking", "text": "卡片文本", "price": 698 或 null, "note": "说明"}
+# text 与 cards.CARDS_JS 返回的 priceText / text 一致；price 为人工确认的日均价。
+
+CORPUS = Path(__file__).resolve().parent.parent / "bench" / "fixtures" / "price_texts.jsonl"
+
+
+def _legacy_parse(text: str) -> Optional[float]:
+    # 旧实现（每次调用内联两个 re.search），仅作吞吐基线
+    m = re.search(r"(?:¥|RMB|￥)\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{1,2})?|[0-9]+(?:\.[0-9]{1,2})?)", text)
+    if not m:
+        m = re.search(r"([0-9]{2,5}(?:\.[0-9]{1,2})?)\s*(?:/\s*日均|日均|/\s*天|天|元)", text)
+    if not m:
+        return None
+    try:
+        val = float(m.group(1).replace(",", ""))
+        return None if val < 20 else val
+    except ValueError:
+        return None
+
+
+def load_corpus(path: Path) -> list[dict[str, Any]]:
+    rows = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rows.append(json.loads(line))
+    return rows
+
+
+def accuracy(rows: list[dict[str, Any]]) -> dict[str, Any]:
+    parsed = parse_prices([r["text"] for r in rows])
+    false_pos, misses = [], []
+    for r, p in zip(rows, parsed):
+        expected = r.get("price")
+        if p is None and expected is not None:
+            misses.append({"text": r["text"], "expected": expected})
+        elif p is not None and (expected is None or abs(p - float(expected)) > 0.005):
+            false_pos.append({"text": r["text"], "expected": expected, "parsed": p, "note": r.get("note", "")})
+    return {
+        "texts": len(rows),
+        "correct": len(rows) - len(false_pos) - len(misses),
+        "false_positive_rate": round(len(false_pos) / max(1, len(rows)), 4),
+        "miss_rate": round(len(misses) / max(1, len(rows)), 4),
+        "false_positives": false_pos,
+        "misses": misses,
+    }
+
+
+def _time(fn: Callable[[], Any], rounds: int) -> float:
+    samples = []
+    for _ in range(max(1, rounds)):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def throughput(texts: list[str], batch_size: int, rounds: int) -> dict[str, Any]:
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), max(1, batch_size))]
+    size_mb = sum(len(t.encode("utf-8")) for t in texts) / 1024 / 1024
+    cases: dict[str, Callable[[], Any]] = {
+        "legacy_per_text": lambda: [_legacy_parse(t) for t in texts],
+        "per_text": lambda: [parse_price_from_text(t) for t in texts],
+        "batch": lambda: [parse_prices(b) for b in batches],
+        "batch_candidates": lambda: [find_prices_batch(b) for b in batches],
+    }
+    out: dict[str, Any] = {}
+    for name, fn in cases.items():
+        secs = _time(fn, rounds)
+        out[name] = {
+            "ms": round(secs * 1000, 2),
+            "texts_per_s": round(len(texts) / secs) if secs > 0 else None,
+            "mb_per_s": round(size_mb / secs, 1) if secs > 0 else None,
+        }
+    base = out["legacy_per_text"]["ms"]
+    for v in out.values():
+        v["speedup"] = round(base / v["ms"], 2) if v["ms"] else None
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmark the price parser on a labelled card-text corpus")
+    parser.add_argument("--corpus", default=str(CORPUS))
+    parser.add_argument("--repeat", type=int, default=200, help="Repeat the corpus this many times for timing")
+    parser.add_argument("--batch-size", type=int, default=60, help="Texts per batch call (roughly cards per results page)")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per case (median is reported)")
+    parser.add_argument("--max-false-positive-rate", type=float, default=-1.0, help="Exit 1 above this rate (default: report only)")
+    parser.add_argument("--out", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    rows = load_corpus(Path(args.corpus))
+    texts = [r["text"] for r in rows] * max(1, args.repeat)
+    report: dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "corpus": args.corpus,
+        "timed_texts": len(texts),
+        "batch_size": args.batch_size,
+        "throughput": throughput(texts, args.batch_size, args.rounds),
+        "accuracy": accuracy(rows),
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    rate = report["accuracy"]["false_positive_rate"]
+    if args.max_false_positive_rate >= 0 and rate > args.max_false_positive_rate:
+        print(f"False-positive rate {rate:.2%} > {args.max_false_positive_rate:.2%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
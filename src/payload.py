@@ -0,0 +1,192 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from urllib.parse import unquote_plus
+
+from .config import DEFAULT_RESULTS_API_PATTERN
+from .matching import name_matches
+
+# 结果页 .cartype-list 背后的查询接口返回 JSON。这里不依赖具体字段结构，
+# 而是在 JSON 树中寻找“同时含车型名与价格”的对象，作为一条报价。
+
+NAME_KEYS = (
+    "cartypename", "cartype_name", "modelname", "model_name", "vehiclename", "vehicle_name",
+    "carname", "car_name", "cartype", "brandmodel", "name", "title",
+)
+PRICE_KEYS = (
+    "dailyprice", "daily_price", "avgprice", "avg_price", "averageprice", "dayprice", "currentprice",
+    "current_price", "saleprice", "sale_price", "price", "amount", "totalprice", "total_price",
+)
+# 沿用父节点车型名的子节点只认日租价字段：amount / total* 多为费用、保险或总价
+INHERITED_PRICE_KEYS = PRICE_KEYS[: PRICE_KEYS.index("amount")]
+# 只有这些键下的子节点才沿用父节点的车型名（同车型的多条报价，如不同取还方式）；
+# 其余子节点（费用明细、保险、优惠等）即使带价格字段也不算该车型的报价
+PRICE_LIST_KEYS = ("prices", "pricelist", "price_list", "priceinfos", "price_infos", "quotes", "quotelist", "rates", "ratelist")
+PICKUP_KEYS = ("pickupmode", "pickup_mode", "pickuptype", "pickup_type", "servicename", "service_name", "deliverytype")
+# 价格对象嵌套时（如 {"price": {"current": 698}}）在内层按此顺序取值
+NESTED_PRICE_KEYS = ("current", "value", "amount", "price", "avg", "daily")
+
+
+@dataclass
+class Offer:
+    name: str
+    price: float
+    pickup_mode: Optional[str] = None
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+
+def _to_price(v: Any) -> Optional[float]:
+    if isinstance(v, bool):
+        return None
+    if isinstance(v, (int, float)):
+        val = float(v)
+    elif isinstance(v, str):
+        try:
+            val = float(v.replace(",", "").replace("¥", "").replace("￥", "").strip())
+        except ValueError:
+            return None
+    elif isinstance(v, dict):
+        lowered = {str(k).lower(): x for k, x in v.items()}
+        for k in NESTED_PRICE_KEYS:
+            if k in lowered:
+                p = _to_price(lowered[k])
+                if p is not None:
+                    return p
+        return None
+    else:
+        return None
+    # 与 parse_price_from_text 一致：过滤明显不是日租价的小数值
+    return val if val >= 20 else None
+
+
+def _first_str(lowered: dict, keys: tuple[str, ...]) -> Optional[str]:
+    for k in keys:
+        v = lowered.get(k)
+        if isinstance(v, str) and v.strip():
+            return v.strip()
+    return None
+
+
+def _offer_from(obj: dict, inherited_name: Optional[str]) -> tuple[Optional[Offer], Optional[str]]:
+    # 返回 (报价, 传给价格列表子节点的车型名)；子节点缺车型名时沿用父节点的（如 {"name":..., "prices":[...]}）
+    lowered = {str(k).lower(): v for k, v in obj.items()}
+    own_name = _first_str(lowered, NAME_KEYS)
+    name = own_name or inherited_name
+    if name is None:
+        return None, None
+    price = None
+    for k in PRICE_KEYS if own_name else INHERITED_PRICE_KEYS:
+        if k in lowered:
+            price = _to_price(lowered[k])
+            if price is not None:
+                break
+    if price is None:
+        return None, name
+    attrs = {k: v for k, v in obj.items() if isinstance(v, (str, int, float, bool)) or v is None}
+    return Offer(name=name, price=price, pickup_mode=_first_str(lowered, PICKUP_KEYS), attrs=attrs), name
+
+
+def extract_offers(payload: Any) -> list[Offer]:
+    offers: list[Offer] = []
+    stack: list[tuple[Any, Optional[str]]] = [(payload, None)]
+    while stack:
+        node, inherited = stack.pop()
+        if isinstance(node, dict):
+            offer, name = _offer_from(node, inherited)
+            if offer is not None:
+                offers.append(offer)
+            # 价格可能分布在价格列表子节点（同车型不同取还方式），继续向下找；其余子节点不继承车型名
+            stack.extend(
+                (v, name if str(k).lower() in PRICE_LIST_KEYS else None)
+                for k, v in node.items()
+                if isinstance(v, (dict, list))
+            )
+        elif isinstance(node, list):
+            stack.extend((v, inherited) for v in node if isinstance(v, (dict, list)))
+    return offers
+
+
+def min_price_for(offers: list[Offer], car_name: str) -> Optional[float]:
+    # 同车型不同取还方式时，取最低
+    prices = [o.price for o in offers if name_matches(o.name, car_name)]
+    return min(prices) if prices else None
+
+
+class ResultsCapture:
+    # 记录查询接口的 JSON 响应；未命中时由调用方回退到 DOM 解析
+    def __init__(self, pattern: str = DEFAULT_RESULTS_API_PATTERN) -> None:
+        self.pattern = re.compile(pattern)
+        self.offers: list[Offer] = []
+        self.urls: list[str] = []
+        self.pending: list[Any] = []
+        # 解析出车型的响应 JSON，连同请求一起作为查询条件的回显（见 evidence）
+        self.payloads: list[Any] = []
+        # 第一个解析出车型的接口请求（混合模式据此重放）
+        self.request: Optional[dict[str, Any]] = None
+
+    def matches(self, response: Any) -> bool:
+        try:
+            if response.request.resource_type not in ("xhr", "fetch"):
+                return False
+            if not self.pattern.search(response.url):
+                return False
+            ctype = (response.headers or {}).get("content-type", "")
+            return "json" in ctype or ctype == ""
+        except Exception:
+            return False
+
+    def record(self, response: Any) -> None:
+        # page.on("response") 回调：只记下响应对象，body 在查询结束后统一读取
+        if self.matches(response):
+            self.pending.append(response)
+
+    def drain(self) -> bool:
+        # sync API：读取已记录响应的 JSON
+        pending, self.pending = self.pending, []
+        for r in pending:
+            try:
+                if self.add_payload(r.url, r.json()):
+                    self._remember_request(r)
+            except Exception:
+                continue
+        return bool(self.offers)
+
+    async def drain_async(self) -> bool:
+        pending, self.pending = self.pending, []
+        for r in pending:
+            try:
+                if self.add_payload(r.url, await r.json()):
+                    self._remember_request(r)
+            except Exception:
+                continue
+        return bool(self.offers)
+
+    def _remember_request(self, response: Any) -> None:
+        if self.request is not None:
+            return
+        req = response.request
+        try:
+            post_data = req.post_data
+        except Exception:
+            post_data = None
+        self.request = {"method": req.method, "url": req.url, "headers": dict(req.headers or {}), "post_data": post_data}
+
+    def add_payload(self, url: str, payload: Any) -> bool:
+        offers = extract_offers(payload)
+        if not offers:
+            return False
+        self.urls.append(url)
+        self.offers.extend(offers)
+        self.payloads.append(payload)
+        return True
+
+    def evidence(self) -> list[str]:
+        # 站点实际查询条件的文本：解码后的请求 URL/表单与响应 JSON
+        texts = [json.dumps(p, ensure_ascii=False) for p in self.payloads]
+        if self.request is not None:
+            texts += [unquote_plus(self.request.get("url") or ""), unquote_plus(self.request.get("post_data") or "")]
+        return texts
+
+    def price_for(self, car_name: str) -> Optional[float]:
+        return min_price_for(self.offers, car_name)
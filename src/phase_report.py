@@ -0,0 +1,60 @@
+import argparse
+import statistics
+from dataclasses import replace
+
+from dotenv import load_dotenv
+
+from .browser_pool import BrowserPool
+from .config import Settings
+from .fetcher import get_prices_for_search
+from .timing import PhaseTimer
+
+# 对比保守模式与快速模式的分阶段耗时：
+#   python -m src.phase_report --runs 3
+# 两种模式各自使用独立的 BrowserPool（slow_mo 不同），依次交替运行以摊平网络波动。
+
+PHASES = ("navigate", "fill_city", "set_date", "search", "results", "extract", "scroll")
+
+
+def _run(settings: Settings, pool: BrowserPool) -> dict[str, float]:
+    t = PhaseTimer()
+    get_prices_for_search(settings, [settings.car_name], pool, t)
+    return t.totals()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare per-phase latency of conservative vs fast mode")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    load_dotenv()
+    base = Settings.from_env()
+    modes = {
+        "conservative": replace(base, fast_mode=False),
+        "fast": replace(base, fast_mode=True),
+    }
+    samples: dict[str, list[dict[str, float]]] = {m: [] for m in modes}
+    pools = {m: BrowserPool(headful=base.headful, fast=s.fast_mode) for m, s in modes.items()}
+    try:
+        for _ in range(max(1, args.runs)):
+            for m, s in modes.items():
+                samples[m].append(_run(s, pools[m]))
+    finally:
+        for pool in pools.values():
+            pool.close()
+
+    def mean(mode: str, phase: str) -> float:
+        return statistics.fmean(r.get(phase, 0.0) for r in samples[mode]) * 1000
+
+    print(f"{'phase':<12}{'conservative':>14}{'fast':>10}{'saved':>10}")
+    for phase in PHASES + ("total",):
+        if phase == "total":
+            c = sum(mean("conservative", p) for p in PHASES)
+            f = sum(mean("fast", p) for p in PHASES)
+        else:
+            c, f = mean("conservative", phase), mean("fast", phase)
+        print(f"{phase:<12}{c:>12.0f}ms{f:>8.0f}ms{c - f:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
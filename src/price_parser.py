@@ -0,0 +1,92 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+# 价格解析：正则预编译，支持一次解析整批卡片文本。
+# 规则（与单条解析一致）：
+#   1) 优先带货币符号的价格（¥ / ￥ / RMB）
+#   2) 否则取数字后紧跟价格语境的（/日均、天、元），要求 2~5 位整数，避免“1.2T”“5座”等
+#   取到的第一个候选小于 MIN_PRICE 时视为非价格（不再往后找），与旧行为保持一致
+# 批量接口按页一次调用：逐条用预编译模式的 search 绑定方法。拼成一个字符串只扫一遍的做法实测更慢
+# （每个匹配都要在 Python 里换算回所属文本），见 python -m src.parse_bench。
+
+# 千分位分支至少要有一个逗号组，否则“¥1500”会被截成 150
+CURRENCY_RE = re.compile(r"(?:¥|RMB|￥)\s*([0-9]{1,3}(?:,[0-9]{3})+(?:\.[0-9]{1,2})?|[0-9]+(?:\.[0-9]{1,2})?)")
+CONTEXT_RE = re.compile(r"([0-9]{2,5}(?:\.[0-9]{1,2})?)\s*(?:/\s*日均|日均|/\s*天|天|元)")
+MIN_PRICE = 20.0
+CONTEXT_CHARS = 12
+
+
+@dataclass
+class PriceCandidate:
+    value: float
+    # currency | context
+    kind: str
+    # 匹配在原文本中的位置与前后各 CONTEXT_CHARS 个字符（空白折叠），便于排查误匹配
+    start: int
+    end: int
+    context: str
+
+    @property
+    def plausible(self) -> bool:
+        return self.value >= MIN_PRICE
+
+
+def _value(raw: str) -> Optional[float]:
+    try:
+        return float(raw.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _plausible(v: Optional[float]) -> Optional[float]:
+    # 保护：过滤明显不是价格的极小值（如 1.2T、5 座等已通过语境避免，这里再兜底）
+    return v if v is not None and v >= MIN_PRICE else None
+
+
+def parse_price_from_text(text: str) -> Optional[float]:
+    m = CURRENCY_RE.search(text) or CONTEXT_RE.search(text)
+    if not m:
+        return None
+    return _plausible(_value(m.group(1)))
+
+
+def best_price(candidates: list[PriceCandidate]) -> Optional[float]:
+    # 候选按 kind 分组、组内按出现顺序：货币符号优先，其次价格语境
+    for kind in ("currency", "context"):
+        for c in candidates:
+            if c.kind == kind:
+                return _plausible(c.value)
+    return None
+
+
+def _context(text: str, start: int, end: int) -> str:
+    return " ".join(text[max(0, start - CONTEXT_CHARS):end + CONTEXT_CHARS].split())
+
+
+def find_prices_batch(texts: Iterable[str]) -> list[list[PriceCandidate]]:
+    # 返回与 texts 一一对应的全部候选（含小于 MIN_PRICE 的候选，用 plausible 区分），排查误匹配用
+    out: list[list[PriceCandidate]] = []
+    for text in texts:
+        found = []
+        for kind, pattern in (("currency", CURRENCY_RE), ("context", CONTEXT_RE)):
+            for m in pattern.finditer(text):
+                value = _value(m.group(1))
+                if value is not None:
+                    found.append(PriceCandidate(value, kind, m.start(), m.end(), _context(text, m.start(), m.end())))
+        out.append(found)
+    return out
+
+
+def find_prices(text: str) -> list[PriceCandidate]:
+    return find_prices_batch([text])[0]
+
+
+def parse_prices(texts: Iterable[str]) -> list[Optional[float]]:
+    # 批量版 parse_price_from_text，结果与逐条调用一致
+    currency, context = CURRENCY_RE.search, CONTEXT_RE.search
+    out: list[Optional[float]] = []
+    for text in texts:
+        m = currency(text) or context(text)
+        out.append(_plausible(_value(m.group(1))) if m else None)
+    return out
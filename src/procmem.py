@@ -0,0 +1,160 @@
+import os
+from typing import Optional
+
+# 基于 /proc 的进程内存读数（仅 Linux，其他平台返回 None/空），不引入 psutil。
+# Playwright 的进程树：python -> node driver -> chromium（browser/renderer/gpu…）
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _ppid_map() -> dict[int, int]:
+    parents: dict[int, int] = {}
+    try:
+        names = os.listdir("/proc")
+    except OSError:
+        return parents
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # comm 可能含空格/括号，从最后一个 ')' 之后解析
+        fields = stat[stat.rfind(")") + 2:].split()
+        try:
+            parents[int(name)] = int(fields[1])
+        except (IndexError, ValueError):
+            continue
+    return parents
+
+
+def descendants(pid: int) -> list[int]:
+    parents = _ppid_map()
+    children: dict[int, list[int]] = {}
+    for child, parent in parents.items():
+        children.setdefault(parent, []).append(child)
+    out: list[int] = []
+    stack = list(children.get(pid, []))
+    while stack:
+        p = stack.pop()
+        out.append(p)
+        stack.extend(children.get(p, []))
+    return out
+
+
+def process_name(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/comm", "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def children_rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    # 当前进程所有子孙进程（driver + 浏览器）的 RSS 之和；共享页会被重复计入，只作趋势参考
+    pid = os.getpid() if pid is None else pid
+    if rss_bytes(pid) is None:
+        return None
+    return sum(rss_bytes(p) or 0 for p in descendants(pid))
+
+
+def pss_bytes(pid: int) -> Optional[int]:
+    # PSS：共享页按共享它的进程数分摊（/proc/<pid>/smaps_rollup，Linux 4.14+）
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def children_pss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    # 子孙进程的 PSS 之和：Chromium 各进程共享的页只计一份，接近真实占用，用作回收阈值；读不到时返回 None
+    pid = os.getpid() if pid is None else pid
+    if pss_bytes(pid) is None:
+        return None
+    return sum(pss_bytes(p) or 0 for p in descendants(pid))
+
+
+# Chromium 进程名（Linux 下 comm 截断为 15 个字符）；Playwright 驱动是 node
+CHROMIUM_NAMES = ("chrome", "chromium", "headless_shell", "chrome_crashpad")
+DRIVER_NAMES = ("node", "playwright")
+
+
+def is_chromium(pid: int) -> bool:
+    name = process_name(pid).lower()
+    return any(name.startswith(n) for n in CHROMIUM_NAMES)
+
+
+# Playwright 启动的 Chromium 主进程的命令行标记：管道调试协议 + Playwright 临时 profile 目录。
+# 用户自己开的 Chrome、其他自动化工具的浏览器都不带这组参数
+PLAYWRIGHT_PIPE_FLAG = "--remote-debugging-pipe"
+PLAYWRIGHT_PROFILE_PREFIX = "playwright_chromiumdev_profile-"
+
+
+def cmdline(pid: int) -> list[str]:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return [a.decode("utf-8", "replace") for a in f.read().split(b"\0") if a]
+    except OSError:
+        return []
+
+
+def start_time(pid: int) -> Optional[int]:
+    # 进程启动时刻（自开机起的 clock ticks），与 pid 一起唯一标识进程，防止 pid 复用后误杀
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+        return int(stat[stat.rfind(")") + 2:].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def is_playwright_chromium(pid: int) -> bool:
+    args = cmdline(pid)
+    if PLAYWRIGHT_PIPE_FLAG not in args:
+        return False
+    return any(
+        a.startswith("--user-data-dir=") and os.path.basename(a.split("=", 1)[1].rstrip("/")).startswith(PLAYWRIGHT_PROFILE_PREFIX)
+        for a in args
+    )
+
+
+def launched_chromium(pid: Optional[int] = None, parents: Optional[dict[int, int]] = None) -> list[int]:
+    # 本进程（经 Playwright 驱动）启动的 Chromium 主进程：子孙进程中最顶层、带 Playwright 标记的 Chromium
+    pid = os.getpid() if pid is None else pid
+    parents = _ppid_map() if parents is None else parents
+    tree = set(descendants(pid))
+    return [p for p in tree if is_chromium(p) and not is_chromium(parents.get(p, 0)) and is_playwright_chromium(p)]
+
+
+def orphan_chromium(known: dict[int, int], parents: Optional[dict[int, int]] = None) -> list[int]:
+    # 孤儿：known（pid -> 启动时刻，本进程启动过的 Chromium 主进程）中仍存活、但父进程已不是 Playwright 驱动的
+    # （驱动已退出，被 init/PID 1 收养）。只认本进程登记过的浏览器，其他实例或用户自己的 Chromium 一概不碰
+    parents = _ppid_map() if parents is None else parents
+    orphans: list[int] = []
+    for pid, started in known.items():
+        if pid not in parents or start_time(pid) != started:
+            continue
+        if not is_chromium(pid) or not is_playwright_chromium(pid):
+            continue
+        if any(process_name(parents[pid]).lower().startswith(n) for n in DRIVER_NAMES):
+            continue
+        orphans.append(pid)
+    return orphans
+
+
+def chromium_count() -> int:
+    return sum(1 for pid in _ppid_map() if is_chromium(pid))
@@ -0,0 +1,374 @@
+import gzip
+import http.client
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.cookies import SimpleCookie
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+from .config import Settings
+from .metrics import PHASE_SECONDS, REPLAYS
+from .payload import extract_offers, min_price_for
+from .snapshot import inventory_from_offers, save_inventory
+
+# 混合模式：浏览器完成一次查询后，记下结果接口的请求（方法/URL/请求头/body）与当时的 cookie，
+# 之后同一行程的轮询直接用长连接 HTTP 客户端重放该请求并解析 JSON，不再打开页面。
+# 模板按 (取车城市, 还车城市, 日期) 保存；同一线路换日期时，若模板的 URL/body 中能找到原日期则直接替换。
+# 判定会话失效并回退浏览器（浏览器查询成功后重新记录模板）：
+#   非 200、响应不是 JSON、解析不到任何车型、网络错误，或模板超过 max_age。
+
+# 这些请求头由客户端自行生成，不能原样重放
+SKIP_HEADERS = frozenset((
+    "host", "content-length", "connection", "keep-alive", "transfer-encoding",
+    "accept-encoding", "cookie", "upgrade", "te",
+))
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d")
+
+
+class ReplayError(Exception):
+    pass
+
+
+def _route_key(s: Settings) -> str:
+    return f"{s.pickup_city}->{s.return_city}"
+
+
+def _search_key(s: Settings) -> str:
+    return f"{_route_key(s)}|{s.pickup_date}|{s.return_date}"
+
+
+def _date_variants(date: str) -> list[str]:
+    try:
+        d = datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return [date]
+    return [d.strftime(f) for f in DATE_FORMATS]
+
+
+def substitute_dates(text: str, old: tuple[str, str], new: tuple[str, str]) -> Optional[str]:
+    # 把模板中的取/还车日期换成新日期：一次正则替换，避免新取车日等于原还车日时被连续替换两次。
+    # 取车与还车日期都必须在文本中出现（任一格式），否则返回 None（无法安全改写）
+    if old == new:
+        return text
+    mapping: dict[str, str] = {}
+    for old_date, new_date in zip(old, new):
+        for o, n in zip(_date_variants(old_date), _date_variants(new_date)):
+            if mapping.setdefault(o, n) != n:
+                # 原取/还车是同一天而新日期不同：分不清文本里的哪一处是取车日
+                return None
+    pattern = re.compile("|".join(re.escape(o) for o in sorted(mapping, key=len, reverse=True)))
+    seen: set[str] = set()
+
+    def swap(m: re.Match) -> str:
+        seen.add(m.group(0))
+        return mapping[m.group(0)]
+
+    text = pattern.sub(swap, text)
+    if not all(seen.intersection(_date_variants(d)) for d in old):
+        return None
+    return text
+
+
+def _mentions_dates(text: Optional[str], dates: tuple[str, ...]) -> bool:
+    return text is not None and any(v in text for d in dates for v in _date_variants(d))
+
+
+def cookie_header(cookies: list[dict[str, Any]], url: str, now: Optional[float] = None) -> str:
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    path = parts.path or "/"
+    now = time.time() if now is None else now
+    pairs = []
+    for c in cookies:
+        domain = str(c.get("domain", "")).lower().lstrip(".")
+        if domain and host != domain and not host.endswith("." + domain):
+            continue
+        if not path.startswith(str(c.get("path") or "/")):
+            continue
+        if c.get("secure") and parts.scheme != "https":
+            continue
+        expires = float(c.get("expires", -1) or -1)
+        if expires > 0 and expires < now:
+            continue
+        pairs.append(f"{c['name']}={c.get('value', '')}")
+    return "; ".join(pairs)
+
+
+def merge_set_cookie(cookies: list[dict[str, Any]], headers: list[str], url: str) -> bool:
+    # 重放响应里的 Set-Cookie 写回 cookie 列表（服务器续期会话时沿用新值）
+    host = urlsplit(url).hostname or ""
+    changed = False
+    for raw in headers:
+        jar = SimpleCookie()
+        try:
+            jar.load(raw)
+        except Exception:
+            continue
+        for name, morsel in jar.items():
+            domain = (morsel["domain"] or host).lstrip(".")
+            path = morsel["path"] or "/"
+            for c in cookies:
+                if c.get("name") == name and str(c.get("domain", "")).lstrip(".") == domain and (c.get("path") or "/") == path:
+                    if c.get("value") != morsel.value:
+                        c["value"] = morsel.value
+                        changed = True
+                    break
+            else:
+                cookies.append({"name": name, "value": morsel.value, "domain": domain, "path": path, "expires": -1})
+                changed = True
+    return changed
+
+
+def _decode(body: bytes, encoding: str) -> bytes:
+    encoding = encoding.lower()
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+class HttpPool:
+    # 每个 (scheme, host, port) 一条 keep-alive 连接；连接被服务器关闭时重连一次
+    def __init__(self, timeout: float = 15.0) -> None:
+        self.timeout = timeout
+        self._conns: dict[tuple[str, str, int], http.client.HTTPConnection] = {}
+        self._lock = threading.Lock()
+
+    def _conn(self, scheme: str, host: str, port: int) -> http.client.HTTPConnection:
+        key = (scheme, host, port)
+        conn = self._conns.get(key)
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = self._conns[key] = cls(host, port, timeout=self.timeout)
+        return conn
+
+    def _drop(self, scheme: str, host: str, port: int) -> None:
+        conn = self._conns.pop((scheme, host, port), None)
+        if conn is not None:
+            conn.close()
+
+    def request(
+        self, method: str, url: str, headers: dict[str, str], body: Optional[bytes] = None
+    ) -> tuple[int, http.client.HTTPMessage, bytes]:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        host = parts.hostname or ""
+        port = parts.port or (443 if scheme == "https" else 80)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        with self._lock:
+            for attempt in (0, 1):
+                conn = self._conn(scheme, host, port)
+                try:
+                    conn.request(method, target, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    data = resp.read()
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError, http.client.CannotSendRequest):
+                    # 复用的连接已被服务端关闭
+                    self._drop(scheme, host, port)
+                    if attempt:
+                        raise
+                    continue
+                except Exception:
+                    self._drop(scheme, host, port)
+                    raise
+                if resp.will_close:
+                    self._drop(scheme, host, port)
+                return resp.status, resp.msg, data
+        raise ReplayError("unreachable")
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._conns.values():
+                conn.close()
+            self._conns.clear()
+
+
+class Replayer:
+    def __init__(self, path: str | Path = "data/replay.json", max_age_seconds: float = 7200.0, timeout: float = 15.0) -> None:
+        self.path = Path(path)
+        self.max_age_seconds = max_age_seconds
+        self.http = HttpPool(timeout)
+        self._lock = threading.Lock()
+        self._data: dict[str, Any] = {}
+        self._mtime: Optional[float] = None
+
+    def _load(self) -> None:
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            self._data, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        self._data = data if isinstance(data, dict) else {}
+        self._mtime = mtime
+
+    def _save(self) -> None:
+        # 文件内含会话 cookie，仅本用户可读
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self._data, ensure_ascii=False, indent=2), encoding="utf-8")
+        try:
+            os.chmod(tmp, 0o600)
+        except OSError:
+            pass
+        os.replace(tmp, self.path)
+        self._mtime = self.path.stat().st_mtime
+
+    def remember(self, s: Settings, request: Optional[dict[str, Any]], cookies: list[dict[str, Any]]) -> None:
+        # 浏览器查询成功后调用：记录（或刷新）该行程的重放模板
+        if not request or not request.get("url"):
+            return
+        entry = {
+            "route": _route_key(s),
+            "dates": [s.pickup_date, s.return_date],
+            "ts": int(time.time()),
+            "request": request,
+            "cookies": cookies,
+        }
+        with self._lock:
+            self._load()
+            self._data[_search_key(s)] = entry
+            self._save()
+        print(f"[replay] template saved: {_search_key(s)} {request.get('method', 'GET')} {request['url']}")
+
+    def _template(self, s: Settings) -> Optional[tuple[str, dict[str, Any]]]:
+        # 优先同一查询的模板，其次同一线路、可改写日期的模板（最新的优先）
+        with self._lock:
+            self._load()
+            exact = self._data.get(_search_key(s))
+            if isinstance(exact, dict):
+                return _search_key(s), exact
+            same_route = [
+                (k, v) for k, v in self._data.items()
+                if isinstance(v, dict) and v.get("route") == _route_key(s)
+            ]
+        same_route.sort(key=lambda kv: kv[1].get("ts", 0), reverse=True)
+        return same_route[0] if same_route else None
+
+    def _build(self, s: Settings, entry: dict[str, Any]) -> Optional[tuple[str, str, dict[str, str], Optional[bytes]]]:
+        req = entry["request"]
+        old = tuple(entry.get("dates") or ("", ""))
+        new = (s.pickup_date, s.return_date)
+        url = substitute_dates(req["url"], old, new)
+        post = req.get("post_data")
+        if post is not None:
+            post = substitute_dates(post, old, new)
+        if old != new:
+            # 日期必须在 URL 或 body 中完整出现，否则模板只对原日期有效；
+            # 另一处改写不了却仍含原日期时，请求前后不一致，同样不重放
+            if url is None and post is None:
+                return None
+            if url is None:
+                if _mentions_dates(req["url"], old):
+                    return None
+                url = req["url"]
+            if post is None:
+                if _mentions_dates(req.get("post_data"), old):
+                    return None
+                post = req.get("post_data")
+        headers = {k: v for k, v in (req.get("headers") or {}).items() if k.lower() not in SKIP_HEADERS and not k.startswith(":")}
+        headers["Accept-Encoding"] = "gzip, deflate"
+        cookie = cookie_header(entry.get("cookies") or [], url)
+        if cookie:
+            headers["Cookie"] = cookie
+        body = post.encode("utf-8") if post is not None else None
+        return req.get("method", "GET"), url, headers, body
+
+    def fetch_offers(self, s: Settings) -> tuple[str, Optional[list]]:
+        # 返回 (结果, offers)：ok / miss（没有可用模板）/ expired / error；后两者会删除模板
+        found = self._template(s)
+        if found is None:
+            return "miss", None
+        key, entry = found
+        if time.time() - float(entry.get("ts", 0)) > self.max_age_seconds:
+            self._drop(key)
+            print(f"[replay] {key}: template expired, re-bootstrap in browser")
+            return "expired", None
+        built = self._build(s, entry)
+        if built is None:
+            return "miss", None
+        try:
+            offers, raw_len = self._send(key, *built)
+        except ReplayError as e:
+            # 借用同线路其它日期的模板失败时只是本次改写不可用，那份模板对它自己的日期仍有效
+            if key == _search_key(s):
+                self._drop(key)
+            print(f"[replay] {key}: {e}; fall back to browser")
+            return "error", None
+        print(f"[replay] {key}: {len(offers)} offers, {raw_len / 1024:.1f}KB")
+        return "ok", offers
+
+    def _send(self, key: str, method: str, url: str, headers: dict[str, str], body: Optional[bytes]) -> tuple[list, int]:
+        try:
+            status, msg, raw = self.http.request(method, url, headers, body)
+        except Exception as e:
+            raise ReplayError(f"network: {e}") from e
+        if status != 200:
+            raise ReplayError(f"HTTP {status}")
+        try:
+            payload = json.loads(_decode(raw, msg.get("Content-Encoding", "")).decode("utf-8"))
+        except (OSError, ValueError, zlib.error) as e:
+            raise ReplayError(f"not JSON ({len(raw)} bytes)") from e
+        offers = extract_offers(payload)
+        if not offers:
+            raise ReplayError("no offers in response")
+        set_cookies = msg.get_all("Set-Cookie") or []
+        if set_cookies:
+            with self._lock:
+                self._load()
+                stored = self._data.get(key)
+                if isinstance(stored, dict) and merge_set_cookie(stored.setdefault("cookies", []), set_cookies, url):
+                    self._save()
+        return offers, len(raw)
+
+    def _drop(self, key: str) -> None:
+        with self._lock:
+            self._load()
+            if self._data.pop(key, None) is not None:
+                self._save()
+
+    def prices(self, s: Settings, car_names: list[str]) -> Optional[dict[str, Optional[float]]]:
+        # 重放成功返回 {车型: 价格}；无模板或失效返回 None，由调用方回退浏览器
+        t0 = time.perf_counter()
+        result, offers = self.fetch_offers(s)
+        REPLAYS.inc(result=result)
+        if offers is None:
+            return None
+        PHASE_SECONDS.observe(time.perf_counter() - t0, phase="replay")
+        save_inventory(s, inventory_from_offers(offers, "replay"))
+        return {c: min_price_for(offers, c) for c in dict.fromkeys(car_names)}
+
+    def close(self) -> None:
+        self.http.close()
+
+
+_replayers: dict[str, Replayer] = {}
+
+
+def replayer_from_settings(settings: Settings) -> Optional[Replayer]:
+    # 同一路径共用一个实例（连接池与模板在多次轮询之间复用）
+    if not settings.hybrid_mode:
+        return None
+    r = _replayers.get(settings.replay_path)
+    if r is None:
+        r = _replayers[settings.replay_path] = Replayer(
+            settings.replay_path, settings.replay_max_age_minutes * 60, settings.replay_timeout_seconds
+        )
+    return r
@@ -0,0 +1,188 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from tenacity import AsyncRetrying, Retrying, stop_after_attempt, wait_fixed
+
+from .config import Settings
+from .metrics import BREAKER_OPEN, BREAKER_SKIPS, PHASE_RECOVERED, PHASE_RETRIES
+
+# 分阶段重试：导航 / 城市 / 日期 / 查询 / 提取各自重试，在同一页面上从最近一次成功的状态继续，
+# 不再因为一次日期没选上或结果没等到就关掉页面、从头再来。
+#   每个阶段最多 attempts 次；重试前调用 restore 把页面恢复到该阶段的前置状态（如表单已不在则重新打开并填城市）。
+#   required=False 的阶段（查询）重试用尽后不抛出，继续后续阶段（结果为空时价格为 None）。
+# 熔断：同一 watch 连续失败 threshold 次后暂停 cooldown 秒；冷却结束放行一次试探，
+# 再失败则冷却时间翻倍（上限 max_cooldown），成功即复位。
+
+T = TypeVar("T")
+
+
+class PhaseError(Exception):
+    def __init__(self, phase: str, message: str) -> None:
+        super().__init__(f"{phase}: {message}")
+        self.phase = phase
+
+
+@dataclass
+class RetryReport:
+    # phase -> 实际尝试次数（只记录发生过重试或失败的阶段）
+    attempts: dict[str, int] = field(default_factory=dict)
+    recovered: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+
+    @property
+    def retries(self) -> int:
+        return sum(n - 1 for n in self.attempts.values())
+
+    def summary(self) -> str:
+        if not self.attempts:
+            return "no retries"
+        parts = []
+        for phase, n in self.attempts.items():
+            state = "recovered" if phase in self.recovered else "failed" if phase in self.failed else "retried"
+            parts.append(f"{phase}={n - 1} ({state})")
+        return ", ".join(parts)
+
+
+class PhaseRunner:
+    def __init__(self, attempts: int = 3, wait_seconds: float = 1.0, report: Optional[RetryReport] = None) -> None:
+        self.attempts = max(1, attempts)
+        self.wait_seconds = max(0.0, wait_seconds)
+        self.report = report or RetryReport()
+
+    @staticmethod
+    def from_settings(settings: Settings) -> "PhaseRunner":
+        return PhaseRunner(settings.phase_attempts, settings.phase_retry_wait_seconds)
+
+    def _before_sleep(self, phase: str) -> Callable[[Any], None]:
+        def hook(retry_state) -> None:
+            PHASE_RETRIES.inc(phase=phase)
+            exc = retry_state.outcome.exception() if retry_state.outcome else None
+            print(f"[retry] {phase} attempt {retry_state.attempt_number}/{self.attempts} failed: {exc}; retry on the same page")
+        return hook
+
+    def _finish(self, phase: str, attempt_number: int, ok: bool) -> None:
+        if attempt_number > 1 or not ok:
+            self.report.attempts[phase] = attempt_number
+        if ok and attempt_number > 1:
+            self.report.recovered.append(phase)
+            PHASE_RECOVERED.inc(phase=phase)
+        if not ok:
+            self.report.failed.append(phase)
+
+    def run(
+        self,
+        phase: str,
+        fn: Callable[[], T],
+        restore: Optional[Callable[[], Any]] = None,
+        required: bool = True,
+    ) -> Optional[T]:
+        retrying = Retrying(
+            stop=stop_after_attempt(self.attempts),
+            wait=wait_fixed(self.wait_seconds),
+            before_sleep=self._before_sleep(phase),
+            reraise=True,
+        )
+        n = 0
+        try:
+            for attempt in retrying:
+                with attempt:
+                    n = attempt.retry_state.attempt_number
+                    if n > 1 and restore is not None:
+                        restore()
+                    result = fn()
+        except Exception as e:
+            self._finish(phase, n, False)
+            if required:
+                raise
+            print(f"[retry] {phase} gave up after {n} attempts: {e}; continue")
+            return None
+        self._finish(phase, n, True)
+        return result
+
+    async def run_async(
+        self,
+        phase: str,
+        fn: Callable[[], Awaitable[T]],
+        restore: Optional[Callable[[], Awaitable[Any]]] = None,
+        required: bool = True,
+    ) -> Optional[T]:
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.attempts),
+            wait=wait_fixed(self.wait_seconds),
+            before_sleep=self._before_sleep(phase),
+            reraise=True,
+        )
+        n = 0
+        try:
+            async for attempt in retrying:
+                with attempt:
+                    n = attempt.retry_state.attempt_number
+                    if n > 1 and restore is not None:
+                        await restore()
+                    result = await fn()
+        except Exception as e:
+            self._finish(phase, n, False)
+            if required:
+                raise
+            print(f"[retry] {phase} gave up after {n} attempts: {e}; continue")
+            return None
+        self._finish(phase, n, True)
+        return result
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        threshold: int = 3,
+        cooldown_seconds: float = 1800.0,
+        max_cooldown_seconds: float = 14400.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        # threshold <= 0 表示关闭熔断
+        self.threshold = threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max(cooldown_seconds, max_cooldown_seconds)
+        self.clock = clock
+        self._failures: dict[str, int] = {}
+        self._trips: dict[str, int] = {}
+        self._open_until: dict[str, float] = {}
+
+    @staticmethod
+    def from_settings(settings: Settings) -> "CircuitBreaker":
+        return CircuitBreaker(settings.breaker_threshold, settings.breaker_cooldown_seconds, settings.breaker_max_cooldown_seconds)
+
+    def remaining(self, key: str) -> float:
+        return max(0.0, self._open_until.get(key, 0.0) - self.clock())
+
+    def allow(self, key: str) -> bool:
+        if self.threshold <= 0:
+            return True
+        if self.remaining(key) > 0:
+            BREAKER_SKIPS.inc()
+            return False
+        return True
+
+    def record(self, key: str, ok: bool) -> Optional[float]:
+        # 返回本次熔断的冷却秒数；未熔断返回 None
+        if self.threshold <= 0:
+            return None
+        if ok:
+            self._failures.pop(key, None)
+            self._trips.pop(key, None)
+            self._open_until.pop(key, None)
+            BREAKER_OPEN.set(self.open_count())
+            return None
+        self._failures[key] = self._failures.get(key, 0) + 1
+        if self._failures[key] < self.threshold:
+            return None
+        # 达到阈值，或冷却后的试探再次失败（失败计数保持在阈值）
+        trips = self._trips[key] = self._trips.get(key, 0) + 1
+        cooldown = min(self.max_cooldown_seconds, self.cooldown_seconds * 2 ** (trips - 1))
+        self._open_until[key] = self.clock() + cooldown
+        BREAKER_OPEN.set(self.open_count())
+        return cooldown
+
+    def open_count(self) -> int:
+        now = self.clock()
+        return sum(1 for until in self._open_until.values() if until > now)
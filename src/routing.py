@@ -0,0 +1,98 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from .config import DEFAULT_ALLOW_PATTERNS, DEFAULT_BLOCK_PATTERNS, DEFAULT_BLOCK_TYPES, Settings
+
+# 请求拦截：丢弃表单与结果解析用不到的资源（图片、字体、统计埋点等），并统计每次轮询的流量。
+# 白名单优先于所有屏蔽规则。
+
+
+@dataclass
+class TrafficStats:
+    requests: int = 0
+    blocked: int = 0
+    bytes: int = 0
+    finished: list[Any] = field(default_factory=list, repr=False)
+
+    def summary(self) -> str:
+        return f"requests={self.requests} blocked={self.blocked} bytes={self.bytes / 1024:.1f}KB"
+
+
+class RequestBlocker:
+    def __init__(
+        self,
+        block_types: tuple[str, ...] = DEFAULT_BLOCK_TYPES,
+        block_patterns: tuple[str, ...] = DEFAULT_BLOCK_PATTERNS,
+        allow_patterns: tuple[str, ...] = DEFAULT_ALLOW_PATTERNS,
+    ) -> None:
+        self.block_types = frozenset(t.strip().lower() for t in block_types if t.strip())
+        self.block_patterns = [re.compile(p) for p in block_patterns if p]
+        self.allow_patterns = [re.compile(p) for p in allow_patterns if p]
+        self.stats = TrafficStats()
+
+    def reset(self) -> TrafficStats:
+        stats, self.stats = self.stats, TrafficStats()
+        return stats
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if any(p.search(url) for p in self.allow_patterns):
+            return False
+        if resource_type in self.block_types:
+            return True
+        return any(p.search(url) for p in self.block_patterns)
+
+    # sync API
+    def handle(self, route: Any) -> None:
+        req = route.request
+        self.stats.requests += 1
+        if self.should_block(req.url, req.resource_type):
+            self.stats.blocked += 1
+            route.abort()
+        else:
+            # fallback 而非 continue_：让同一请求继续交给 context 级路由（如离线基准的本地转发）
+            route.fallback()
+
+    # async API
+    async def handle_async(self, route: Any) -> None:
+        req = route.request
+        self.stats.requests += 1
+        if self.should_block(req.url, req.resource_type):
+            self.stats.blocked += 1
+            await route.abort()
+        else:
+            await route.fallback()
+
+    def on_finished(self, request: Any) -> None:
+        # 事件回调里只记录，字节数在轮询结束时统一读取（避免在回调中做 IPC）
+        self.stats.finished.append(request)
+
+    def collect_bytes(self) -> TrafficStats:
+        finished, self.stats.finished = self.stats.finished, []
+        for req in finished:
+            try:
+                sizes = req.sizes()
+                self.stats.bytes += int(sizes.get("responseBodySize", 0)) + int(sizes.get("responseHeadersSize", 0))
+            except Exception:
+                continue
+        return self.stats
+
+    async def collect_bytes_async(self) -> TrafficStats:
+        finished, self.stats.finished = self.stats.finished, []
+        for req in finished:
+            try:
+                sizes = await req.sizes()
+                self.stats.bytes += int(sizes.get("responseBodySize", 0)) + int(sizes.get("responseHeadersSize", 0))
+            except Exception:
+                continue
+        return self.stats
+
+
+def blocker_from_settings(settings: Settings) -> Optional[RequestBlocker]:
+    if not settings.block_requests:
+        return None
+    return RequestBlocker(
+        block_types=settings.block_resource_types,
+        block_patterns=settings.block_url_patterns,
+        allow_patterns=settings.allow_url_patterns,
+    )
@@ -0,0 +1,193 @@
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Iterable, Optional
+from zoneinfo import ZoneInfo
+
+from .config import EHI_TZ, Settings
+from .watches import SearchKey, Watch, group_by_search
+
+# 自适应轮询：每个 watch 的间隔 = 基础间隔 × 临近取车系数 × 波动系数 × 错误系数，再加随机抖动。
+# 一个 SearchKey（一次浏览器查询）取其下所有 watch 的最短间隔。
+# 全局预算：滑动一小时内最多 sessions_per_hour 次查询；预算不足时，已到期的查询按间隔（越短越急）排队。
+
+ERROR_EWMA_ALPHA = 0.3
+VOLATILITY_WINDOW = 12
+
+
+def days_to_pickup(pickup_date: str, today: Optional[date] = None) -> Optional[int]:
+    try:
+        d = date.fromisoformat(pickup_date)
+    except ValueError:
+        return None
+    today = today or datetime.now(ZoneInfo(EHI_TZ)).date()
+    return (d - today).days
+
+
+def pickup_factor(days: Optional[int]) -> float:
+    if days is None:
+        return 1.0
+    if days < 0:
+        # 已过取车日：价格不再有意义，按最长间隔低频确认
+        return float("inf")
+    if days <= 1:
+        return 0.25
+    if days <= 3:
+        return 0.5
+    if days <= 7:
+        return 0.75
+    if days > 30:
+        return 2.0
+    return 1.0
+
+
+def volatility_factor(prices: list[float]) -> float:
+    # 最近若干次观测中价格变动的比例：频繁变动则加密，长期不变则放缓
+    recent = prices[-VOLATILITY_WINDOW:]
+    if len(recent) < 3:
+        return 1.0
+    changes = sum(1 for a, b in zip(recent, recent[1:]) if a != b)
+    rate = changes / (len(recent) - 1)
+    if rate == 0:
+        return 1.5 if len(recent) < VOLATILITY_WINDOW else 2.0
+    if rate >= 0.3:
+        return 0.5
+    return 1.0
+
+
+def error_factor(error_rate: float) -> float:
+    # 出错多时拉长间隔，避免对故障页面/风控反复打满
+    return 1.0 + 3.0 * max(0.0, min(1.0, error_rate))
+
+
+@dataclass
+class _Entry:
+    key: SearchKey
+    watches: list[Watch]
+    due: float = 0.0
+    interval: float = 0.0
+    error_rate: float = 0.0
+    histories: dict[str, list[float]] = field(default_factory=dict)
+
+
+class AdaptiveScheduler:
+    def __init__(
+        self,
+        watches: list[Watch],
+        base_interval: float,
+        min_interval: float = 120.0,
+        max_interval: float = 3600.0,
+        jitter: float = 0.1,
+        sessions_per_hour: int = 0,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.base_interval = float(base_interval)
+        self.min_interval = float(min_interval)
+        self.max_interval = max(float(max_interval), self.min_interval)
+        self.jitter = max(0.0, float(jitter))
+        self.sessions_per_hour = int(sessions_per_hour)
+        self.rng = rng or random.Random()
+        self._sessions: deque[float] = deque()
+        self._seq = itertools.count()
+        self._entries: dict[SearchKey, _Entry] = {}
+        self._timeline: list[tuple[float, int, SearchKey]] = []
+        # 已到期、等待预算的查询：(间隔, 到期时间, seq, key)，间隔越短越优先
+        self._ready: list[tuple[float, float, int, SearchKey]] = []
+        now = time.time()
+        for key, group in group_by_search(watches).items():
+            entry = _Entry(key=key, watches=group)
+            entry.interval = self.interval_for(entry)
+            self._entries[key] = entry
+            # 启动时全部立即到期（与固定间隔模式的首轮一致）
+            self._push(entry, now)
+
+    @staticmethod
+    def from_settings(settings: Settings, watches: list[Watch]) -> "AdaptiveScheduler":
+        return AdaptiveScheduler(
+            watches,
+            base_interval=settings.check_interval_seconds,
+            min_interval=settings.min_interval_seconds,
+            max_interval=settings.max_interval_seconds,
+            jitter=settings.interval_jitter,
+            sessions_per_hour=settings.sessions_per_hour,
+        )
+
+    def watches_for(self, key: SearchKey) -> list[Watch]:
+        return self._entries[key].watches
+
+    def interval_for(self, entry: _Entry, today: Optional[date] = None) -> float:
+        # 不含抖动的间隔，同时作为排队优先级
+        factor = pickup_factor(days_to_pickup(entry.key.pickup_date, today))
+        if entry.histories:
+            factor *= min(volatility_factor(entry.histories.get(w.id, [])) for w in entry.watches)
+        factor *= error_factor(entry.error_rate)
+        return max(self.min_interval, min(self.max_interval, self.base_interval * factor))
+
+    def _push(self, entry: _Entry, due: float) -> None:
+        entry.due = due
+        heapq.heappush(self._timeline, (due, next(self._seq), entry.key))
+
+    def _budget_wait(self, now: float) -> float:
+        # 0 表示还有预算；否则返回最早一次查询滑出一小时窗口的剩余秒数
+        if self.sessions_per_hour <= 0:
+            return 0.0
+        while self._sessions and self._sessions[0] <= now - 3600:
+            self._sessions.popleft()
+        if len(self._sessions) < self.sessions_per_hour:
+            return 0.0
+        return self._sessions[0] + 3600 - now
+
+    def next_batch(self, limit: int = 1, now: Optional[float] = None) -> tuple[list[SearchKey], float]:
+        # 返回 (本次要执行的查询, 若为空则建议 sleep 的秒数)
+        now = time.time() if now is None else now
+        while self._timeline and self._timeline[0][0] <= now:
+            due, seq, key = heapq.heappop(self._timeline)
+            heapq.heappush(self._ready, (self._entries[key].interval, due, seq, key))
+        batch: list[SearchKey] = []
+        while self._ready and len(batch) < max(1, limit):
+            if self._budget_wait(now) > 0:
+                break
+            _, _, _, key = heapq.heappop(self._ready)
+            self._sessions.append(now)
+            batch.append(key)
+        if batch:
+            return batch, 0.0
+        waits = []
+        if self._ready:
+            waits.append(self._budget_wait(now))
+        if self._timeline:
+            waits.append(self._timeline[0][0] - now)
+        return [], max(1.0, min(waits)) if waits else self.base_interval
+
+    def complete(
+        self,
+        key: SearchKey,
+        ok: bool,
+        histories: Optional[dict[str, list[float]]] = None,
+        now: Optional[float] = None,
+    ) -> float:
+        # 一次查询结束：更新错误率与价格历史，计算并排入下一次到期时间；返回带抖动的间隔
+        now = time.time() if now is None else now
+        entry = self._entries[key]
+        entry.error_rate = (1 - ERROR_EWMA_ALPHA) * entry.error_rate + ERROR_EWMA_ALPHA * (0.0 if ok else 1.0)
+        if histories:
+            entry.histories.update(histories)
+        entry.interval = self.interval_for(entry)
+        delay = entry.interval
+        if self.jitter:
+            delay *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+        delay = max(self.min_interval * (1 - self.jitter), delay)
+        self._push(entry, now + delay)
+        return delay
+
+    def sessions_last_hour(self, now: Optional[float] = None) -> int:
+        self._budget_wait(time.time() if now is None else now)
+        return len(self._sessions)
+
+    def describe(self) -> Iterable[str]:
+        for entry in sorted(self._entries.values(), key=lambda e: e.due):
+            yield f"{entry.key.label()}: every ~{entry.interval:.0f}s, error rate {entry.error_rate:.2f}"
@@ -0,0 +1,339 @@
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .browser_pool import BrowserPool
+from .config import Settings
+from .metrics import REGISTRY, SERVE_FLIGHTS, SERVE_REQUESTS
+from .replay import replayer_from_settings
+from .watches import SearchKey, settings_for_search
+
+# 本地查询服务：python run.py serve
+#   GET /price?from=敦煌&to=德令哈&pickup=2025-10-04&return=2025-10-08&car=大众新探影[&car=...][&max_age=60]
+#   GET /health   GET /metrics
+# 结果按查询条件（城市+日期）缓存 SERVE_CACHE_TTL_SECONDS，未找到的车型只缓存 SERVE_NEGATIVE_TTL_SECONDS。
+# 同一查询条件的并发请求合并为一次浏览器查询（singleflight）：排队中的查询可以追加车型，
+# 已在执行的查询不包含的车型排到下一次。浏览器只在唯一的抓取线程里使用（Playwright 同步 API 绑定线程），
+# HTTP 线程只负责排队与等待。有混合模式模板时先走 HTTP 重放。
+
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class QueryError(Exception):
+    # HTTP 400：参数错误
+    pass
+
+
+@dataclass
+class CacheEntry:
+    price: Optional[float]
+    fetched_at: float
+
+
+@dataclass
+class Flight:
+    search: SearchKey
+    cars: set[str]
+    started: bool = False
+    done: threading.Event = field(default_factory=threading.Event)
+    prices: dict[str, Optional[float]] = field(default_factory=dict)
+    error: Optional[str] = None
+    fetched_at: float = 0.0
+
+
+class PriceService:
+    def __init__(self, settings: Settings, logger: Optional[logging.Logger] = None, pool: Optional[BrowserPool] = None) -> None:
+        self.settings = settings
+        self.logger = logger or logging.getLogger("ehi_monitor")
+        self.ttl_seconds = settings.serve_cache_ttl_seconds
+        self.negative_ttl_seconds = settings.serve_negative_ttl_seconds
+        self.timeout_seconds = settings.serve_timeout_seconds
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._cache: dict[tuple[SearchKey, str], CacheEntry] = {}
+        # 每个查询条件最多一个排队中的 flight 和一个执行中的 flight
+        self._queued: dict[SearchKey, Flight] = {}
+        self._running: dict[SearchKey, Flight] = {}
+        self._work: "queue.Queue[Optional[Flight]]" = queue.Queue()
+        self.thread = threading.Thread(target=self._worker, name="fetch-worker", daemon=True)
+
+    # ---- HTTP 线程 ----
+
+    def _fresh(self, entry: Optional[CacheEntry], max_age: Optional[float], now: float) -> bool:
+        if entry is None:
+            return False
+        ttl = self.ttl_seconds if entry.price is not None else self.negative_ttl_seconds
+        if max_age is not None:
+            ttl = min(ttl, max_age)
+        return now - entry.fetched_at < ttl
+
+    def query(self, search: SearchKey, cars: list[str], max_age: Optional[float] = None) -> dict[str, Any]:
+        cars = list(dict.fromkeys(cars))
+        now = time.time()
+        waiting: list[Flight] = []
+        result: dict[str, Any] = {}
+        # 返回结果中最早的抓取时间
+        oldest: Optional[float] = None
+        # 是否搭上了别的请求发起的查询（用于统计合并效果）
+        joined = False
+        with self._lock:
+            missing = []
+            for car in cars:
+                entry = self._cache.get((search, car))
+                if self._fresh(entry, max_age, now):
+                    result[car] = entry.price
+                    oldest = entry.fetched_at if oldest is None else min(oldest, entry.fetched_at)
+                else:
+                    missing.append(car)
+            if missing:
+                # 执行中的 flight 已包含的车型直接等它；其余并入排队中的 flight（没有就新建）
+                running = self._running.get(search)
+                rest = [c for c in missing if running is None or c not in running.cars]
+                if running is not None and len(rest) < len(missing):
+                    waiting.append(running)
+                    joined = True
+                if rest:
+                    flight = self._queued.get(search)
+                    if flight is None:
+                        flight = self._queued[search] = Flight(search, set(rest))
+                        self._work.put(flight)
+                        SERVE_FLIGHTS.inc()
+                    else:
+                        flight.cars.update(rest)
+                        joined = True
+                    waiting.append(flight)
+        kind = "hit" if not missing else "coalesced" if joined else "miss"
+        deadline = time.monotonic() + self.timeout_seconds
+        for flight in waiting:
+            if not flight.done.wait(max(0.0, deadline - time.monotonic())):
+                SERVE_REQUESTS.inc(result="timeout")
+                raise TimeoutError(f"search {search.label()} did not finish within {self.timeout_seconds:.0f}s")
+            if flight.error is not None:
+                SERVE_REQUESTS.inc(result="error")
+                raise RuntimeError(flight.error)
+            for car in missing:
+                if car in flight.prices:
+                    result[car] = flight.prices[car]
+            oldest = flight.fetched_at if oldest is None else min(oldest, flight.fetched_at)
+        SERVE_REQUESTS.inc(result=kind)
+        return {
+            "search": {"from": search.pickup_city, "to": search.return_city, "pickup": search.pickup_date, "return": search.return_date},
+            "prices": {c: result.get(c) for c in cars},
+            "cached": not missing,
+            "age_seconds": round(time.time() - (oldest or now), 1),
+        }
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"ok": self.thread.is_alive(), "cache_entries": len(self._cache), "queued": len(self._queued), "running": len(self._running)}
+
+    # ---- 抓取线程 ----
+
+    def _take_batch(self, first: Flight) -> list[Flight]:
+        # 把已排队的 flight 一起取出：异步引擎可以在一个浏览器里并发执行
+        batch = [first]
+        while True:
+            try:
+                f = self._work.get_nowait()
+            except queue.Empty:
+                return batch
+            if f is None:
+                self._work.put(None)
+                return batch
+            batch.append(f)
+
+    def _fetch(self, flight: Flight) -> dict[str, Optional[float]]:
+        s = settings_for_search(self.settings, flight.search)
+        cars = sorted(flight.cars)
+        replayer = replayer_from_settings(self.settings)
+        if replayer is not None:
+            prices = replayer.prices(s, cars)
+            if prices is not None:
+                return prices
+        from .fetcher import get_prices_for_search
+
+        if self._pool is None:
+            self._pool = BrowserPool.from_settings(self.settings)
+        return get_prices_for_search(s, cars, self._pool)
+
+    def _fetch_async(self, flights: list[Flight]) -> None:
+        from .async_fetcher import get_prices_sync
+
+        replayer = replayer_from_settings(self.settings)
+        pending = []
+        for f in flights:
+            prices = replayer.prices(settings_for_search(self.settings, f.search), sorted(f.cars)) if replayer is not None else None
+            if prices is None:
+                pending.append(f)
+            else:
+                self._finish(f, prices, None)
+        if not pending:
+            return
+        try:
+            by_search = get_prices_sync({f.search: sorted(f.cars) for f in pending}, self.settings)
+        except Exception as e:
+            for f in pending:
+                self._finish(f, {}, str(e))
+            return
+        for f in pending:
+            r = by_search.get(f.search, {})
+            if isinstance(r, Exception):
+                self._finish(f, {}, str(r) or type(r).__name__)
+            else:
+                self._finish(f, r, None)
+
+    def _finish(self, flight: Flight, prices: dict[str, Optional[float]], error: Optional[str]) -> None:
+        now = time.time()
+        with self._lock:
+            flight.prices = {c: prices.get(c) for c in flight.cars}
+            flight.error = error
+            flight.fetched_at = now
+            if error is None:
+                for car, price in flight.prices.items():
+                    self._cache[(flight.search, car)] = CacheEntry(price, now)
+            if self._running.get(flight.search) is flight:
+                del self._running[flight.search]
+        flight.done.set()
+        if error is not None:
+            self.logger.error(f"Query [{flight.search.label()}] failed: {error}")
+        else:
+            self.logger.info(f"Query [{flight.search.label()}]: {flight.prices}")
+
+    def _worker(self) -> None:
+        while True:
+            first = self._work.get()
+            if first is None:
+                break
+            batch = self._take_batch(first)
+            with self._lock:
+                for f in batch:
+                    # 从这里起不再接受追加车型
+                    f.started = True
+                    if self._queued.get(f.search) is f:
+                        del self._queued[f.search]
+                    self._running[f.search] = f
+            if self.settings.fetch_engine == "async":
+                self._fetch_async(batch)
+            else:
+                for f in batch:
+                    try:
+                        self._finish(f, self._fetch(f), None)
+                    except Exception as e:
+                        self._finish(f, {}, str(e))
+            self.evict()
+        if self._pool is not None:
+            self._pool.close()
+
+    def start(self) -> "PriceService":
+        self.thread.start()
+        return self
+
+    def close(self) -> None:
+        self._work.put(None)
+        self.thread.join(timeout=30)
+        with self._lock:
+            leftover = list(self._queued.values()) + list(self._running.values())
+        for f in leftover:
+            if not f.done.is_set():
+                self._finish(f, {}, "service stopped")
+        self.evict()
+
+    def evict(self) -> int:
+        # 清掉过期条目，返回清掉的数量
+        now = time.time()
+        with self._lock:
+            stale = [k for k, e in self._cache.items() if not self._fresh(e, None, now)]
+            for k in stale:
+                del self._cache[k]
+        return len(stale)
+
+
+def parse_query(query: str, settings: Settings) -> tuple[SearchKey, list[str], Optional[float]]:
+    q = parse_qs(query)
+
+    def one(name: str, default: str) -> str:
+        return (q.get(name) or [default])[0].strip()
+
+    search = SearchKey(
+        one("from", settings.pickup_city),
+        one("to", settings.return_city),
+        one("pickup", settings.pickup_date),
+        one("return", settings.return_date),
+    )
+    for d in (search.pickup_date, search.return_date):
+        if not DATE_RE.match(d):
+            raise QueryError(f"invalid date {d!r}, expected YYYY-MM-DD")
+    if search.return_date < search.pickup_date:
+        raise QueryError("return date is before pickup date")
+    if not search.pickup_city or not search.return_city:
+        raise QueryError("from/to cities are required")
+    cars = [c.strip() for v in q.get("car", []) for c in v.split(",") if c.strip()] or [settings.car_name]
+    max_age = None
+    if "max_age" in q:
+        try:
+            max_age = max(0.0, float(one("max_age", "0")))
+        except ValueError:
+            raise QueryError("max_age must be a number of seconds")
+    return search, cars, max_age
+
+
+class QueryServer:
+    def __init__(self, service: PriceService, port: int, host: str = "127.0.0.1") -> None:
+        svc = service
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def _send(self, status: int, body: bytes, ctype: str = "application/json; charset=utf-8") -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, status: int, data: Any) -> None:
+                self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                if url.path == "/health":
+                    self._json(200, svc.stats())
+                elif url.path == "/metrics":
+                    self._send(200, REGISTRY.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+                elif url.path == "/price":
+                    try:
+                        search, cars, max_age = parse_query(url.query, svc.settings)
+                        self._json(200, svc.query(search, cars, max_age))
+                    except QueryError as e:
+                        SERVE_REQUESTS.inc(result="bad_request")
+                        self._json(400, {"error": str(e)})
+                    except TimeoutError as e:
+                        self._json(504, {"error": str(e)})
+                    except Exception as e:
+                        self._json(502, {"error": str(e)})
+                else:
+                    self._json(404, {"error": "not found"})
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="query-http", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self) -> "QueryServer":
+        self.thread.start()
+        return self
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,327 @@
+import argparse
+import json
+import math
+import os
+import re
+import statistics
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+from zoneinfo import ZoneInfo
+
+from .config import EHI_TZ, Settings
+from .metrics import SNAPSHOT_ROWS
+from .store import route_key
+from .watches import SearchKey, search_key_of
+
+# 全量库存快照（SNAPSHOT_MODE=1）：每次查询把结果表里的全部车型（名称、价格、取还方式、来源）
+# 连同时间戳与查询条件写入按线路/天分区的列式文件，长期的全车队分析直接扫文件，不必重新抓取。
+#   data/snapshots/<线路>/<YYYY-MM-DD>.ehs      线路目录名为 "取车城市__还车城市"，日期按 EHI_TZ
+# 文件由若干块顺序追加而成，一块对应一次查询：
+#   MAGIC | uint32 头长度 | JSON 头 {rows, columns: [{name, kind, size, values?}]} | 各列 zlib 压缩数据
+#   f64 列为 float64 小端数组（价格缺失为 NaN）；cat 列为字典编码：values 放在头里，数据为 uint16/uint32 编码
+# 只追加、不改写；进程被杀留下的半块在读取时跳过：块内（头或数据里）出现下一个 MAGIC、长度越过文件尾
+# 或解压失败的块都按损坏处理，从下一个 MAGIC 继续读，字节数计入 skipped_bytes。
+#   python -m src.snapshot --route 敦煌->德令哈 --since 2025-09-01 --until 2025-09-30 [--car 大众新探影]
+
+MAGIC = b"EHS1"
+EXT = ".ehs"
+COLUMNS = (
+    ("ts", "f64"),
+    ("pickup_date", "cat"),
+    ("return_date", "cat"),
+    ("name", "cat"),
+    ("price", "f64"),
+    ("pickup_mode", "cat"),
+    ("source", "cat"),
+)
+LITTLE = sys.byteorder == "little"
+
+
+def _slug(route: str) -> str:
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", route.replace("->", "__"))
+
+
+def _route_of(slug: str) -> str:
+    return slug.replace("__", "->")
+
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, ZoneInfo(EHI_TZ)).date().isoformat()
+
+
+def _pack(arr: array) -> bytes:
+    if not LITTLE:
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return zlib.compress(arr.tobytes(), 6)
+
+
+def _unpack(typecode: str, data: bytes) -> array:
+    arr = array(typecode)
+    arr.frombytes(zlib.decompress(data))
+    if not LITTLE:
+        arr.byteswap()
+    return arr
+
+
+def encode_block(rows: list[dict[str, Any]]) -> bytes:
+    header_cols = []
+    payloads = []
+    for name, kind in COLUMNS:
+        if kind == "f64":
+            data = _pack(array("d", (math.nan if r.get(name) is None else float(r[name]) for r in rows)))
+            header_cols.append({"name": name, "kind": kind, "size": len(data)})
+        else:
+            values: dict[str, int] = {}
+            codes = [values.setdefault(str(r.get(name) or ""), len(values)) for r in rows]
+            typecode = "H" if len(values) <= 0xFFFF else "I"
+            data = _pack(array(typecode, codes))
+            header_cols.append({"name": name, "kind": kind, "size": len(data), "code": typecode, "values": list(values)})
+        payloads.append(data)
+    header = json.dumps({"rows": len(rows), "columns": header_cols}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return MAGIC + struct.pack("<I", len(header)) + header + b"".join(payloads)
+
+
+@dataclass
+class Categorical:
+    # 字典编码的字符串列：codes[i] 是 values 的下标；按值过滤时先查 code 再比较整数
+    values: list[str] = field(default_factory=list)
+    codes: array = field(default_factory=lambda: array("I"))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i: int) -> str:
+        return self.values[self.codes[i]]
+
+    def code_of(self, value: str) -> Optional[int]:
+        try:
+            return self.values.index(value)
+        except ValueError:
+            return None
+
+    def decode(self) -> list[str]:
+        return [self.values[c] for c in self.codes]
+
+    def _extend(self, values: list[str], codes: array, index: dict[str, int]) -> None:
+        remap = []
+        for v in values:
+            if v not in index:
+                index[v] = len(self.values)
+                self.values.append(v)
+            remap.append(index[v])
+        self.codes.extend(remap[c] for c in codes)
+
+
+@dataclass
+class Snapshot:
+    # 一个日期范围内的全部行，按列存放
+    route: str
+    columns: dict[str, Any]
+    blocks: int = 0
+    skipped_bytes: int = 0
+
+    def __len__(self) -> int:
+        for col in self.columns.values():
+            return len(col)
+        return 0
+
+    def __getitem__(self, name: str) -> Any:
+        return self.columns[name]
+
+    def rows(self) -> Iterator[dict[str, Any]]:
+        names = list(self.columns)
+        for i in range(len(self)):
+            yield {n: self.columns[n][i] for n in names}
+
+    def prices_by_name(self, car_name: Optional[str] = None) -> dict[str, list[float]]:
+        # 车型 -> 全部有效价格；只需要 name/price 两列
+        names: Categorical = self.columns["name"]
+        prices: array = self.columns["price"]
+        wanted = names.code_of(car_name) if car_name is not None else None
+        if car_name is not None and wanted is None:
+            return {}
+        out: dict[int, list[float]] = {}
+        for code, p in zip(names.codes, prices):
+            if p == p and (wanted is None or code == wanted):
+                out.setdefault(code, []).append(p)
+        return {names.values[c]: v for c, v in out.items()}
+
+
+def _iter_blocks(data: bytes) -> Iterator[tuple[Optional[dict[str, Any]], int, int]]:
+    # 产出 (头, 数据起点, 块终点)；损坏的块产出 (None, 起点, 下一个 MAGIC 的位置)
+    pos = 0
+    n = len(data)
+    while pos < n:
+        header = None
+        end = pos
+        if data.startswith(MAGIC, pos) and pos + 8 <= n:
+            (hlen,) = struct.unpack_from("<I", data, pos + 4)
+            body = pos + 8 + hlen
+            try:
+                header = json.loads(data[pos + 8:body].decode("utf-8"))
+                end = body + sum(int(c["size"]) for c in header["columns"])
+            except (ValueError, KeyError, TypeError):
+                header = None
+            # 被截断的块后面若又追加了新块，头里的列长度会伸进下一块：块内出现 MAGIC 即视为损坏
+            if header is not None and (end > n or data.find(MAGIC, pos + 4, end) >= 0):
+                header = None
+        if header is None:
+            nxt = data.find(MAGIC, pos + 1)
+            nxt = n if nxt < 0 else nxt
+            yield None, pos, nxt
+            pos = nxt
+            continue
+        yield header, pos + 8 + hlen, end
+        pos = end
+
+
+class SnapshotStore:
+    def __init__(self, root: str | os.PathLike[str] = "data/snapshots") -> None:
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def path_for(self, route: str, day: str) -> Path:
+        return self.root / _slug(route) / f"{day}{EXT}"
+
+    def append(self, search: SearchKey, inventory: Iterable[tuple[str, Optional[float], Optional[str], str]], ts: Optional[float] = None) -> int:
+        # inventory: (车型, 价格, 取还方式, 来源)；返回写入行数
+        ts = time.time() if ts is None else ts
+        rows = [
+            {"ts": ts, "pickup_date": search.pickup_date, "return_date": search.return_date, "name": name, "price": price, "pickup_mode": mode, "source": source}
+            for name, price, mode, source in inventory
+            if name
+        ]
+        if not rows:
+            return 0
+        block = encode_block(rows)
+        path = self.path_for(route_key(search.pickup_city, search.return_city), _day(ts))
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 一次 write 追加整块；失败时截回原长度，不留下半块
+            with path.open("ab") as f:
+                size = f.tell()
+                try:
+                    f.write(block)
+                    f.flush()
+                except OSError:
+                    f.truncate(size)
+                    raise
+        SNAPSHOT_ROWS.inc(len(rows))
+        return len(rows)
+
+    def routes(self) -> list[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(_route_of(p.name) for p in self.root.iterdir() if p.is_dir())
+
+    def days(self, route: str) -> list[str]:
+        d = self.root / _slug(route)
+        return sorted(p.stem for p in d.glob(f"*{EXT}")) if d.is_dir() else []
+
+    def load(self, route: str, since: Optional[str] = None, until: Optional[str] = None, columns: Optional[Iterable[str]] = None) -> Snapshot:
+        # 读取 [since, until]（含两端，YYYY-MM-DD）内的全部块；columns 指定时只解压这些列
+        wanted = [n for n, _ in COLUMNS if columns is None or n in set(columns)]
+        kinds = dict(COLUMNS)
+        cols: dict[str, Any] = {n: array("d") if kinds[n] == "f64" else Categorical() for n in wanted}
+        indexes: dict[str, dict[str, int]] = {n: {} for n in wanted if kinds[n] == "cat"}
+        snap = Snapshot(route, cols)
+        for day in self.days(route):
+            if (since and day < since) or (until and day > until):
+                continue
+            data = self.path_for(route, day).read_bytes()
+            for header, start, end in _iter_blocks(data):
+                if header is None:
+                    snap.skipped_bytes += end - start
+                    continue
+                # 先解压整块再并入结果，某列解压失败时整块跳过，各列行数保持一致
+                try:
+                    decoded = []
+                    offset = start
+                    for col in header["columns"]:
+                        name, size = col["name"], int(col["size"])
+                        chunk = data[offset:offset + size]
+                        offset += size
+                        if name in cols:
+                            decoded.append((col, _unpack("d" if col["kind"] == "f64" else col["code"], chunk)))
+                except (zlib.error, ValueError, KeyError, TypeError):
+                    snap.skipped_bytes += end - start
+                    continue
+                snap.blocks += 1
+                for col, values in decoded:
+                    if col["kind"] == "f64":
+                        cols[col["name"]].extend(values)
+                    else:
+                        cols[col["name"]]._extend(col["values"], values, indexes[col["name"]])
+        return snap
+
+
+def inventory_from_offers(offers: Iterable[Any], source: str) -> list[tuple[str, Optional[float], Optional[str], str]]:
+    return [(o.name, o.price, o.pickup_mode, source) for o in offers]
+
+
+def inventory_from_cards(rows: Iterable[Any]) -> list[tuple[str, Optional[float], Optional[str], str]]:
+    # 只取 .cartype-list 卡片；就近/预订块是按车型兜底的，不代表整张结果表
+    return [(r.name, r.price, r.pickup_mode or None, r.source) for r in rows if r.source == "cartype"]
+
+
+_stores: dict[str, SnapshotStore] = {}
+
+
+def snapshots_from_settings(settings: Settings) -> Optional[SnapshotStore]:
+    if not settings.snapshot_mode:
+        return None
+    s = _stores.get(settings.snapshot_dir)
+    if s is None:
+        s = _stores[settings.snapshot_dir] = SnapshotStore(settings.snapshot_dir)
+    return s
+
+
+def save_inventory(settings: Settings, inventory: list[tuple[str, Optional[float], Optional[str], str]], search: Optional[SearchKey] = None) -> None:
+    store = snapshots_from_settings(settings)
+    if store is None:
+        return
+    try:
+        n = store.append(search or search_key_of(settings), inventory)
+        print(f"[snapshot] {n} rows")
+    except Exception as e:
+        print(f"[snapshot] could not write: {e}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Scan full-inventory snapshots for a route and date range")
+    parser.add_argument("--dir", default="data/snapshots")
+    parser.add_argument("--route", help="pickup->return, e.g. 敦煌->德令哈 (default: list routes)")
+    parser.add_argument("--since", help="First day, YYYY-MM-DD (inclusive)")
+    parser.add_argument("--until", help="Last day, YYYY-MM-DD (inclusive, default: today)")
+    parser.add_argument("--car", help="Only this car name")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.dir)
+    if not args.route:
+        for route in store.routes():
+            days = store.days(route)
+            print(f"{route}: {len(days)} days ({days[0]} ~ {days[-1]})" if days else f"{route}: empty")
+        return
+    until = args.until or datetime.now(ZoneInfo(EHI_TZ)).date().isoformat()
+    t0 = time.perf_counter()
+    snap = store.load(args.route, args.since, until, columns=("name", "price"))
+    elapsed = (time.perf_counter() - t0) * 1000
+    print(f"{args.route} {args.since or '...'} ~ {until}: {len(snap)} rows in {snap.blocks} polls, loaded in {elapsed:.0f} ms")
+    if snap.skipped_bytes:
+        print(f"skipped {snap.skipped_bytes} bytes of damaged blocks")
+    stats = snap.prices_by_name(args.car)
+    for name, prices in sorted(stats.items(), key=lambda kv: min(kv[1])):
+        print(f"  {name}: n={len(prices)} min={min(prices):.0f} median={statistics.median(prices):.0f} max={max(prices):.0f}")
+
+
+if __name__ == "__main__":
+    main()
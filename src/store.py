@@ -0,0 +1,138 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+# 观测数据的本地索引库（SQLite, WAL）：
+#   observations —— 每次轮询每个 watch 一行，按 (route, ts) / (watch_id, ts) 建索引
+#   last_price   —— 每个 watch 的最近通知价格，与本轮观测在同一事务内更新
+# route 形如 “敦煌->德令哈”，日期单独成列，便于按线路跨日期查询。
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY,
+    watch_id TEXT NOT NULL,
+    route TEXT NOT NULL,
+    pickup_date TEXT NOT NULL,
+    return_date TEXT NOT NULL,
+    car_name TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_obs_route_ts ON observations(route, ts, car_name, price);
+CREATE INDEX IF NOT EXISTS idx_obs_watch_ts ON observations(watch_id, ts);
+CREATE TABLE IF NOT EXISTS last_price (
+    watch_id TEXT PRIMARY KEY,
+    price REAL NOT NULL,
+    ts INTEGER NOT NULL
+);
+"""
+
+
+def route_key(pickup_city: str, return_city: str) -> str:
+    return f"{pickup_city}->{return_city}"
+
+
+@dataclass
+class Observation:
+    watch_id: str
+    route: str
+    pickup_date: str
+    return_date: str
+    car_name: str
+    price: float
+    ts: int = 0
+
+
+@dataclass
+class RouteMin:
+    car_name: str
+    price: float
+    ts: int
+    pickup_date: str
+    return_date: str
+    samples: int
+
+
+class ObservationStore:
+    def __init__(self, path: str | Path = "data/observations.db") -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self) -> "ObservationStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    def record_poll(self, observations: Iterable[Observation], last_prices: Optional[dict[str, float]] = None) -> None:
+        # 一次轮询的全部观测 + 最近价格更新，单事务批量写入
+        now = int(time.time())
+        rows = [
+            (o.watch_id, o.route, o.pickup_date, o.return_date, o.car_name, o.ts or now, o.price)
+            for o in observations
+        ]
+        with self.conn:
+            if rows:
+                self.conn.executemany(
+                    "INSERT INTO observations (watch_id, route, pickup_date, return_date, car_name, ts, price) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            if last_prices:
+                self.conn.executemany(
+                    "INSERT INTO last_price (watch_id, price, ts) VALUES (?, ?, ?) "
+                    "ON CONFLICT(watch_id) DO UPDATE SET price=excluded.price, ts=excluded.ts",
+                    [(k, v, now) for k, v in last_prices.items()],
+                )
+
+    def last_prices(self) -> dict[str, float]:
+        return {row[0]: float(row[1]) for row in self.conn.execute("SELECT watch_id, price FROM last_price")}
+
+    def min_prices(
+        self,
+        route: str,
+        since_ts: int,
+        car_name: Optional[str] = None,
+        pickup_date: Optional[str] = None,
+        return_date: Optional[str] = None,
+    ) -> list[RouteMin]:
+        # 每个车型在时间窗口内的最低价（SQLite 对 MIN() 聚合会带出同一行的其余列）
+        sql = (
+            "SELECT car_name, MIN(price), ts, pickup_date, return_date, COUNT(*) FROM observations "
+            "WHERE route = ? AND ts >= ?"
+        )
+        args: list = [route, since_ts]
+        if car_name:
+            sql += " AND car_name = ?"
+            args.append(car_name)
+        if pickup_date:
+            sql += " AND pickup_date = ?"
+            args.append(pickup_date)
+        if return_date:
+            sql += " AND return_date = ?"
+            args.append(return_date)
+        sql += " GROUP BY car_name ORDER BY MIN(price)"
+        return [
+            RouteMin(car_name=r[0], price=float(r[1]), ts=int(r[2]), pickup_date=r[3], return_date=r[4], samples=int(r[5]))
+            for r in self.conn.execute(sql, args)
+        ]
+
+    def recent_prices(self, watch_id: str, limit: int = 20) -> list[tuple[int, float]]:
+        rows = self.conn.execute(
+            "SELECT ts, price FROM observations WHERE watch_id = ? ORDER BY ts DESC LIMIT ?",
+            (watch_id, limit),
+        ).fetchall()
+        return [(int(ts), float(p)) for ts, p in reversed(rows)]
@@ -0,0 +1,36 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from .metrics import PHASE_SECONDS
+
+
+class PhaseTimer:
+    # 记录一次轮询内各阶段耗时（秒），同名阶段可多次出现；同时计入全局直方图 ehi_phase_seconds
+    def __init__(self) -> None:
+        self.phases: dict[str, list[float]] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases.setdefault(name, []).append(seconds)
+        PHASE_SECONDS.observe(seconds, phase=name)
+
+    def last(self, name: str) -> float:
+        values = self.phases.get(name)
+        return values[-1] if values else 0.0
+
+    def total(self, name: str) -> float:
+        return sum(self.phases.get(name, []))
+
+    def totals(self) -> dict[str, float]:
+        return {k: sum(v) for k, v in self.phases.items()}
+
+    def summary(self) -> str:
+        return " ".join(f"{k}={v * 1000:.0f}ms" for k, v in self.totals().items())
@@ -0,0 +1,164 @@
+import logging
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .config import Settings
+from .metrics import CHROMIUM_PROCESSES, ORPHANS_KILLED, RSS_BYTES
+from .procmem import chromium_count, children_rss_bytes, descendants, launched_chromium, orphan_chromium, rss_bytes, start_time
+
+# 内存看门狗：后台线程定期采样监控进程与浏览器进程树（驱动 + Chromium）的 RSS，写入指标；
+# 顺带清理孤儿 Chromium（驱动异常退出后被 init 收养、不会再被关闭的浏览器进程）：
+# 只清理本进程启动并登记过的浏览器（track_launched），不碰其他进程或用户自己的 Chromium。
+# 浏览器按 RSS 回收由 BrowserPool 在每次取 page 前判断（Playwright 同步 API 只能在所属线程里操作）；
+# 监控进程自身超限时由主循环正常退出，交给 docker 的 restart 策略拉起。
+
+MB = 1024 * 1024
+
+
+@dataclass
+class MemorySample:
+    monitor_bytes: Optional[int]
+    browser_bytes: Optional[int]
+    chromium_procs: int
+    ts: float
+
+    def describe(self) -> str:
+        def mb(v: Optional[int]) -> str:
+            return f"{v / MB:.0f}MB" if v is not None else "n/a"
+        return f"monitor {mb(self.monitor_bytes)}, browser {mb(self.browser_bytes)} ({self.chromium_procs} chromium)"
+
+
+def sample() -> MemorySample:
+    s = MemorySample(rss_bytes(os.getpid()), children_rss_bytes(), chromium_count(), time.time())
+    if s.monitor_bytes is not None:
+        RSS_BYTES.set(s.monitor_bytes, process="monitor")
+    if s.browser_bytes is not None:
+        RSS_BYTES.set(s.browser_bytes, process="browser")
+    CHROMIUM_PROCESSES.set(s.chromium_procs)
+    return s
+
+
+def _alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+    except OSError:
+        return False
+    # 僵尸进程视为已退出
+    return stat[stat.rfind(")") + 2:].split()[0] != "Z"
+
+
+def _reap(pids: list[int]) -> None:
+    # 当前进程是 PID 1（容器内）时孤儿会挂到自己名下，退出后需要回收，避免僵尸累积
+    for pid in pids:
+        try:
+            os.waitpid(pid, os.WNOHANG)
+        except (ChildProcessError, OSError):
+            pass
+
+
+# 本进程启动过的 Chromium 主进程：pid -> 启动时刻
+_launched: dict[int, int] = {}
+_launched_lock = threading.Lock()
+
+
+def track_launched() -> None:
+    # 每次启动浏览器后调用：登记当前挂在本进程驱动下的 Chromium 主进程，并丢掉已退出的
+    found = {pid: start_time(pid) for pid in launched_chromium()}
+    with _launched_lock:
+        for pid, started in list(_launched.items()):
+            if start_time(pid) != started:
+                del _launched[pid]
+        _launched.update({pid: started for pid, started in found.items() if started is not None})
+
+
+def kill_orphans(grace_seconds: float = 3.0) -> list[int]:
+    # 返回被清理的孤儿（本进程启动过的最顶层 Chromium 进程）；先 SIGTERM，宽限期后仍存活的 SIGKILL
+    with _launched_lock:
+        known = dict(_launched)
+    roots = orphan_chromium(known) if known else []
+    if not roots:
+        return []
+    with _launched_lock:
+        for pid in roots:
+            _launched.pop(pid, None)
+    targets = [p for root in roots for p in [root] + descendants(root)]
+    for pid in targets:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+    deadline = time.monotonic() + grace_seconds
+    while time.monotonic() < deadline and any(_alive(p) for p in targets):
+        _reap(targets)
+        time.sleep(0.1)
+    for pid in targets:
+        if _alive(pid):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+    _reap(targets)
+    ORPHANS_KILLED.inc(len(roots))
+    return roots
+
+
+class MemoryWatchdog:
+    def __init__(
+        self,
+        interval_seconds: float = 30.0,
+        monitor_max_rss_mb: float = 0.0,
+        kill_orphans: bool = False,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.interval_seconds = max(1.0, interval_seconds)
+        self.monitor_max_bytes = int(monitor_max_rss_mb * MB)
+        self.kill_orphans = kill_orphans
+        self.logger = logger or logging.getLogger("ehi_monitor")
+        self.last: Optional[MemorySample] = None
+        self.peak_browser_bytes = 0
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="memory-watchdog", daemon=True)
+
+    @staticmethod
+    def from_settings(settings: Settings, logger: Optional[logging.Logger] = None) -> Optional["MemoryWatchdog"]:
+        if settings.memory_check_seconds <= 0:
+            return None
+        return MemoryWatchdog(settings.memory_check_seconds, settings.monitor_max_rss_mb, settings.kill_orphan_chromium, logger)
+
+    def check(self) -> MemorySample:
+        s = self.last = sample()
+        self.peak_browser_bytes = max(self.peak_browser_bytes, s.browser_bytes or 0)
+        if self.kill_orphans:
+            killed = kill_orphans()
+            if killed:
+                self.logger.warning(f"Killed {len(killed)} orphaned Chromium process tree(s): {killed}")
+        return s
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error(f"Memory watchdog: {e}")
+
+    def over_limit(self) -> bool:
+        s = self.last
+        return self.monitor_max_bytes > 0 and s is not None and (s.monitor_bytes or 0) > self.monitor_max_bytes
+
+    def describe(self) -> str:
+        s = self.last or self.check()
+        return f"{s.describe()}, browser peak {self.peak_browser_bytes / MB:.0f}MB"
+
+    def start(self) -> "MemoryWatchdog":
+        self.check()
+        self.thread.start()
+        return self
+
+    def close(self) -> None:
+        self._stop.set()
+        self.thread.join(timeout=5)
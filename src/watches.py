@@ -0,0 +1,105 @@
+import json
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Optional
+
+from .config import Settings
+
+DEFAULT_WATCH_ID = "default"
+
+
+@dataclass(frozen=True)
+class SearchKey:
+    # 一次 firstStep 查询由城市+日期唯一确定，同一 key 的多个车型共用一次搜索
+    pickup_city: str
+    return_city: str
+    pickup_date: str  # YYYY-MM-DD
+    return_date: str  # YYYY-MM-DD
+
+    def label(self) -> str:
+        return f"{self.pickup_city}->{self.return_city} {self.pickup_date}~{self.return_date}"
+
+
+@dataclass(frozen=True)
+class Watch:
+    id: str
+    car_name: str
+    search: SearchKey
+    alert_price: Optional[float]
+
+
+def search_key_of(settings: Settings) -> SearchKey:
+    return SearchKey(
+        pickup_city=settings.pickup_city,
+        return_city=settings.return_city,
+        pickup_date=settings.pickup_date,
+        return_date=settings.return_date,
+    )
+
+
+def default_watch(settings: Settings) -> Watch:
+    # 未配置 watch 列表时，沿用 .env 中的单一车型/行程
+    return Watch(
+        id=DEFAULT_WATCH_ID,
+        car_name=settings.car_name,
+        search=search_key_of(settings),
+        alert_price=settings.alert_price,
+    )
+
+
+def _watch_from_entry(entry: dict, settings: Settings) -> Watch:
+    if not isinstance(entry, dict):
+        raise ValueError(f"Invalid watch entry: {entry!r}")
+    car_name = str(entry.get("car_name") or settings.car_name).strip()
+    search = SearchKey(
+        pickup_city=str(entry.get("pickup_city") or settings.pickup_city).strip(),
+        return_city=str(entry.get("return_city") or settings.return_city).strip(),
+        pickup_date=str(entry.get("pickup_date") or settings.pickup_date).strip(),
+        return_date=str(entry.get("return_date") or settings.return_date).strip(),
+    )
+    raw_alert = entry.get("alert_price", settings.alert_price)
+    alert_price = float(raw_alert) if raw_alert not in (None, "") else None
+    watch_id = str(entry.get("id") or f"{car_name}@{search.label()}")
+    return Watch(id=watch_id, car_name=car_name, search=search, alert_price=alert_price)
+
+
+def load_watches(settings: Settings) -> list[Watch]:
+    # WATCHES_FILE 为 JSON 数组；每项可省略的字段回落到 .env 中的默认值
+    # 例：[{"car_name": "大众新探影"}, {"car_name": "丰田卡罗拉", "pickup_date": "2025-10-05"}]
+    if not settings.watches_file:
+        return [default_watch(settings)]
+    path = Path(settings.watches_file)
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("watches", [])
+    watches = [_watch_from_entry(e, settings) for e in data]
+    if not watches:
+        raise ValueError(f"No watches defined in {path}")
+    ids = [w.id for w in watches]
+    dupes = sorted({i for i in ids if ids.count(i) > 1})
+    if dupes:
+        raise ValueError(f"Duplicate watch ids in {path}: {', '.join(dupes)}")
+    return watches
+
+
+def group_by_search(watches: list[Watch]) -> dict[SearchKey, list[Watch]]:
+    groups: dict[SearchKey, list[Watch]] = {}
+    for w in watches:
+        groups.setdefault(w.search, []).append(w)
+    return groups
+
+
+def settings_for_search(settings: Settings, search: SearchKey) -> Settings:
+    return replace(
+        settings,
+        pickup_city=search.pickup_city,
+        return_city=search.return_city,
+        pickup_date=search.pickup_date,
+        return_date=search.return_date,
+    )
+
+
+def settings_for_watch(settings: Settings, watch: Watch) -> Settings:
+    # 通知/落盘沿用 Settings 接口，这里把 watch 的字段覆盖进去
+    return replace(settings_for_search(settings, watch.search), car_name=watch.car_name, alert_price=watch.alert_price)
@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# 测试直接导入 src.*：仓库根目录加入 sys.path（无需安装）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def settings(monkeypatch, tmp_path):
+    # 只设置 from_env 的必填项，其余取默认值；数据目录指向临时目录
+    for key, value in {
+        "SMTP_HOST": "smtp.example.com",
+        "SMTP_USER": "user",
+        "SMTP_PASS": "pass",
+        "SMTP_FROM": "from@example.com",
+        "EMAIL_TO": "to@example.com",
+    }.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.chdir(tmp_path)
+    from src.config import Settings
+
+    return Settings.from_env()
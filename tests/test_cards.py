@@ -0,0 +1,108 @@
+from src.cards import CardRow, Harvest, match_for, price_for, rows_from_js
+
+
+def card(name: str, price: str = "", price_text: str = "", mode: str = "") -> dict:
+    return {"source": "cartype", "name": name, "price": price, "priceText": price_text, "pickupMode": mode, "attrs": ["1.2T", "5座"], "text": ""}
+
+
+def test_rows_from_js_parses_cartype_rows():
+    rows = rows_from_js([
+        card(" 大众新探影 ", price="698", mode="到店取还"),
+        # 价格容器没有纯数字：按价格容器文本解析，不看规格里的 1.2T
+        card("丰田卡罗拉", price_text="¥298/天 总价¥1192"),
+        card("本田思域", price_text="1.5L 5座"),
+        "not a row",
+    ])
+    assert [(r.name, r.price, r.pickup_mode) for r in rows] == [
+        ("大众新探影", 698.0, "到店取还"),
+        ("丰田卡罗拉", 298.0, ""),
+        ("本田思域", None, ""),
+    ]
+    assert rows[0].attrs == ["1.2T", "5座"]
+    assert rows_from_js(None) == []
+
+
+def test_rows_from_js_parses_fallback_blocks_from_text():
+    rows = rows_from_js([
+        {"source": "near", "name": "大众新探影", "text": "大众新探影 1.2T 自动 ¥ 358 日均"},
+        {"source": "booking", "name": "", "text": "日均价 ¥ 1,298 预订"},
+    ])
+    assert [(r.source, r.price) for r in rows] == [("near", 358.0), ("booking", 1298.0)]
+
+
+def test_match_prefers_cartype_and_takes_lowest_variant():
+    rows = [
+        CardRow("near", "大众新探影", 100.0),
+        CardRow("cartype", "大众新探影", 420.0, "送车上门"),
+        CardRow("cartype", "大众新探影", 398.0, "到店取还"),
+    ]
+    assert match_for(rows, "大众新探影") == (398.0, "cartype")
+
+
+def test_match_tanying_name_variants():
+    # “探影”系列的卡片名常写作“大众探影”等变体，按“大众”+“探影”两个关键词匹配
+    rows = [CardRow("cartype", "大众探影 1.5L", 310.0), CardRow("cartype", "比亚迪秦PLUS", 200.0)]
+    assert match_for(rows, "大众新探影") == (310.0, "cartype")
+    assert match_for([CardRow("cartype", "探影", 310.0)], "大众新探影") == (None, None)
+
+
+def test_match_missing_price_falls_back_in_order():
+    rows = [
+        CardRow("cartype", "大众新探影", None),
+        CardRow("near", "大众新探影", 358.0),
+        CardRow("booking", "", 330.0, text="大众新探影 预订"),
+    ]
+    assert match_for(rows, "大众新探影") == (358.0, "near")
+    # 就近块也没有价格时，只有显式允许才用“预订”锚点块
+    rows[1].price = None
+    assert match_for(rows, "大众新探影") == (None, None)
+    assert match_for(rows, "大众新探影", include_booking=True) == (330.0, "booking")
+    assert price_for(rows, "丰田卡罗拉", include_booking=True) is None
+
+
+def page(*cards: dict, total: int, grew: bool = True) -> dict:
+    # HARVEST_JS 一轮的返回值
+    return {"rows": list(cards), "total": total, "grew": grew}
+
+
+def test_harvest_stops_when_cars_found_after_a_different_card():
+    h = Harvest(["大众新探影"])
+    assert h.args(1500, 150) == {"reset": True, "scroll": False, "idleMs": 1500, "quietMs": 150}
+    # 最后一张新卡片就是目标车型：同车型的其他取还方式可能紧随其后，继续滚
+    assert h.add(page(card("丰田卡罗拉", "250"), card("大众新探影", "420"), total=2))
+    assert h.args(1500, 150)["scroll"]
+    assert not h.add(page(card("大众新探影", "398"), card("本田思域", "300"), total=4))
+    assert h.stop_reason == "found" and h.scrolls == 1
+    assert price_for(h.rows, "大众新探影") == 398.0
+
+
+def test_harvest_stops_at_end_of_list():
+    h = Harvest(["大众新探影"])
+    assert h.add(page(card("丰田卡罗拉", "250"), total=1))
+    assert h.add(page(card("本田思域", "300"), total=1, grew=False))  # 虚拟列表：替换节点而不变长
+    assert not h.add(page(total=1, grew=False))
+    assert h.stop_reason == "end" and h.missing() == ["大众新探影"]
+
+
+def test_harvest_stops_at_scroll_limit():
+    h = Harvest(["大众新探影"], max_scrolls=2)
+    for i in range(2):
+        assert h.add(page(card(f"车型{i}", "100"), total=i + 1))
+    assert not h.add(page(card("车型2", "100"), total=3))
+    assert h.stop_reason == "limit" and h.scrolls == 2
+
+
+def test_harvest_stops_on_page_without_cards():
+    h = Harvest(["大众新探影"])
+    assert not h.add(page(total=0))
+    assert h.stop_reason == "empty"
+    assert not Harvest(["大众新探影"]).add(None)
+
+
+def test_full_harvest_does_not_stop_once_cars_are_found():
+    h = Harvest(["大众新探影"], full=True)
+    assert h.add(page(card("大众新探影", "398"), card("本田思域", "300"), total=2))
+    assert h.add(page(card("丰田卡罗拉", "250"), total=3))
+    assert not h.add(page(total=3, grew=False))
+    assert h.stop_reason == "end" and len(h.rows) == 3
+    assert h.summary() == "3 cards (3 on page) after 2 scrolls, stopped: end"
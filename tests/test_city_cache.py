@@ -0,0 +1,41 @@
+from src.city_cache import MAX_STRIKES, CityCache, route_confirmed, state_diff
+from src.payload import ResultsCapture
+
+
+def test_state_diff_keeps_changed_fields_only():
+    before = {"pickupcity": {"value": "", "attrs": {"title": ""}}, "other": {"value": "x", "attrs": {}}}
+    after = {
+        "pickupcity": {"value": "敦煌", "attrs": {"title": "敦煌", "data-id": "42"}},
+        "other": {"value": "x", "attrs": {}},
+        "name:cityId": {"value": "42", "attrs": {}},
+    }
+    assert state_diff(before, after) == {
+        "pickupcity": {"value": "敦煌", "attrs": {"title": "敦煌", "data-id": "42"}},
+        "name:cityId": {"value": "42", "attrs": {}},
+    }
+
+
+def test_cache_stops_after_repeated_strikes(tmp_path):
+    cache = CityCache(tmp_path / "cities.json")
+    state = {"pickupcity": {"value": "敦煌", "attrs": {}}}
+    cache.put("pickupcity", "敦煌", "site1", state)
+    assert cache.get("pickupcity", "敦煌", "site1") == state
+    assert cache.get("pickupcity", "敦煌", "site2") is None
+    for _ in range(MAX_STRIKES):
+        cache.invalidate("pickupcity", "敦煌")
+        cache.put("pickupcity", "敦煌", "site1", state)
+    assert cache.get("pickupcity", "敦煌", "site1") is None
+
+
+def test_route_confirmed_needs_both_cities():
+    assert route_confirmed(("敦煌", "德令哈"), ["敦煌 - 德令哈 10月04日"])
+    assert route_confirmed(("敦煌", "德令哈"), ['{"pickupCityName": "敦煌市"}', "cityTo=德令哈"])
+    assert not route_confirmed(("敦煌", "德令哈"), ["西宁 - 德令哈"])
+    assert not route_confirmed(("敦煌", "德令哈"), [])
+
+
+def test_capture_evidence_decodes_request_and_payload():
+    capture = ResultsCapture()
+    capture.add_payload("https://www.1hai.cn/api/car/queryCarList", {"city": "敦煌", "list": [{"name": "大众新探影", "price": 300}]})
+    capture.request = {"url": "https://www.1hai.cn/api/car/queryCarList?to=%E5%BE%B7%E4%BB%A4%E5%93%88", "post_data": None}
+    assert route_confirmed(("敦煌", "德令哈"), capture.evidence())
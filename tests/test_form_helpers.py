@@ -0,0 +1,17 @@
+from src.fetcher import month_delta
+
+
+def test_month_delta_forward_and_across_years():
+    assert month_delta("2025年10月", "2025-12-01") == 2
+    assert month_delta("2025年10月", "2026-01-05") == 3
+    assert month_delta("2025年10月", "2027-10-05") == 24
+
+
+def test_month_delta_backward():
+    assert month_delta("2026年2月", "2025-11-30") == -3
+
+
+def test_month_delta_unparsable_is_zero():
+    assert month_delta("2025年10月", "2025-10-31") == 0
+    assert month_delta("October", "2025-11-01") == 0
+    assert month_delta("2025年10月", "bad") == 0
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+
+from src.http_cache import DiskHttpCache, _ttl_from_headers
+
+DAY = 86400.0
+WEEK = 7 * DAY
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {"cache-control": "no-store"},
+        {"cache-control": "no-cache"},
+        {"cache-control": "private, no-cache, max-age=600"},
+        {"cache-control": "max-age=0"},
+        {"pragma": "no-cache"},
+        {"expires": formatdate(time.time() - 60, usegmt=True)},
+        {"expires": "0"},
+    ],
+)
+def test_uncacheable_responses(headers):
+    assert _ttl_from_headers(headers, DAY, WEEK) is None
+
+
+def test_max_age_wins_and_is_capped():
+    assert _ttl_from_headers({"cache-control": "public, max-age=600"}, DAY, WEEK) == 600
+    assert _ttl_from_headers({"cache-control": "max-age=31536000, immutable"}, DAY, WEEK) == WEEK
+
+
+def test_expires_in_the_future():
+    ttl = _ttl_from_headers({"expires": formatdate(time.time() + 3600, usegmt=True)}, DAY, WEEK)
+    assert 3500 < ttl <= 3600
+
+
+def test_default_ttl_only_without_caching_headers():
+    assert _ttl_from_headers({}, DAY, WEEK) == DAY
+    assert _ttl_from_headers({"cache-control": "public"}, DAY, WEEK) == DAY
+
+
+def test_put_skips_no_cache_responses(tmp_path):
+    cache = DiskHttpCache(tmp_path)
+    assert not cache.put("https://www.1hai.cn/a.js", 200, {"Cache-Control": "no-cache"}, b"x")
+    assert cache.put("https://www.1hai.cn/b.js", 200, {"Cache-Control": "max-age=60"}, b"x")
+    assert cache.size == 1
+
+
+class FakeRequest:
+    method = "GET"
+    resource_type = "script"
+    url = "https://www.1hai.cn/static/app.js"
+
+
+class FailingRoute:
+    # route.fetch() 抛错（网络错误 / 页面已关闭）
+    request = FakeRequest()
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    def fetch(self):
+        self.calls.append("fetch")
+        raise RuntimeError("net::ERR_CONNECTION_RESET")
+
+    def fallback(self):
+        self.calls.append("fallback")
+
+    def fulfill(self, **kwargs):
+        self.calls.append("fulfill")
+
+
+class AsyncFailingRoute(FailingRoute):
+    async def fetch(self):
+        return super().fetch()
+
+    async def fallback(self):
+        super().fallback()
+
+    async def fulfill(self, **kwargs):
+        super().fulfill(**kwargs)
+
+
+def test_failed_fetch_falls_back(tmp_path):
+    cache = DiskHttpCache(tmp_path)
+    route = FailingRoute()
+    cache.handle(route)
+    assert route.calls == ["fetch", "fallback"]
+    assert cache.size == 0
+
+
+def test_failed_fetch_falls_back_async(tmp_path):
+    cache = DiskHttpCache(tmp_path)
+    route = AsyncFailingRoute()
+    asyncio.run(cache.handle_async(route))
+    assert route.calls == ["fetch", "fallback"]
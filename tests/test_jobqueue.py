@@ -0,0 +1,189 @@
+import time
+from dataclasses import replace
+
+import pytest
+
+from src import async_fetcher
+from src.jobqueue import RETRY_BASE_SECONDS, Job, JobQueue, Worker, dispatch
+from src.watches import SearchKey
+
+SEARCH = SearchKey("敦煌", "德令哈", "2025-10-04", "2025-10-08")
+OTHER = SearchKey("敦煌", "德令哈", "2025-10-05", "2025-10-08")
+
+
+@pytest.fixture
+def queue(tmp_path):
+    with JobQueue(tmp_path / "jobs.db", lease_seconds=30, max_attempts=2) as q:
+        yield q
+
+
+def state(q: JobQueue, job_id: int) -> tuple:
+    return q.conn.execute("SELECT state, worker, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def expire(q: JobQueue, job_id: int) -> None:
+    # 模拟 worker 被杀：租期提前到过去
+    q.conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+
+
+def make_available(q: JobQueue, job_id: int) -> None:
+    q.conn.execute("UPDATE jobs SET available_ts = ? WHERE id = ?", (time.time() - 1, job_id))
+
+
+def test_enqueue_merges_cars_into_queued_job(queue):
+    a = queue.enqueue(SEARCH, ["大众新探影"])
+    b = queue.enqueue(SEARCH, ["丰田卡罗拉", "大众新探影"])
+    assert a == b
+    assert queue.enqueue(OTHER, ["大众新探影"]) != a
+    [job] = [j for j in queue.lease("w1", 5) if j.id == a]
+    assert job.cars == ["大众新探影", "丰田卡罗拉"]
+
+
+def test_enqueue_reuses_running_job_that_covers_the_cars(queue):
+    a = queue.enqueue(SEARCH, ["大众新探影", "丰田卡罗拉"])
+    queue.lease("w1")
+    assert queue.enqueue(SEARCH, ["大众新探影"]) == a
+    # 正在执行的任务不含新车型：另排一条
+    b = queue.enqueue(SEARCH, ["本田思域"])
+    assert b != a
+    assert state(queue, b)[0] == "queued"
+
+
+def test_enqueue_does_not_reuse_expired_lease(queue):
+    a = queue.enqueue(SEARCH, ["大众新探影"])
+    queue.lease("w1")
+    expire(queue, a)
+    assert queue.enqueue(SEARCH, ["大众新探影"]) != a
+
+
+def test_lease_is_exclusive_and_honours_limit(queue):
+    ids = [queue.enqueue(SearchKey("敦煌", "德令哈", f"2025-10-0{d}", "2025-10-09"), ["大众新探影"]) for d in range(1, 4)]
+    first = queue.lease("w1", 2)
+    second = queue.lease("w2", 5)
+    assert [j.id for j in first] == ids[:2]
+    assert [j.id for j in second] == ids[2:]
+    assert queue.lease("w3", 5) == []
+    assert state(queue, ids[0]) == ("leased", "w1", 1)
+
+
+def test_heartbeat_keeps_the_lease(queue):
+    a = queue.enqueue(SEARCH, ["大众新探影"])
+    queue.lease("w1")
+    expire(queue, a)
+    assert queue.heartbeat("w1", [a]) == [a]
+    assert queue.lease("w2") == []
+    assert queue.heartbeat("w2", [a]) == []
+
+
+def test_expired_lease_is_redelivered_and_old_result_dropped(queue):
+    a = queue.enqueue(SEARCH, ["大众新探影"])
+    queue.lease("w1")
+    expire(queue, a)
+    [job] = queue.lease("w2")
+    assert job.id == a and job.attempts == 2
+    assert queue.heartbeat("w1", [a]) == []
+    assert not queue.complete("w1", a, {"大众新探影": 100.0})
+    assert queue.complete("w2", a, {"大众新探影": 200.0})
+    assert queue.results([a])[a].prices == {"大众新探影": 200.0}
+
+
+def test_expired_lease_fails_after_max_attempts(queue):
+    a = queue.enqueue(SEARCH, ["大众新探影"])
+    for worker in ("w1", "w2"):
+        queue.lease(worker)
+        expire(queue, a)
+    assert queue.lease("w3") == []
+    r = queue.results([a])[a]
+    assert r.state == "failed" and "lease expired" in r.error
+
+
+def test_fail_retries_with_backoff_then_fails(queue):
+    a = queue.enqueue(SEARCH, ["大众新探影"])
+    queue.lease("w1")
+    before = time.time()
+    queue.fail("w1", a, "timeout")
+    available = queue.conn.execute("SELECT available_ts FROM jobs WHERE id = ?", (a,)).fetchone()[0]
+    assert available >= before + RETRY_BASE_SECONDS
+    assert state(queue, a) == ("queued", None, 1)
+    assert queue.lease("w1") == []
+    make_available(queue, a)
+    [job] = queue.lease("w2")
+    queue.fail("w2", a, "timeout again")
+    r = queue.results([a])[a]
+    assert r.state == "failed" and r.error == "timeout again"
+
+
+def test_release_requeues_without_counting_attempt(queue):
+    a = queue.enqueue(SEARCH, ["大众新探影"])
+    queue.lease("w1")
+    queue.release("w2", [a])
+    assert state(queue, a)[0] == "leased"
+    queue.release("w1", [a])
+    assert state(queue, a) == ("queued", None, 0)
+    assert [j.id for j in queue.lease("w2")] == [a]
+
+
+def test_dispatch_times_out_then_collects_late_result(queue):
+    first = dispatch(queue, {SEARCH: ["大众新探影"]}, timeout=0)
+    assert isinstance(first[SEARCH], TimeoutError)
+    [job] = queue.lease("w1")
+    # 下一轮时任务仍在执行：复用同一条，不再重复排队
+    again = dispatch(queue, {SEARCH: ["大众新探影"]}, timeout=0)
+    assert isinstance(again[SEARCH], TimeoutError)
+    assert queue.stats()["queued"] == 0
+    assert queue.complete("w1", job.id, {"大众新探影": 300.0})
+    # 迟到的结果在下一轮直接收取
+    assert dispatch(queue, {SEARCH: ["大众新探影"]}, timeout=60) == {SEARCH: {"大众新探影": 300.0}}
+    # 已收取过的结果不会再次使用
+    assert isinstance(dispatch(queue, {SEARCH: ["大众新探影"]}, timeout=0)[SEARCH], TimeoutError)
+    assert queue.stats()["queued"] == 1
+
+
+def test_dispatch_refetches_when_late_job_failed(queue):
+    dispatch(queue, {SEARCH: ["大众新探影"]}, timeout=0)
+    [job] = queue.lease("w1")
+    queue.fail("w1", job.id, "boom")
+    make_available(queue, job.id)
+    queue.lease("w1")
+    queue.fail("w1", job.id, "boom")
+    out = dispatch(queue, {SEARCH: ["大众新探影"]}, timeout=0)
+    # 已失败的任务不再复用：新排一条
+    assert isinstance(out[SEARCH], TimeoutError)
+    assert queue.stats()["queued"] == 1 and queue.stats()["failed"] == 1
+
+
+def lease_until(q: JobQueue, job_id: int) -> float:
+    return q.conn.execute("SELECT lease_until FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+
+def test_worker_stops_renewing_hung_jobs(settings, queue):
+    worker = Worker(settings, queue, worker_id="w1")
+    a = queue.enqueue(SEARCH, ["大众新探影"])
+    b = queue.enqueue(OTHER, ["大众新探影"])
+    queue.lease("w1", 2)
+    for job_id in (a, b):
+        expire(queue, job_id)
+    # a 还在期限内，b 已超过单条任务的最长执行时间
+    worker._held = {a: time.monotonic() + 60, b: time.monotonic() - 1}
+    worker._renew()
+    assert lease_until(queue, a) > time.time()
+    assert lease_until(queue, b) < time.time()
+    assert worker._overdue == {b}
+    assert [j.id for j in queue.lease("w2")] == [b]
+
+
+def test_async_batch_merges_cars_of_jobs_for_the_same_search(settings, queue, monkeypatch):
+    seen = []
+
+    def fake_get_prices_sync(searches, settings):
+        seen.append({k: list(v) for k, v in searches.items()})
+        return {SEARCH: {"大众新探影": 300.0, "丰田卡罗拉": 250.0}, OTHER: RuntimeError("boom")}
+
+    monkeypatch.setattr(async_fetcher, "get_prices_sync", fake_get_prices_sync)
+    worker = Worker(replace(settings, fetch_engine="async"), queue, worker_id="w1")
+    jobs = [Job(1, SEARCH, ["大众新探影"], 2), Job(2, SEARCH, ["丰田卡罗拉"], 1), Job(3, OTHER, ["大众新探影"], 1)]
+    out = worker._fetch(jobs)
+    assert seen == [{SEARCH: ["大众新探影", "丰田卡罗拉"], OTHER: ["大众新探影"]}]
+    assert out[1] == {"大众新探影": 300.0}
+    assert out[2] == {"丰田卡罗拉": 250.0}
+    assert isinstance(out[3], RuntimeError)
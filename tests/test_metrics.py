@@ -0,0 +1,74 @@
+import urllib.request
+
+from src.metrics import MetricsFileWriter, MetricsServer, Registry
+
+
+def test_counter_and_gauge_render_sorted_escaped_labels():
+    reg = Registry()
+    c = reg.counter("t_events_total", "Events")
+    c.inc(result="ok")
+    c.inc(2, result="ok")
+    c.inc(result='say "hi"\\\n')
+    g = reg.gauge("t_depth", "Depth")
+    g.set(3, state="queued")
+    g.set(1.5, state="leased")
+    assert reg.render().splitlines() == [
+        "# HELP t_events_total Events",
+        "# TYPE t_events_total counter",
+        't_events_total{result="ok"} 3',
+        't_events_total{result="say \\"hi\\"\\\\\\n"} 1',
+        "# HELP t_depth Depth",
+        "# TYPE t_depth gauge",
+        't_depth{state="leased"} 1.5',
+        't_depth{state="queued"} 3',
+    ]
+    assert c.value(result="ok") == 3
+    assert reg.counter("t_events_total", "ignored") is c
+
+
+def test_unlabelled_counter():
+    reg = Registry()
+    reg.counter("t_total", "Total").inc()
+    assert reg.render() == "# HELP t_total Total\n# TYPE t_total counter\nt_total 1\n"
+
+
+def test_histogram_buckets_are_cumulative():
+    reg = Registry()
+    h = reg.histogram("t_seconds", "Latency", buckets=(1.0, 0.5))
+    for v in (0.2, 0.7, 3.0):
+        h.observe(v, phase="search")
+    assert h.count(phase="search") == 3
+    assert reg.render().splitlines() == [
+        "# HELP t_seconds Latency",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{phase="search",le="0.5"} 1',
+        't_seconds_bucket{phase="search",le="1"} 2',
+        't_seconds_bucket{phase="search",le="+Inf"} 3',
+        't_seconds_sum{phase="search"} 3.900000',
+        't_seconds_count{phase="search"} 3',
+    ]
+
+
+def test_file_writer_replaces_file_atomically(tmp_path):
+    reg = Registry()
+    c = reg.counter("t_total", "Total")
+    path = tmp_path / "sub" / "metrics.prom"
+    writer = MetricsFileWriter(path, registry=reg)
+    writer.write()
+    assert path.read_text(encoding="utf-8") == "# HELP t_total Total\n# TYPE t_total counter\n"
+    c.inc()
+    writer.write()
+    assert path.read_text(encoding="utf-8") == reg.render()
+    assert [p.name for p in path.parent.iterdir()] == ["metrics.prom"]
+
+
+def test_server_serves_registry():
+    reg = Registry()
+    reg.counter("t_total", "Total").inc(4)
+    server = MetricsServer(0, registry=reg).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert resp.read().decode("utf-8") == reg.render()
+    finally:
+        server.close()
@@ -0,0 +1,65 @@
+import gzip
+import json
+
+from src.obslog import Compactor, RunLengthEncoder, compact_lines
+
+
+T0 = 1_759_000_000
+
+
+def obs(ts: int, price: float, watch_id: str = "w1", **extra) -> dict:
+    # ts 为相对 T0 的秒数
+    return {"ts": T0 + ts, "watch_id": watch_id, "car_name": "大众新探影", "pickup_date": "2025-10-04", "price": price, **extra}
+
+
+def events(rows: list[dict]) -> list[tuple]:
+    return [(r["event"], r["ts"] - T0, r["price"], r.get("count")) for r in rows]
+
+
+def test_unchanged_prices_collapse_into_heartbeats():
+    enc = RunLengthEncoder(heartbeat_seconds=100)
+    out = []
+    for ts in (0, 10, 20, 110, 120):
+        out += enc.observe(obs(ts, 300.0))
+    out += enc.flush()
+    assert events(out) == [("change", 0, 300.0, None), ("heartbeat", 110, 300.0, 3), ("heartbeat", 120, 300.0, 1)]
+
+
+def test_price_change_closes_the_previous_run():
+    enc = RunLengthEncoder(heartbeat_seconds=3600)
+    out = enc.observe(obs(0, 300.0)) + enc.observe(obs(10, 300.0)) + enc.observe(obs(20, 280.0))
+    assert events(out) == [("change", 0, 300.0, None), ("heartbeat", 10, 300.0, 1), ("change", 20, 280.0, None)]
+    assert enc.flush() == []
+
+
+def test_changed_search_is_a_new_run_and_watches_are_independent():
+    enc = RunLengthEncoder(heartbeat_seconds=3600)
+    enc.observe(obs(0, 300.0))
+    enc.observe(obs(0, 500.0, watch_id="w2"))
+    out = enc.observe(obs(10, 300.0, pickup_date="2025-10-05"))
+    assert events(out) == [("change", 10, 300.0, None)]
+    assert enc.observe(obs(10, 500.0, watch_id="w2")) == []
+
+
+def test_compaction_is_idempotent_and_merges_full_records():
+    legacy = [json.dumps(obs(ts, 300.0), ensure_ascii=False) for ts in (0, 10, 20)] + ["not json"]
+    once = list(compact_lines(legacy, heartbeat_seconds=3600))
+    assert [json.loads(line)["event"] for line in once[:1]] == ["change"]
+    assert "not json" in once
+    assert json.loads(once[-1]) == {"ts": T0 + 20, "watch_id": "w1", "event": "heartbeat", "price": 300.0, "count": 2}
+    assert list(compact_lines(once, heartbeat_seconds=3600)) == once
+
+
+def test_compactor_archives_segments(tmp_path):
+    log = tmp_path / "price_observations.jsonl"
+    segment = tmp_path / "price_observations.jsonl.20251004-120000-0"
+    segment.write_text("\n".join(json.dumps(obs(ts, 300.0)) for ts in range(0, 100, 10)) + "\n", encoding="utf-8")
+    compactor = Compactor(log, heartbeat_seconds=3600, interval_seconds=60)
+    assert compactor.segments() == [segment]
+    compactor.run_once()
+    assert not segment.exists()
+    (archive,) = (tmp_path / "archive").glob("*.jsonl.gz")
+    with gzip.open(archive, "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert [r["event"] for r in rows] == ["change", "heartbeat"]
+    assert rows[-1]["count"] == 9
@@ -0,0 +1,54 @@
+import sqlite3
+import threading
+
+import pytest
+
+from src.outbox import Outbox, PriceChange
+
+
+class SlowSmtp:
+    def __init__(self) -> None:
+        self.sending = threading.Event()
+        self.release = threading.Event()
+        self.sent = []
+        self.closed = 0
+
+    def send(self, msg) -> None:
+        self.sending.set()
+        assert self.release.wait(5)
+        self.sent.append(msg)
+
+    def close(self) -> None:
+        self.closed += 1
+
+
+def test_close_waits_for_sender_before_releasing_connections(settings, tmp_path):
+    outbox = Outbox(settings, path=tmp_path / "outbox.db", batch_seconds=0.0)
+    smtp = outbox._smtp = SlowSmtp()
+    outbox.enqueue(PriceChange.of(settings, "w1", 300.0, 250.0))
+    outbox.start()
+    assert smtp.sending.wait(5)
+    thread = outbox._thread
+
+    outbox.close(flush_timeout=0.05)
+    # 后台线程仍在发信：连接必须保持可用
+    assert smtp.closed == 0
+    outbox.conn.execute("SELECT 1")
+
+    smtp.release.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert len(smtp.sent) == 1
+    assert smtp.closed == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        outbox.conn.execute("SELECT 1")
+
+
+def test_close_releases_connections_when_idle(settings, tmp_path):
+    outbox = Outbox(settings, path=tmp_path / "outbox.db")
+    smtp = outbox._smtp = SlowSmtp()
+    outbox.start()
+    outbox.close()
+    assert smtp.closed == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        outbox.conn.execute("SELECT 1")
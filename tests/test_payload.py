@@ -0,0 +1,72 @@
+import re
+
+from src.config import DEFAULT_RESULTS_API_PATTERN
+from src.payload import ResultsCapture, extract_offers, min_price_for
+
+
+def test_flat_list_of_cars():
+    payload = {"data": {"list": [
+        {"carTypeName": "大众新探影", "dailyPrice": 698, "pickupMode": "到店取还"},
+        {"carTypeName": "丰田卡罗拉", "dailyPrice": "¥1,280"},
+    ]}}
+    offers = extract_offers(payload)
+    assert {(o.name, o.price) for o in offers} == {("大众新探影", 698.0), ("丰田卡罗拉", 1280.0)}
+    assert min_price_for(offers, "大众新探影") == 698.0
+
+
+def test_price_list_children_inherit_the_car_name():
+    payload = {"cars": [{"name": "大众新探影", "prices": [
+        {"pickupMode": "到店", "price": {"current": 698}},
+        {"pickupMode": "送车上门", "dailyPrice": 758},
+    ]}]}
+    offers = extract_offers(payload)
+    assert sorted(o.price for o in offers) == [698.0, 758.0]
+    assert {o.pickup_mode for o in offers} == {"到店", "送车上门"}
+
+
+def test_fee_and_insurance_children_are_not_offers():
+    payload = {"cars": [{
+        "name": "大众新探影",
+        "dailyPrice": 698,
+        "insurance": {"amount": 120},
+        "fees": [{"amount": 40}, {"totalPrice": 50}],
+        "coupon": {"price": 30},
+    }]}
+    offers = extract_offers(payload)
+    assert [(o.name, o.price) for o in offers] == [("大众新探影", 698.0)]
+    assert min_price_for(offers, "大众新探影") == 698.0
+
+
+def test_inherited_children_ignore_total_and_amount():
+    payload = {"name": "大众新探影", "prices": [{"totalPrice": 2792}, {"amount": 99}, {"avgPrice": 698}]}
+    offers = extract_offers(payload)
+    assert min_price_for(offers, "大众新探影") == 698.0
+    assert sorted(o.price for o in offers) == [698.0]
+
+
+def test_small_values_are_not_prices():
+    assert extract_offers({"name": "大众新探影", "price": 5}) == []
+
+
+def test_add_payload_without_offers():
+    capture = ResultsCapture()
+    assert not capture.add_payload("https://www.1hai.cn/api/city", {"cities": ["敦煌"]})
+    assert capture.price_for("大众新探影") is None
+
+
+def test_default_results_api_pattern():
+    pattern = re.compile(DEFAULT_RESULTS_API_PATTERN)
+    for url in (
+        "https://www.1hai.cn/api/order/carTypeList?x=1",
+        "https://m.1hai.cn/firstStep/searchCar",
+        "https://www.1hai.cn/api/QueryVehicles",
+    ):
+        assert pattern.search(url), url
+    for url in (
+        "https://www.1hai.cn/api/city/list",
+        "https://www.1hai.cn/api/insurance/getPrice",
+        "https://www.1hai.cn/static/carousel/banner.json",
+        "https://www.1hai.cn/carpics/list?store=1",
+        "https://example.com/carTypeList",
+    ):
+        assert not pattern.search(url), url
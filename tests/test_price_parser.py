@@ -0,0 +1,51 @@
+import pytest
+
+from src.parse_bench import CORPUS, accuracy, load_corpus
+from src.price_parser import best_price, find_prices, parse_price_from_text, parse_prices
+
+
+@pytest.mark.parametrize(
+    "text, price",
+    [
+        ("¥298 日均", 298.0),
+        ("￥1500/天", 1500.0),
+        ("RMB 1,280.50", 1280.5),
+        ("日均 356元", 356.0),
+        ("268 / 日均", 268.0),
+        ("1.2T 5座 自动挡", None),
+        ("¥9 保险", None),
+        ("", None),
+    ],
+)
+def test_parse_price_from_text(text, price):
+    assert parse_price_from_text(text) == price
+
+
+def test_currency_beats_context():
+    assert parse_price_from_text("300天 ¥268") == 268.0
+    assert best_price(find_prices("300天 ¥268")) == 268.0
+
+
+def test_batch_matches_single_parse():
+    texts = ["¥298 日均", "1.2T 5座", "日均 356元", "￥1,500"]
+    assert parse_prices(texts) == [parse_price_from_text(t) for t in texts]
+
+
+def test_candidates_keep_position_and_context():
+    currency, context = find_prices("大众新探影 ¥298 日均")
+    assert (currency.value, currency.kind, currency.plausible) == (298.0, "currency", True)
+    assert (currency.start, currency.end) == (6, 10)
+    assert currency.context == "大众新探影 ¥298 日均"
+    assert (context.value, context.kind) == (298.0, "context")
+    assert not find_prices("¥9")[0].plausible
+
+
+# 语料中单靠文本解析排除不了的已知误报（如“30天无理由取消”、上门费），这里只防止变多
+KNOWN_FALSE_POSITIVES = 4
+
+
+@pytest.mark.skipif(not CORPUS.is_file(), reason="labelled corpus not present")
+def test_labelled_corpus_does_not_regress():
+    report = accuracy(load_corpus(CORPUS))
+    assert report["misses"] == []
+    assert len(report["false_positives"]) <= KNOWN_FALSE_POSITIVES
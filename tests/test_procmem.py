@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src import watchdog
+from src.procmem import children_pss_bytes, children_rss_bytes, is_playwright_chromium, launched_chromium, orphan_chromium, pss_bytes, start_time
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/proc/self"), reason="needs /proc")
+
+
+@pytest.fixture
+def fake_chromium(tmp_path):
+    # 以 chrome 为进程名的子进程，父进程不是 Playwright 驱动（相当于驱动已退出）
+    exe = tmp_path / "chrome"
+    exe.symlink_to(sys.executable)
+    procs = []
+
+    def spawn(*flags: str) -> subprocess.Popen:
+        proc = subprocess.Popen([str(exe), "-c", "import time; time.sleep(30)", *flags])
+        procs.append(proc)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and start_time(proc.pid) is None:
+            time.sleep(0.01)
+        return proc
+
+    yield spawn
+    for proc in procs:
+        proc.kill()
+        proc.wait()
+
+
+PLAYWRIGHT_FLAGS = ("--remote-debugging-pipe", "--user-data-dir=/tmp/playwright_chromiumdev_profile-abc123")
+
+
+def test_only_playwright_launched_chromium_is_recognised(fake_chromium):
+    ours = fake_chromium(*PLAYWRIGHT_FLAGS)
+    users = fake_chromium("--user-data-dir=/home/me/.config/chromium")
+    assert is_playwright_chromium(ours.pid)
+    assert not is_playwright_chromium(users.pid)
+    launched = launched_chromium()
+    assert ours.pid in launched
+    assert users.pid not in launched
+
+
+def test_orphans_are_limited_to_known_processes(fake_chromium):
+    ours = fake_chromium(*PLAYWRIGHT_FLAGS)
+    other = fake_chromium(*PLAYWRIGHT_FLAGS)
+    known = {ours.pid: start_time(ours.pid)}
+    assert orphan_chromium(known) == [ours.pid]
+    # pid 被复用（启动时刻不同）时不认
+    assert orphan_chromium({ours.pid: known[ours.pid] - 1}) == []
+    assert other.poll() is None
+
+
+def test_kill_orphans_kills_only_tracked_browsers(fake_chromium, monkeypatch):
+    monkeypatch.setattr(watchdog, "_launched", {})
+    ours = fake_chromium(*PLAYWRIGHT_FLAGS)
+    watchdog.track_launched()
+    users = fake_chromium("--user-data-dir=/home/me/.config/chromium")
+    late = fake_chromium(*PLAYWRIGHT_FLAGS)
+    assert watchdog.kill_orphans(grace_seconds=1) == [ours.pid]
+    assert ours.wait(5) is not None
+    assert users.poll() is None
+    assert late.poll() is None
+    assert watchdog.kill_orphans() == []
+
+
+@pytest.mark.skipif(pss_bytes(os.getpid()) is None, reason="needs /proc/<pid>/smaps_rollup")
+def test_children_pss_counts_shared_pages_once(fake_chromium):
+    # 两个同一可执行文件的子进程共享代码页：PSS 之和小于 RSS 之和
+    fake_chromium()
+    fake_chromium()
+    time.sleep(0.2)
+    pss, rss = children_pss_bytes(), children_rss_bytes()
+    assert 0 < pss < rss
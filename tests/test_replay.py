@@ -0,0 +1,56 @@
+from dataclasses import replace
+
+from src.replay import Replayer, _search_key, substitute_dates
+
+OLD = ("2025-10-04", "2025-10-08")
+
+
+def test_substitute_dates_is_a_single_pass():
+    # 新取车日等于原还车日：逐个替换会把取车日再换一次
+    assert substitute_dates("pickup=2025-10-04&return=2025-10-08", OLD, ("2025-10-08", "2025-10-12")) == "pickup=2025-10-08&return=2025-10-12"
+    assert substitute_dates("a=2025-10-08&b=2025-10-04", OLD, ("2025-10-08", "2025-10-04")) == "a=2025-10-04&b=2025-10-08"
+
+
+def test_substitute_dates_handles_all_formats():
+    text = '{"from": "2025/10/04", "to": "2025-10-08"}'
+    assert substitute_dates(text, OLD, ("2025-11-01", "2025-11-03")) == '{"from": "2025/11/01", "to": "2025-11-03"}'
+
+
+def test_substitute_dates_needs_both_dates():
+    assert substitute_dates("pickup=2025-10-04&days=4", OLD, ("2025-11-01", "2025-11-05")) is None
+    assert substitute_dates("no dates", OLD, ("2025-11-01", "2025-11-05")) is None
+    assert substitute_dates("no dates", OLD, OLD) == "no dates"
+
+
+def test_substitute_dates_refuses_ambiguous_same_day_template():
+    assert substitute_dates("d=2025-10-04", ("2025-10-04", "2025-10-04"), ("2025-11-01", "2025-11-02")) is None
+
+
+class FailingHttp:
+    def __init__(self) -> None:
+        self.urls = []
+
+    def request(self, method, url, headers, body):
+        self.urls.append(url)
+        return 500, None, b""
+
+    def close(self) -> None:
+        pass
+
+
+def test_failed_fallback_keeps_the_borrowed_template(settings, tmp_path):
+    replayer = Replayer(tmp_path / "replay.json")
+    replayer.http = FailingHttp()
+    first = replace(settings, pickup_date=OLD[0], return_date=OLD[1])
+    request = {"method": "GET", "url": f"https://www.1hai.cn/api/car/queryCarList?from={OLD[0]}&to={OLD[1]}", "headers": {}}
+    replayer.remember(first, request, [])
+
+    other = replace(settings, pickup_date="2025-10-08", return_date="2025-10-12")
+    assert replayer.fetch_offers(other) == ("error", None)
+    assert replayer.http.urls == ["https://www.1hai.cn/api/car/queryCarList?from=2025-10-08&to=2025-10-12"]
+    assert replayer._template(first) is not None
+
+    # 模板自己的查询失败：删除
+    assert replayer.fetch_offers(first) == ("error", None)
+    assert replayer._template(first) is None
+    assert _search_key(first) not in replayer._data
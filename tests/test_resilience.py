@@ -0,0 +1,58 @@
+import logging
+
+from src.resilience import CircuitBreaker
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_after_threshold_and_backs_off():
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=2, cooldown_seconds=100, max_cooldown_seconds=300, clock=clock)
+    assert breaker.record("w", False) is None
+    assert breaker.allow("w")
+    assert breaker.record("w", False) == 100
+    assert not breaker.allow("w")
+    assert breaker.remaining("w") == 100
+    clock.now = 100
+    assert breaker.allow("w")
+    # 冷却后的试探再次失败：冷却时间翻倍，上限 max_cooldown_seconds
+    assert breaker.record("w", False) == 200
+    clock.now = 300
+    assert breaker.record("w", False) == 300
+
+
+def test_success_resets_the_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=2, cooldown_seconds=100, clock=clock)
+    breaker.record("w", False)
+    breaker.record("w", False)
+    clock.now = 100
+    assert breaker.record("w", True) is None
+    assert breaker.open_count() == 0
+    assert breaker.record("w", False) is None
+
+
+def test_threshold_zero_disables():
+    breaker = CircuitBreaker(threshold=0)
+    for _ in range(5):
+        assert breaker.record("w", False) is None
+    assert breaker.allow("w")
+
+
+def test_sold_out_is_not_a_failure():
+    import run
+    from src.watches import SearchKey, Watch
+
+    search = SearchKey("敦煌", "德令哈", "2025-10-04", "2025-10-08")
+    sold_out, broken = Watch("a", "car", search, None), Watch("b", "car", search, None)
+    breaker = CircuitBreaker(threshold=1, clock=Clock())
+    # 查询成功但没有价格的 watch 在结果里（值为 None），查询出错的 watch 不在结果里
+    run._record_breaker(breaker, [sold_out, broken], {"a": None}, logging.getLogger("test"))
+    assert breaker.allow("a")
+    assert not breaker.allow("b")
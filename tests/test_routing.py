@@ -0,0 +1,128 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+
+from src.config import Settings
+from src.routing import RequestBlocker, blocker_from_settings
+
+
+@pytest.fixture
+def blocker():
+    return RequestBlocker()
+
+
+@pytest.mark.parametrize(
+    "url, resource_type",
+    [
+        ("https://www.1hai.cn/api/car/list", "xhr"),
+        ("https://www.1hai.cn/api/city?keyword=敦煌", "fetch"),
+        ("https://www.1hai.cn/", "document"),
+        ("https://www.1hai.cn/static/app.css", "stylesheet"),
+        # 站内脚本走白名单，即使 URL 里带统计关键字也放行
+        ("https://www.1hai.cn/static/sensorsdata.min.js?v=3", "script"),
+    ],
+)
+def test_site_requests_are_allowed(blocker, url, resource_type):
+    assert not blocker.should_block(url, resource_type)
+
+
+@pytest.mark.parametrize(
+    "url, resource_type",
+    [
+        ("https://img.1hai.cn/car/123.png", "image"),
+        ("https://www.1hai.cn/static/iconfont.woff2", "font"),
+        ("https://www.1hai.cn/static/banner.mp4", "media"),
+        ("https://hm.baidu.com/hm.js?abc", "script"),
+        ("https://www.google-analytics.com/collect?v=1", "ping"),
+        ("https://static.sensorsdata.cn/sdk/sa.js", "script"),
+    ],
+)
+def test_media_fonts_and_analytics_are_blocked(blocker, url, resource_type):
+    assert blocker.should_block(url, resource_type)
+
+
+def test_allowlist_wins_over_block_rules():
+    blocker = RequestBlocker(block_types=("image",), block_patterns=(r"cdn\.",), allow_patterns=(r"cdn\.1hai\.cn/captcha",))
+    assert not blocker.should_block("https://cdn.1hai.cn/captcha/img.png", "image")
+    assert blocker.should_block("https://cdn.1hai.cn/other.png", "image")
+    assert blocker.should_block("https://cdn.example.com/x.json", "xhr")
+
+
+class FakeRequest:
+    def __init__(self, url: str, resource_type: str) -> None:
+        self.url = url
+        self.resource_type = resource_type
+
+
+class FakeRoute:
+    def __init__(self, url: str, resource_type: str) -> None:
+        self.request = FakeRequest(url, resource_type)
+        self.calls: list[str] = []
+
+    def abort(self):
+        self.calls.append("abort")
+
+    def fallback(self):
+        self.calls.append("fallback")
+
+
+class AsyncFakeRoute(FakeRoute):
+    async def abort(self):
+        super().abort()
+
+    async def fallback(self):
+        super().fallback()
+
+
+def test_handle_aborts_blocked_and_falls_back_otherwise(blocker):
+    # 放行的请求用 fallback 交给 context 级路由（磁盘缓存、离线基准转发），不直接 continue_
+    routes = [FakeRoute("https://img.1hai.cn/a.png", "image"), FakeRoute("https://www.1hai.cn/api/car/list", "xhr")]
+    for route in routes:
+        blocker.handle(route)
+    assert [r.calls for r in routes] == [["abort"], ["fallback"]]
+    stats = blocker.reset()
+    assert (stats.requests, stats.blocked) == (2, 1)
+    assert blocker.stats.requests == 0
+
+
+def test_handle_async(blocker):
+    routes = [AsyncFakeRoute("https://hm.baidu.com/hm.gif", "image"), AsyncFakeRoute("https://www.1hai.cn/", "document")]
+
+    async def run():
+        for route in routes:
+            await blocker.handle_async(route)
+
+    asyncio.run(run())
+    assert [r.calls for r in routes] == [["abort"], ["fallback"]]
+    assert blocker.stats.summary() == "requests=2 blocked=1 bytes=0.0KB"
+
+
+class SizedRequest:
+    def __init__(self, body: int, headers: int) -> None:
+        self._sizes = {"responseBodySize": body, "responseHeadersSize": headers}
+
+    def sizes(self):
+        return self._sizes
+
+
+class BrokenRequest:
+    def sizes(self):
+        raise RuntimeError("target closed")
+
+
+def test_collect_bytes_sums_finished_requests(blocker):
+    for req in (SizedRequest(1000, 24), BrokenRequest(), SizedRequest(0, 0)):
+        blocker.on_finished(req)
+    assert blocker.collect_bytes().bytes == 1024
+    assert blocker.stats.finished == []
+
+
+def test_blocker_from_settings(settings, monkeypatch):
+    assert blocker_from_settings(replace(settings, block_requests=False)) is None
+    monkeypatch.setenv("BLOCK_RESOURCE_TYPES", "image, font")
+    monkeypatch.setenv("ALLOW_URL_PATTERNS", r"img\.1hai\.cn/logo")
+    blocker = blocker_from_settings(Settings.from_env())
+    assert blocker.block_types == {"image", "font"}
+    assert not blocker.should_block("https://img.1hai.cn/logo.png", "image")
+    assert not blocker.should_block("https://www.1hai.cn/a.mp4", "media")
@@ -0,0 +1,99 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from src.config import EHI_TZ
+from src.scheduler import AdaptiveScheduler, days_to_pickup, error_factor, pickup_factor, volatility_factor
+from src.watches import SearchKey, Watch
+
+TODAY = date(2025, 10, 1)
+
+
+def start() -> float:
+    # 新建的调度器中所有查询以创建时刻到期
+    return time.time() + 1
+
+
+def in_days(days: int) -> str:
+    return (datetime.now(ZoneInfo(EHI_TZ)).date() + timedelta(days=days)).isoformat()
+
+
+def watch(watch_id: str, days: int = 14) -> Watch:
+    search = SearchKey("上海", "上海", in_days(days), in_days(days + 5))
+    return Watch(id=watch_id, car_name="car", search=search, alert_price=None)
+
+
+def test_days_to_pickup():
+    assert days_to_pickup("2025-10-04", TODAY) == 3
+    assert days_to_pickup("not-a-date", TODAY) is None
+
+
+def test_pickup_factor_tightens_close_to_pickup():
+    assert pickup_factor(None) == 1.0
+    assert pickup_factor(-1) == float("inf")
+    assert pickup_factor(1) < pickup_factor(3) < pickup_factor(7) < pickup_factor(14) < pickup_factor(60)
+
+
+def test_volatility_factor():
+    assert volatility_factor([100.0, 100.0]) == 1.0
+    assert volatility_factor([100.0] * 5) == 1.5
+    assert volatility_factor([100.0] * 12) == 2.0
+    assert volatility_factor([100.0, 110.0, 100.0, 110.0]) == 0.5
+
+
+def test_error_factor_is_clamped():
+    assert error_factor(0.0) == 1.0
+    assert error_factor(1.0) == error_factor(5.0) == 4.0
+
+
+def test_watches_sharing_a_search_are_one_entry():
+    sched = AdaptiveScheduler([watch("a"), watch("b"), watch("c", 20)], base_interval=600, jitter=0)
+    t0 = start()
+    batch, wait = sched.next_batch(limit=10, now=t0)
+    assert wait == 0.0
+    assert len(batch) == 2
+    assert sorted(w.id for key in batch for w in sched.watches_for(key)) == ["a", "b", "c"]
+
+
+def test_complete_reschedules_within_bounds():
+    sched = AdaptiveScheduler([watch("a", 60)], base_interval=600, min_interval=120, max_interval=900, jitter=0)
+    t0 = start()
+    (key,), _ = sched.next_batch(now=t0)
+    delay = sched.complete(key, ok=True, now=t0)
+    # 取车日很远：2 倍基础间隔，受 max_interval 限制
+    assert delay == 900
+    assert sched.next_batch(now=t0 + 899) == ([], 1.0)
+    assert sched.next_batch(now=t0 + 900)[0] == [key]
+
+
+def test_errors_lengthen_the_interval():
+    sched = AdaptiveScheduler([watch("a", 60)], base_interval=100, min_interval=10, max_interval=10000, jitter=0)
+    t0 = start()
+    (key,), _ = sched.next_batch(now=t0)
+    ok = sched.complete(key, ok=True, now=t0)
+    sched.next_batch(now=t0 + ok)
+    failed = sched.complete(key, ok=False, now=t0 + ok)
+    assert failed > ok
+
+
+def test_jitter_stays_within_range():
+    sched = AdaptiveScheduler([watch("a", 60)], base_interval=600, max_interval=10000, jitter=0.1, rng=random.Random(1))
+    t0 = start()
+    (key,), _ = sched.next_batch(now=t0)
+    for i in range(20):
+        delay = sched.complete(key, ok=True, now=t0)
+        assert 1200 * 0.9 <= delay <= 1200 * 1.1
+
+
+def test_budget_runs_most_urgent_search_first():
+    near, far = watch("near", 1), watch("far", 60)
+    sched = AdaptiveScheduler([far, near], base_interval=600, min_interval=10, jitter=0, sessions_per_hour=1)
+    t0 = start()
+    batch, _ = sched.next_batch(limit=2, now=t0)
+    assert batch == [near.search]
+    batch, wait = sched.next_batch(limit=2, now=t0 + 10)
+    assert batch == []
+    assert wait == 3590.0
+    assert sched.sessions_last_hour(now=t0 + 10) == 1
+    assert sched.next_batch(limit=2, now=t0 + 3600)[0] == [far.search]
@@ -0,0 +1,114 @@
+import sys
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+
+from src.serve import PriceService, QueryError, parse_query
+from src.watches import SearchKey
+
+SEARCH = SearchKey("敦煌", "德令哈", "2025-10-04", "2025-10-08")
+
+
+class FakeService(PriceService):
+    # 抓取线程里不启动浏览器：记录每次查询的车型，gate 放行前一直阻塞
+    def __init__(self, settings, prices) -> None:
+        super().__init__(replace(settings, serve_timeout_seconds=5))
+        self.prices = prices
+        self.gate = threading.Event()
+        self.fetched: list[list[str]] = []
+
+    def _fetch(self, flight):
+        self.fetched.append(sorted(flight.cars))
+        assert self.gate.wait(5)
+        if isinstance(self.prices, Exception):
+            raise self.prices
+        return {c: self.prices.get(c) for c in flight.cars}
+
+
+def wait_until(cond) -> None:
+    deadline = time.monotonic() + 5
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def waiting(thread: threading.Thread) -> bool:
+    # 线程已登记并阻塞在某个 flight 的 done.wait() 上
+    frame = sys._current_frames().get(thread.ident)
+    while frame is not None and frame.f_back is not None:
+        if frame.f_code.co_name == "wait" and frame.f_back.f_code.co_name == "query":
+            return True
+        frame = frame.f_back
+    return False
+
+
+def ask(service, cars, results, key):
+    results[key] = service.query(SEARCH, cars)
+
+
+@pytest.fixture
+def service(settings):
+    svc = FakeService(settings, {"A": 300.0, "B": 250.0})
+    svc.start()
+    yield svc
+    svc.gate.set()
+    svc.close()
+
+
+def test_concurrent_queries_share_flights(service):
+    results = {}
+    first = threading.Thread(target=ask, args=(service, ["A"], results, 1))
+    first.start()
+    wait_until(lambda: SEARCH in service._running)
+    # 执行中的查询只含 A：再要 A 的请求等它，要 B 的请求并入同一个排队中的查询
+    others = [
+        threading.Thread(target=ask, args=(service, cars, results, i))
+        for i, cars in enumerate((["A"], ["B"], ["B", "A"]), start=2)
+    ]
+    for t in others:
+        t.start()
+    wait_until(lambda: all(waiting(t) for t in others))
+    service.gate.set()
+    for t in [first] + others:
+        t.join(5)
+    assert service.fetched == [["A"], ["B"]]
+    assert results[1]["prices"] == {"A": 300.0}
+    assert results[2]["prices"] == {"A": 300.0}
+    assert results[4]["prices"] == {"B": 250.0, "A": 300.0}
+
+
+def test_fresh_results_come_from_the_cache(service):
+    service.gate.set()
+    assert service.query(SEARCH, ["A", "Z"])["cached"] is False
+    again = service.query(SEARCH, ["A", "Z"])
+    assert again["cached"] is True
+    assert again["prices"] == {"A": 300.0, "Z": None}
+    assert service.fetched == [["A", "Z"]]
+    # max_age=0 要求重新查询
+    assert service.query(SEARCH, ["A"], max_age=0)["cached"] is False
+    assert len(service.fetched) == 2
+
+
+def test_failed_search_is_reported_and_not_cached(settings):
+    svc = FakeService(settings, RuntimeError("page crashed"))
+    svc.gate.set()
+    svc.start()
+    try:
+        with pytest.raises(RuntimeError, match="page crashed"):
+            svc.query(SEARCH, ["A"])
+        assert svc.stats()["cache_entries"] == 0
+    finally:
+        svc.close()
+
+
+def test_parse_query(settings):
+    search, cars, max_age = parse_query("from=敦煌&to=德令哈&pickup=2025-10-04&return=2025-10-08&car=A,B&car=C&max_age=60", settings)
+    assert search == SEARCH
+    assert cars == ["A", "B", "C"]
+    assert max_age == 60.0
+    assert parse_query("", settings)[1] == [settings.car_name]
+    for bad in ("pickup=2025/10/04", "pickup=2025-10-08&return=2025-10-04", "max_age=soon"):
+        with pytest.raises(QueryError):
+            parse_query(bad, settings)
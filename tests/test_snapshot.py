@@ -0,0 +1,87 @@
+import math
+
+import pytest
+
+from src.snapshot import MAGIC, SnapshotStore, encode_block
+from src.watches import SearchKey
+
+SEARCH = SearchKey("敦煌", "德令哈", "2025-10-04", "2025-10-08")
+ROUTE = "敦煌->德令哈"
+# 2025-09-28 12:00 Asia/Shanghai，往后每 86400 秒是下一天
+T0 = 1_759_032_000
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(tmp_path / "snapshots")
+
+
+def test_round_trip_across_blocks_with_different_dictionaries(store):
+    store.append(SEARCH, [("大众新探影", 300.0, "到店", "cartype"), ("丰田卡罗拉", None, None, "cartype")], ts=T0)
+    # 第二块的字典顺序不同，且多了一个车型
+    store.append(SEARCH, [("本田思域", 280.0, "送车上门", "api"), ("大众新探影", 310.0, "到店", "api")], ts=T0 + 60)
+    snap = store.load(ROUTE)
+    assert snap.blocks == 2 and len(snap) == 4 and snap.skipped_bytes == 0
+    rows = list(snap.rows())
+    assert [r["name"] for r in rows] == ["大众新探影", "丰田卡罗拉", "本田思域", "大众新探影"]
+    assert [r["ts"] for r in rows] == [T0, T0, T0 + 60, T0 + 60]
+    assert math.isnan(rows[1]["price"]) and rows[1]["pickup_mode"] == ""
+    assert rows[2]["source"] == "api" and rows[2]["pickup_date"] == "2025-10-04"
+    assert snap.prices_by_name() == {"大众新探影": [300.0, 310.0], "本田思域": [280.0]}
+    assert snap.prices_by_name("大众新探影") == {"大众新探影": [300.0, 310.0]}
+    assert snap.prices_by_name("不存在") == {}
+
+
+def test_load_selected_columns_only(store):
+    store.append(SEARCH, [("大众新探影", 300.0, "到店", "cartype")], ts=T0)
+    snap = store.load(ROUTE, columns=("name", "price"))
+    assert set(snap.columns) == {"name", "price"}
+    assert snap["name"].decode() == ["大众新探影"] and list(snap["price"]) == [300.0]
+
+
+def test_since_until_filter_by_day(store):
+    for day in range(3):
+        store.append(SEARCH, [("大众新探影", 300.0 + day, None, "cartype")], ts=T0 + day * 86400)
+    assert store.days(ROUTE) == ["2025-09-28", "2025-09-29", "2025-09-30"]
+    assert store.routes() == [ROUTE]
+    assert list(store.load(ROUTE, since="2025-09-29")["price"]) == [301.0, 302.0]
+    assert list(store.load(ROUTE, until="2025-09-29")["price"]) == [300.0, 301.0]
+    assert list(store.load(ROUTE, since="2025-09-29", until="2025-09-29")["price"]) == [301.0]
+
+
+def _day_file(store):
+    return store.path_for(ROUTE, "2025-09-28")
+
+
+def test_truncated_block_followed_by_new_block_is_skipped(store):
+    store.append(SEARCH, [("大众新探影", 300.0, None, "cartype")], ts=T0)
+    path = _day_file(store)
+    # 进程在写第二块时被杀：块尾少了 5 字节，之后又正常追加了一块
+    path.write_bytes(path.read_bytes() + encode_block([{"ts": T0, "name": "丰田卡罗拉", "price": 1.0}])[:-5])
+    store.append(SEARCH, [("本田思域", 280.0, None, "cartype")], ts=T0 + 60)
+    snap = store.load(ROUTE)
+    assert snap["name"].decode() == ["大众新探影", "本田思域"]
+    assert snap.blocks == 2 and snap.skipped_bytes > 0
+
+
+def test_truncated_tail_and_garbage_are_skipped(store):
+    store.append(SEARCH, [("大众新探影", 300.0, None, "cartype")], ts=T0)
+    path = _day_file(store)
+    path.write_bytes(b"junk" + path.read_bytes() + MAGIC + b"\x10\x00")
+    snap = store.load(ROUTE)
+    assert snap["name"].decode() == ["大众新探影"]
+    assert snap.skipped_bytes == 4 + len(MAGIC) + 2
+
+
+def test_corrupt_compressed_column_skips_only_that_block(store):
+    store.append(SEARCH, [("大众新探影", 300.0, None, "cartype")], ts=T0)
+    path = _day_file(store)
+    good = path.read_bytes()
+    bad = bytearray(encode_block([{"ts": T0, "name": "丰田卡罗拉", "price": 1.0}]))
+    bad[-3] ^= 0xFF
+    path.write_bytes(good + bytes(bad))
+    store.append(SEARCH, [("本田思域", 280.0, None, "cartype")], ts=T0 + 60)
+    snap = store.load(ROUTE)
+    assert snap["name"].decode() == ["大众新探影", "本田思域"]
+    assert list(snap["price"]) == [300.0, 280.0]
+    assert snap.blocks == 2 and snap.skipped_bytes > 0
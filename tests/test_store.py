@@ -0,0 +1,86 @@
+import argparse
+import json
+import logging
+import time
+
+import pytest
+
+import run
+from src.store import Observation, ObservationStore, route_key
+
+ROUTE = route_key("敦煌", "德令哈")
+T0 = 1_759_000_000
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ObservationStore(tmp_path / "observations.db") as s:
+        yield s
+
+
+def obs(car: str, price: float, ts: int, watch_id: str = "w1", pickup_date: str = "2025-10-04") -> Observation:
+    return Observation(watch_id, ROUTE, pickup_date, "2025-10-08", car, price, ts)
+
+
+def test_record_poll_and_last_prices(store):
+    store.record_poll([obs("大众新探影", 300.0, T0)], {"w1": 300.0})
+    store.record_poll([obs("大众新探影", 280.0, T0 + 60)], {"w1": 280.0, "w2": 150.0})
+    assert store.last_prices() == {"w1": 280.0, "w2": 150.0}
+    # 只更新最近价格、不带观测
+    store.record_poll([], {"w2": 140.0})
+    assert store.last_prices()["w2"] == 140.0
+    assert store.recent_prices("w1") == [(T0, 300.0), (T0 + 60, 280.0)]
+
+
+def test_recent_prices_keeps_latest_in_order(store):
+    store.record_poll([obs("大众新探影", 300.0 + i, T0 + i) for i in range(5)])
+    assert store.recent_prices("w1", limit=2) == [(T0 + 3, 303.0), (T0 + 4, 304.0)]
+    assert store.recent_prices("other") == []
+
+
+def test_min_prices_per_car_within_window(store):
+    store.record_poll(
+        [
+            obs("大众新探影", 250.0, T0 - 3600),  # 窗口外
+            obs("大众新探影", 300.0, T0),
+            obs("大众新探影", 280.0, T0 + 60, pickup_date="2025-10-05"),
+            obs("丰田卡罗拉", 260.0, T0 + 120, watch_id="w2"),
+            Observation("w3", route_key("敦煌", "西宁"), "2025-10-04", "2025-10-08", "大众新探影", 100.0, T0),
+        ]
+    )
+    rows = store.min_prices(ROUTE, T0)
+    assert [(r.car_name, r.price, r.samples) for r in rows] == [("丰田卡罗拉", 260.0, 1), ("大众新探影", 280.0, 2)]
+    assert rows[1].ts == T0 + 60 and rows[1].pickup_date == "2025-10-05"
+    [only] = store.min_prices(ROUTE, T0, car_name="大众新探影", pickup_date="2025-10-04")
+    assert (only.price, only.ts) == (300.0, T0)
+    assert store.min_prices(ROUTE, T0, return_date="2025-10-09") == []
+
+
+def test_legacy_last_price_json_is_imported_once(store, tmp_path):
+    legacy = tmp_path / "last_price.json"
+    legacy.write_text(json.dumps({"w1": {"price": 300, "timestamp": "x"}, "bad": {}}), encoding="utf-8")
+    logger = logging.getLogger("test")
+    assert run.initial_last_prices(store, logger, legacy) == {"w1": 300.0}
+    assert store.last_prices() == {"w1": 300.0}
+    # 索引库已有数据：不再读旧文件
+    legacy.write_text(json.dumps({"w1": {"price": 1}}), encoding="utf-8")
+    assert run.initial_last_prices(store, logger, legacy) == {"w1": 300.0}
+
+
+def test_legacy_single_value_format(tmp_path):
+    path = tmp_path / "last_price.json"
+    path.write_text(json.dumps({"price": 299.5, "timestamp": "x"}), encoding="utf-8")
+    assert run.load_last_prices(path) == {run.DEFAULT_WATCH_ID: 299.5}
+    path.write_text("not json", encoding="utf-8")
+    assert run.load_last_prices(path) == {}
+    assert run.load_last_prices(tmp_path / "missing.json") == {}
+
+
+def test_history_command_prints_route_minimums(store, monkeypatch, capsys):
+    store.record_poll([obs("大众新探影", 300.0, int(time.time()) - 60)])
+    monkeypatch.setenv("STORE_PATH", str(store.path))
+    args = argparse.Namespace(pickup_city="敦煌", return_city="德令哈", days=1, car=None, pickup_date=None, return_date=None)
+    run.run_history(args)
+    out = capsys.readouterr().out
+    assert "Route 敦煌->德令哈" in out
+    assert "大众新探影: min 300.0" in out and "1 samples" in out
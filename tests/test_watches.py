@@ -0,0 +1,77 @@
+import json
+from dataclasses import replace
+
+import pytest
+
+from src.config import Settings
+from src.watches import DEFAULT_WATCH_ID, SearchKey, group_by_search, load_watches, settings_for_watch
+
+
+@pytest.fixture
+def base(settings):
+    # .env 中的默认行程/车型
+    return replace(
+        settings,
+        car_name="大众新探影",
+        pickup_city="敦煌",
+        return_city="德令哈",
+        pickup_date="2025-10-04",
+        return_date="2025-10-08",
+        alert_price=350.0,
+    )
+
+
+def with_file(settings: Settings, tmp_path, data) -> Settings:
+    path = tmp_path / "watches.json"
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return replace(settings, watches_file=str(path))
+
+
+def test_without_watch_file_uses_env_watch(base):
+    [w] = load_watches(base)
+    assert w.id == DEFAULT_WATCH_ID and w.car_name == "大众新探影" and w.alert_price == 350.0
+    assert w.search == SearchKey("敦煌", "德令哈", "2025-10-04", "2025-10-08")
+
+
+def test_entries_inherit_env_defaults(base, tmp_path):
+    watches = load_watches(with_file(base, tmp_path, [
+        {"car_name": "丰田卡罗拉"},
+        {"id": "late", "pickup_date": "2025-10-05", "alert_price": ""},
+        {"car_name": " 本田思域 ", "return_city": "西宁", "alert_price": "299"},
+    ]))
+    first, late, civic = watches
+    assert first.id == "丰田卡罗拉@敦煌->德令哈 2025-10-04~2025-10-08"
+    assert first.search == SearchKey("敦煌", "德令哈", "2025-10-04", "2025-10-08") and first.alert_price == 350.0
+    assert (late.car_name, late.search.pickup_date, late.alert_price) == ("大众新探影", "2025-10-05", None)
+    assert (civic.car_name, civic.search.return_city, civic.alert_price) == ("本田思域", "西宁", 299.0)
+    overrides = settings_for_watch(base, civic)
+    assert (overrides.car_name, overrides.return_city, overrides.alert_price) == ("本田思域", "西宁", 299.0)
+
+
+def test_object_with_watches_key(base, tmp_path):
+    [w] = load_watches(with_file(base, tmp_path, {"watches": [{"id": "a"}]}))
+    assert w.id == "a"
+
+
+def test_duplicate_ids_are_rejected(base, tmp_path):
+    # 未写 id 时按车型+行程生成，同车型同行程写两次也算重复
+    with pytest.raises(ValueError, match="Duplicate watch ids.*a, 大众新探影@"):
+        load_watches(with_file(base, tmp_path, [{"id": "a"}, {"id": "a"}, {}, {}]))
+
+
+@pytest.mark.parametrize("data, message", [([], "No watches defined"), (["大众新探影"], "Invalid watch entry")])
+def test_invalid_files(base, tmp_path, data, message):
+    with pytest.raises(ValueError, match=message):
+        load_watches(with_file(base, tmp_path, data))
+
+
+def test_group_by_search_shares_one_search_per_route_and_dates(base, tmp_path):
+    watches = load_watches(with_file(base, tmp_path, [
+        {"car_name": "大众新探影"},
+        {"car_name": "丰田卡罗拉"},
+        {"car_name": "大众新探影", "pickup_date": "2025-10-05"},
+        {"car_name": "本田思域"},
+    ]))
+    groups = group_by_search(watches)
+    assert [[w.car_name for w in ws] for ws in groups.values()] == [["大众新探影", "丰田卡罗拉", "本田思域"], ["大众新探影"]]
+    assert list(groups)[1].pickup_date == "2025-10-05"